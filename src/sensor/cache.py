@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+CACHE_FORMAT_VERSION = 2
+# Text columns with at most this many distinct values are stored as codes plus their labels
+MAX_CATEGORIES = 4096
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Compute the SHA-256 of a file without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ColumnarCache:
+    """
+    Memory-mapped columnar cache of a CSV file.
+
+    The CSV is parsed once and every column is written as its own ``.npy`` file.
+    Text columns with few distinct values are stored as codes plus a label file,
+    other text columns as fixed-width strings; both come back as the object
+    columns ``read_csv`` returns. Later loads map the column files read-only, so
+    numeric columns are built without parsing or copying and processes loading
+    the same file share the page cache.
+
+    The cache is tied to the source file's size, modification time and SHA-256.
+    When only the modification time changed (e.g. the file was touched or copied)
+    the hash decides whether the cache is still valid.
+    """
+
+    def __init__(self, csv_path: str, cache_dir: str = None,
+                 prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None):
+        """
+        Initialize the cache for a CSV file.
+
+        Args:
+            csv_path: Path to the source CSV file
+            cache_dir: Directory holding the cached columns (defaults to
+                ``.sensor_cache/<file name>`` next to the CSV)
+            prepare: Optional function applied to the parsed CSV before it is cached
+        """
+        self.csv_path = Path(csv_path)
+        if cache_dir is None:
+            cache_dir = self.csv_path.parent / ".sensor_cache" / self.csv_path.name
+        self.cache_dir = Path(cache_dir)
+        self.prepare = prepare
+
+    @property
+    def meta_path(self) -> Path:
+        return self.cache_dir / "meta.json"
+
+    def _read_meta(self) -> Optional[dict]:
+        """Read the cache metadata, or None if there is no usable cache."""
+        try:
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != CACHE_FORMAT_VERSION:
+            return None
+        return meta
+
+    def is_valid(self, meta: Optional[dict] = None) -> bool:
+        """Check whether the cached columns still match the source file."""
+        meta = meta if meta is not None else self._read_meta()
+        if meta is None:
+            return False
+
+        stat = os.stat(self.csv_path)
+        if stat.st_size != meta["size"]:
+            return False
+        if stat.st_mtime_ns == meta["mtime_ns"]:
+            return True
+
+        # Same size but a different mtime: only the content hash can tell
+        if file_sha256(self.csv_path) != meta["sha256"]:
+            return False
+        meta["mtime_ns"] = stat.st_mtime_ns
+        self._write_json(self.meta_path, meta)
+        return True
+
+    def load(self) -> pd.DataFrame:
+        """
+        Load the CSV through the cache, (re)building the cache if needed.
+
+        Returns:
+            DataFrame whose numeric columns are read-only memory maps and whose
+            text columns hold str objects, as read with ``read_csv``
+        """
+        meta = self._read_meta()
+        if not self.is_valid(meta):
+            meta = self.build()
+        return self._map(meta)
+
+    def build(self) -> dict:
+        """Parse the CSV and write its columns to the cache directory."""
+        stat = os.stat(self.csv_path)
+        sha256 = file_sha256(self.csv_path)
+        data = pd.read_csv(self.csv_path)
+        if self.prepare is not None:
+            data = self.prepare(data)
+
+        self.cache_dir.parent.mkdir(parents=True, exist_ok=True)
+        # Columns are written to a scratch directory and swapped in at the end so
+        # concurrent readers never see a half-written cache.
+        scratch = Path(tempfile.mkdtemp(prefix=".build-", dir=self.cache_dir.parent))
+        columns = []
+        try:
+            for position, name in enumerate(data.columns):
+                series = data[name]
+                file_name = f"{position:03d}.npy"
+                if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+                    np.save(scratch / file_name, series.to_numpy())
+                    columns.append({"name": name, "file": file_name, "kind": "array"})
+                else:
+                    categorical = pd.Categorical(series)
+                    if len(categorical.categories) <= MAX_CATEGORIES:
+                        labels_name = f"{position:03d}.labels.npy"
+                        np.save(scratch / file_name, categorical.codes)
+                        np.save(scratch / labels_name, np.asarray(categorical.categories, dtype=str))
+                        columns.append({"name": name, "file": file_name, "kind": "categorical",
+                                        "labels": labels_name})
+                    else:
+                        missing = series.isna().to_numpy()
+                        np.save(scratch / file_name, series.fillna('').to_numpy(dtype=str))
+                        column = {"name": name, "file": file_name, "kind": "text", "missing": None}
+                        if missing.any():
+                            column["missing"] = f"{position:03d}.missing.npy"
+                            np.save(scratch / column["missing"], missing)
+                        columns.append(column)
+
+            meta = {
+                "version": CACHE_FORMAT_VERSION,
+                "source": str(self.csv_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": sha256,
+                "rows": len(data),
+                "columns": columns,
+            }
+            self._write_json(scratch / "meta.json", meta)
+
+            if self.cache_dir.exists():
+                shutil.rmtree(self.cache_dir, ignore_errors=True)
+            try:
+                os.replace(scratch, self.cache_dir)
+            except OSError:
+                # Another process swapped in its build first; it holds the same columns
+                shutil.rmtree(scratch, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(scratch, ignore_errors=True)
+            raise
+        return meta
+
+    def _map(self, meta: dict) -> pd.DataFrame:
+        """Build a DataFrame over memory-mapped column files."""
+        columns = {}
+        for column in meta["columns"]:
+            values = np.load(self.cache_dir / column["file"], mmap_mode='r')
+            if column["kind"] == "categorical":
+                # Missing values have code -1, which picks the NaN appended to the labels
+                labels = np.append(np.load(self.cache_dir / column["labels"]).astype(object), np.nan)
+                values = labels[values]
+            elif column["kind"] == "text":
+                values = values.astype(object)
+                if column["missing"]:
+                    values[np.load(self.cache_dir / column["missing"], mmap_mode='r')] = np.nan
+            columns[column["name"]] = values
+        return pd.DataFrame(columns, copy=False)
+
+    @staticmethod
+    def _write_json(path: Path, payload: dict):
+        """Write JSON atomically next to its final location."""
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, 'w') as f:
+            json.dump(payload, f)
+        os.replace(temporary, path)
@@ -0,0 +1,155 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class CorrelationService:
+    """
+    Pairwise correlation between numeric columns built from additive moment matrices.
+
+    Every update adds the co-moments of a batch of rows into a handful of
+    k x k matrices, so the full correlation matrix and any single-column
+    ranking can be derived at any time without touching earlier rows again.
+    Missing values are handled the same way as ``DataFrame.corr``: each pair
+    of columns only uses the rows where both values are present.
+    """
+
+    def __init__(self, columns: List[str], chunk_rows: int = 1_000_000):
+        """
+        Initialize an empty correlation service.
+
+        Args:
+            columns: Names of the columns to correlate
+            chunk_rows: Maximum number of rows converted to a dense matrix at once
+        """
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+
+        size = len(self.columns)
+        # Values are shifted by the first batch's column means before being
+        # accumulated, which keeps the raw moments numerically well-behaved.
+        self.shift: Optional[np.ndarray] = None
+        self.count = np.zeros((size, size))
+        self.sum_x = np.zeros((size, size))
+        self.sum_xx = np.zeros((size, size))
+        self.sum_xy = np.zeros((size, size))
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, columns: List[str] = None,
+                   chunk_rows: int = 1_000_000) -> "CorrelationService":
+        """
+        Build a correlation service from an existing DataFrame.
+
+        Args:
+            frame: DataFrame holding the rows to accumulate
+            columns: Columns to correlate (defaults to all numeric and boolean columns)
+            chunk_rows: Maximum number of rows converted to a dense matrix at once
+
+        Returns:
+            CorrelationService populated with every row of ``frame``
+        """
+        if columns is None:
+            columns = list(frame.select_dtypes(include=['number', 'bool']).columns)
+        service = cls(columns, chunk_rows=chunk_rows)
+        service.update(frame)
+        return service
+
+    def update(self, frame: pd.DataFrame) -> None:
+        """Add new rows to the accumulated moments."""
+        for start in range(0, len(frame), self.chunk_rows):
+            chunk = frame.iloc[start:start + self.chunk_rows]
+            self._update_matrix(chunk[self.columns].to_numpy(dtype=np.float64))
+
+    def _update_matrix(self, values: np.ndarray) -> None:
+        """Add a dense (rows x columns) block of values to the accumulated moments."""
+        if len(values) == 0:
+            return
+
+        if self.shift is None:
+            with np.errstate(invalid='ignore'):
+                present = np.sum(~np.isnan(values), axis=0)
+                totals = np.nansum(values, axis=0)
+                self.shift = np.where(present > 0, totals / np.maximum(present, 1), 0.0)
+
+        shifted = values - self.shift
+        mask = ~np.isnan(shifted)
+        filled = np.where(mask, shifted, 0.0)
+        weights = mask.astype(np.float64)
+
+        # One matrix product per moment covers every column pair at once
+        self.count += weights.T @ weights
+        self.sum_x += filled.T @ weights
+        self.sum_xx += (filled * filled).T @ weights
+        self.sum_xy += filled.T @ filled
+        self.rows += len(values)
+
+    def merge(self, other: "CorrelationService") -> None:
+        """
+        Add the moments accumulated by another service over the same columns.
+
+        Args:
+            other: Service built from a disjoint set of rows
+        """
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge correlation services over different columns")
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift = other.shift.copy()
+
+        count, sum_x, sum_xx, sum_xy = other._moments_at(self.shift)
+        self.count += count
+        self.sum_x += sum_x
+        self.sum_xx += sum_xx
+        self.sum_xy += sum_xy
+        self.rows += other.rows
+
+    def _moments_at(self, shift: np.ndarray):
+        """Return the accumulated moments re-expressed around a different shift."""
+        delta = (self.shift - shift)[:, None]
+        delta_t = delta.T
+        sum_x = self.sum_x + delta * self.count
+        sum_xx = self.sum_xx + 2 * delta * self.sum_x + delta ** 2 * self.count
+        sum_xy = (self.sum_xy + delta * self.sum_x.T + delta_t * self.sum_x
+                  + delta * delta_t * self.count)
+        return self.count.copy(), sum_x, sum_xx, sum_xy
+
+    def correlation_matrix(self, columns: List[str] = None) -> pd.DataFrame:
+        """
+        Get the Pearson correlation matrix of the accumulated rows.
+
+        Args:
+            columns: Optional subset of columns to include
+
+        Returns:
+            DataFrame with columns and index labelled by column name
+        """
+        n = self.count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = n * self.sum_xy - self.sum_x * self.sum_x.T
+            variance = n * self.sum_xx - self.sum_x ** 2
+            denominator = np.sqrt(variance * variance.T)
+            matrix = np.where((n >= 2) & (denominator > 0), covariance / denominator, np.nan)
+        matrix = np.clip(matrix, -1.0, 1.0)
+
+        result = pd.DataFrame(matrix, index=self.columns, columns=self.columns)
+        if columns is not None:
+            result = result.loc[columns, columns]
+        return result
+
+    def correlations_with(self, target: str) -> Dict[str, float]:
+        """
+        Get correlations between every column and ``target``, sorted by absolute value.
+
+        Args:
+            target: Column to correlate against
+
+        Returns:
+            Dictionary mapping column names to correlation coefficients
+        """
+        row = self.correlation_matrix().loc[target].drop(target)
+        order = np.argsort(-np.abs(row.to_numpy()), kind='stable')
+        # argsort places NaN last when sorting descending on negated values
+        return {row.index[i]: float(row.iloc[i]) for i in order}
@@ -0,0 +1,217 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.sensor.correlation import CorrelationService
+from src.sensor.rules import RiskRules
+from src.sensor.sensor import MAINTENANCE_REPORT_COLUMNS, SensorDataAnalyzer
+from src.sensor.topk import top_k_indices
+
+# Values kept per column and partition to estimate the merged quartiles
+QUANTILE_SAMPLE_SIZE = 10_000
+
+
+def is_dataset_path(path: str) -> bool:
+    """Check whether a path names a directory or a glob rather than a single file."""
+    return os.path.isdir(path) or any(char in path for char in '*?[')
+
+
+def resolve_dataset_files(path: str) -> List[str]:
+    """
+    List the data files of a dataset.
+
+    Args:
+        path: Directory (all ``*.csv`` files inside it) or glob pattern
+
+    Returns:
+        Sorted list of file paths
+    """
+    pattern = os.path.join(path, "*.csv") if os.path.isdir(path) else path
+    files = sorted(glob.glob(pattern))
+    if not files:
+        raise FileNotFoundError(f"No data files match {pattern}")
+    return files
+
+
+def analyze_partition(csv_path: str, use_cache: bool = True, top: int = 20,
+                      seed: int = 0, rules: Optional[RiskRules] = None) -> Dict[str, Any]:
+    """
+    Compute mergeable report partials for one data file. Runs inside a worker process.
+
+    Args:
+        csv_path: Path to the CSV file
+        use_cache: Load the file through the columnar cache
+        top: Number of maintenance report candidates to keep
+        seed: Seed for the quantile samples
+        rules: Rule set for risk scores and critical machines (default: the built-in batch rules)
+
+    Returns:
+        Dictionary of partial results understood by merge_partials
+    """
+    analyzer = SensorDataAnalyzer(csv_path, use_cache=use_cache, rules=rules)
+    data = analyzer.data
+    if data.empty:
+        # A header-only file has no dtypes to summarise; merge_partials only counts it
+        return {"path": csv_path, "rows": 0}
+    rng = np.random.default_rng(seed)
+
+    # Summary moments per numeric column, plus a sample for the quartiles
+    numeric_cols = list(data.select_dtypes(include=['number']).columns)
+    summary = {}
+    for col in numeric_cols:
+        values = data[col].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values)]
+        count = len(values)
+        sample = values if count <= QUANTILE_SAMPLE_SIZE else rng.choice(values, QUANTILE_SAMPLE_SIZE, replace=False)
+        summary[col] = {
+            "count": count,
+            "mean": float(values.mean()) if count else 0.0,
+            "m2": float(((values - values.mean()) ** 2).sum()) if count else 0.0,
+            "min": float(values.min()) if count else np.nan,
+            "max": float(values.max()) if count else np.nan,
+            "sample": sample,
+        }
+
+    correlation = analyzer.get_correlation_service()
+    risk_score = analyzer.rules.score(data)
+    positions = top_k_indices(risk_score, top)
+    candidates = data.iloc[positions].assign(Risk_Score=risk_score[positions])
+    # Plain string labels so distributions from different files line up when added
+    machine_distribution = analyzer.get_machine_type_distribution()
+    machine_distribution.index = machine_distribution.index.astype(str)
+    age_distribution = analyzer.get_machines_by_age()
+    age_distribution.index = age_distribution.index.astype(str)
+
+    return {
+        "path": csv_path,
+        "rows": len(data),
+        "summary": summary,
+        "machine_distribution": machine_distribution,
+        "age_distribution": age_distribution,
+        # One pass over each column is cheaper than sorting it for an index used once
+        "failure_risk": int((data['Remaining_Useful_Life_days'].to_numpy() <= 7).sum()),
+        "maintenance_needed": int((data['Last_Maintenance_Days_Ago'].to_numpy() > 180).sum()),
+        "critical_machines": int(analyzer.rules.critical(data).sum()),
+        "maintenance_candidates": candidates[MAINTENANCE_REPORT_COLUMNS].reset_index(drop=True),
+        "correlation": correlation,
+    }
+
+
+def _weighted_quantiles(values: np.ndarray, weights: np.ndarray, quantiles: List[float]) -> List[float]:
+    """Interpolate quantiles of a weighted sample."""
+    if len(values) == 0:
+        return [np.nan] * len(quantiles)
+    order = np.argsort(values)
+    values, weights = values[order], weights[order]
+    cumulative = np.cumsum(weights) - 0.5 * weights
+    cumulative /= weights.sum()
+    return [float(np.interp(q, cumulative, values)) for q in quantiles]
+
+
+def _merge_summary(partials: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Merge per-partition moments into a DataFrame shaped like ``describe()``."""
+    columns = list(partials[0]["summary"])
+    result = {}
+    for col in columns:
+        count, mean, m2 = 0, 0.0, 0.0
+        minimum, maximum = np.inf, -np.inf
+        samples, weights = [], []
+        for partial in partials:
+            part = partial["summary"][col]
+            if part["count"] == 0:
+                continue
+            # Chan's parallel update of the mean and sum of squared deviations
+            total = count + part["count"]
+            delta = part["mean"] - mean
+            mean += delta * part["count"] / total
+            m2 += part["m2"] + delta ** 2 * count * part["count"] / total
+            count = total
+            minimum = min(minimum, part["min"])
+            maximum = max(maximum, part["max"])
+            samples.append(part["sample"])
+            weights.append(np.full(len(part["sample"]), part["count"] / len(part["sample"])))
+
+        quartiles = _weighted_quantiles(np.concatenate(samples) if samples else np.empty(0),
+                                        np.concatenate(weights) if weights else np.empty(0),
+                                        [0.25, 0.5, 0.75])
+        result[col] = [count, mean if count else np.nan,
+                       np.sqrt(m2 / (count - 1)) if count > 1 else np.nan,
+                       minimum if count else np.nan, *quartiles, maximum if count else np.nan]
+
+    return pd.DataFrame(result, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+
+
+def merge_partials(partials: List[Dict[str, Any]], top: int = 20) -> Dict[str, Any]:
+    """
+    Merge per-partition partials into a single analysis report.
+
+    Args:
+        partials: Results of analyze_partition
+        top: Number of machines in the merged maintenance report
+
+    Returns:
+        Report with the same keys as analyze_factory_data. Row selections that
+        would need the whole dataset in memory (failure_risk, maintenance_needed,
+        critical_machines) are reported as counts.
+    """
+    partials = sorted(partials, key=lambda partial: partial["path"])
+    partitions = len(partials)
+    partials = [partial for partial in partials if partial["rows"]]
+    if not partials:
+        raise ValueError("Dataset has no rows")
+
+    machine_distribution = partials[0]["machine_distribution"]
+    age_distribution = partials[0]["age_distribution"]
+    correlation = CorrelationService(partials[0]["correlation"].columns)
+    candidates = []
+    for partial in partials:
+        if partial is not partials[0]:
+            machine_distribution = machine_distribution.add(partial["machine_distribution"], fill_value=0)
+            age_distribution = age_distribution.add(partial["age_distribution"], fill_value=0)
+        correlation.merge(partial["correlation"])
+        candidates.append(partial["maintenance_candidates"])
+
+    candidates = pd.concat(candidates, ignore_index=True)
+    maintenance_report = candidates.iloc[top_k_indices(candidates['Risk_Score'].to_numpy(), top)]
+
+    return {
+        "rows": sum(partial["rows"] for partial in partials),
+        "partitions": partitions,
+        "summary": _merge_summary(partials),
+        "machine_distribution": machine_distribution.astype(int).sort_values(ascending=False),
+        "failure_risk": sum(partial["failure_risk"] for partial in partials),
+        "age_distribution": age_distribution.reindex(partials[0]["age_distribution"].index).astype(int),
+        "maintenance_needed": sum(partial["maintenance_needed"] for partial in partials),
+        "critical_machines": sum(partial["critical_machines"] for partial in partials),
+        "maintenance_report": maintenance_report.reset_index(drop=True).astype({'Machine_ID': str, 'Machine_Type': str}),
+        "failure_correlation": correlation.correlations_with('Failure_Within_7_Days'),
+    }
+
+
+def analyze_dataset(path: str, workers: int = None, use_cache: bool = True, top: int = 20,
+                    rules: Optional[RiskRules] = None) -> Dict[str, Any]:
+    """
+    Analyze every file of a partitioned dataset in a process pool and merge the results.
+
+    Args:
+        path: Directory of CSV files or glob pattern
+        workers: Number of worker processes (defaults to the CPU count)
+        use_cache: Load files through the columnar cache
+        top: Number of machines in the merged maintenance report
+        rules: Rule set for risk scores and critical machines (default: the built-in batch rules)
+
+    Returns:
+        Merged report, see merge_partials
+    """
+    files = resolve_dataset_files(path)
+    partials = []
+    with ProcessPoolExecutor(max_workers=workers or min(len(files), os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(analyze_partition, file, use_cache, top, seed, rules)
+                   for seed, file in enumerate(files)]
+        for future in as_completed(futures):
+            partials.append(future.result())
+    return merge_partials(partials, top=top)
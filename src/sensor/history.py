@@ -0,0 +1,241 @@
+import logging
+import math
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.thingsboard.fleet import FleetLayout, FleetTick
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOURS = 1.0
+DOWNSAMPLE_METHODS = ("avg", "min", "max", "lttb")
+
+
+def capacity_for(hours: float, interval: float) -> int:
+    """Number of ticks needed to hold ``hours`` of history at one tick every ``interval`` seconds."""
+    return max(1, math.ceil(hours * 3600 / interval))
+
+
+def lttb(timestamps: np.ndarray, values: np.ndarray, points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last point and, from each of the ``points - 2`` equal
+    buckets in between, the point forming the largest triangle with the point
+    kept from the previous bucket and the average of the next bucket, which
+    preserves the visual shape (peaks and dips) of the series.
+
+    Args:
+        timestamps: Sorted timestamps of the series
+        values: Values of the series, without NaN
+        points: Number of points to keep
+
+    Returns:
+        Tuple of the kept timestamps and values
+    """
+    n = len(values)
+    if points >= n or points < 3:
+        return timestamps, values
+    x = timestamps.astype(np.float64)
+    y = values.astype(np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return timestamps[kept], values[kept]
+
+
+class SensorHistory:
+    """
+    Bounded in-memory history of every sensor in the live SensorSimulator stream.
+
+    The last ``capacity`` ticks are kept in one preallocated ring buffer of
+    float32 fleet matrices (ticks x machines x sensors, laid out by FleetLayout)
+    with a single int64 millisecond timestamp per tick shared by all sensors, so
+    memory is fixed at ``capacity * machines * sensors * 4`` bytes plus 8 bytes
+    per tick and does not grow with run time. A tick is stored with one
+    contiguous copy; range queries locate ticks by binary search on the
+    timestamps. Readings missing from a tick (machines in maintenance) are NaN.
+    Queries return copies and may run on other threads than the tick loop.
+    """
+
+    def __init__(self, simulator=None, capacity: Optional[int] = None, hours: float = DEFAULT_HOURS):
+        """
+        Initialize the history.
+
+        Args:
+            simulator: Optional SensorSimulator to subscribe to immediately
+            capacity: Number of ticks to keep; defaults to ``hours`` at the
+                simulator's interval, sized on the first tick if it is not set yet
+            hours: Hours of history to keep when ``capacity`` is not given
+        """
+        self.capacity = capacity
+        self.hours = hours
+        self.layout: Optional[FleetLayout] = None
+        self._simulator = None
+        self._lock = threading.Lock()
+        self.head = 0
+        self.size = 0
+        self.ticks = 0
+
+        if simulator is not None:
+            self.attach(simulator)
+
+    def attach(self, simulator):
+        """Subscribe to a simulator's per-tick output."""
+        self._simulator = simulator
+        if self.capacity is not None or simulator.interval is not None:
+            self._allocate(simulator.get_layout())
+        simulator.add_tick_listener(self.on_tick)
+
+    def detach(self, simulator):
+        """Stop receiving ticks from a simulator."""
+        simulator.remove_tick_listener(self.on_tick)
+
+    def _allocate(self, layout: FleetLayout):
+        """Allocate an empty ring buffer for a layout."""
+        if self.capacity is None:
+            interval = self._simulator.interval if self._simulator is not None else None
+            self.capacity = capacity_for(self.hours, interval or 1)
+        self.layout = layout
+        self.values = np.full((self.capacity,) + layout.shape, np.nan, dtype=np.float32)
+        self.timestamps = np.zeros(self.capacity, dtype=np.int64)
+        self.head = 0
+        self.size = 0
+        logger.info(f"Sensor history keeps {self.capacity} ticks of {layout.shape[0]} machines "
+                    f"({self.memory_bytes / 2 ** 20:.1f} MiB)")
+
+    def _relayout(self, layout: FleetLayout):
+        """Carry the stored ticks over to a new layout after the fleet changed shape."""
+        by_machine = np.moveaxis(self.values, 0, -1)
+        self.values = np.ascontiguousarray(np.moveaxis(layout.remap(by_machine, self.layout), -1, 0))
+        self.layout = layout
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes held by the ring buffer and its timestamps."""
+        return self.values.nbytes + self.timestamps.nbytes
+
+    def on_tick(self, tick: FleetTick):
+        """Store one tick, overwriting the oldest once the buffer is full."""
+        matrix = tick.get_matrix()
+        with self._lock:
+            if self.layout is None:
+                self._allocate(tick.layout)
+            elif tick.layout is not self.layout:
+                self._relayout(tick.layout)
+
+            self.values[self.head] = matrix
+            self.timestamps[self.head] = tick.timestamp
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            self.ticks += 1
+
+    def _slots(self, start: Optional[int], end: Optional[int]) -> np.ndarray:
+        """Ring positions of the stored ticks with ``start <= timestamp <= end``, oldest first."""
+        slots = (self.head - self.size + np.arange(self.size)) % self.capacity
+        timestamps = self.timestamps[slots]
+        low = 0 if start is None else np.searchsorted(timestamps, start, side="left")
+        high = self.size if end is None else np.searchsorted(timestamps, end, side="right")
+        return slots[low:high]
+
+    def _cell(self, machine_id: str, sensor_type: str) -> Tuple[int, int]:
+        cell = self.layout.cell(machine_id, sensor_type) if self.layout is not None else None
+        if cell is None:
+            raise KeyError(f"No history for {machine_id} - {sensor_type}")
+        return cell
+
+    def query(self, machine_id: str, sensor_type: str, start: Optional[int] = None,
+              end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read the stored readings of one sensor.
+
+        Args:
+            machine_id: Machine of the sensor
+            sensor_type: Sensor to read
+            start: First timestamp in milliseconds (default: oldest stored tick)
+            end: Last timestamp in milliseconds (default: newest stored tick)
+
+        Returns:
+            Tuple of timestamps (int64 milliseconds) and float32 values, oldest first
+        """
+        with self._lock:
+            row, col = self._cell(machine_id, sensor_type)
+            slots = self._slots(start, end)
+            return self.timestamps[slots], self.values[slots, row, col]
+
+    def window(self, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read the stored fleet matrices in a time range, e.g. to evaluate alarms over the last minutes.
+
+        Args:
+            start: First timestamp in milliseconds (default: oldest stored tick)
+            end: Last timestamp in milliseconds (default: newest stored tick)
+
+        Returns:
+            Tuple of timestamps and a (ticks x machines x sensors) float32 array, oldest first
+        """
+        with self._lock:
+            slots = self._slots(start, end)
+            return self.timestamps[slots], self.values[slots]
+
+    def downsample(self, machine_id: str, sensor_type: str, buckets: int, method: str = "avg",
+                   start: Optional[int] = None, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read one sensor reduced to at most ``buckets`` points.
+
+        ``avg``, ``min`` and ``max`` split the range into equal time buckets and
+        return each non-empty bucket's start time and aggregate, ignoring NaN.
+        ``lttb`` keeps ``buckets`` representative raw points.
+
+        Args:
+            machine_id: Machine of the sensor
+            sensor_type: Sensor to read
+            buckets: Number of buckets (or points for ``lttb``)
+            method: One of ``avg``, ``min``, ``max`` and ``lttb``
+            start: First timestamp in milliseconds (default: oldest stored tick)
+            end: Last timestamp in milliseconds (default: newest stored tick)
+
+        Returns:
+            Tuple of timestamps and float64 values
+        """
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"Unknown downsampling method {method!r}, expected one of {', '.join(DOWNSAMPLE_METHODS)}")
+        timestamps, values = self.query(machine_id, sensor_type, start, end)
+        present = ~np.isnan(values)
+        if method == "lttb":
+            return lttb(timestamps[present], values[present].astype(np.float64), buckets)
+        if len(timestamps) == 0:
+            return timestamps, values.astype(np.float64)
+
+        first = timestamps[0] if start is None else start
+        last = timestamps[-1] if end is None else end
+        width = max(1, -(-(last - first + 1) // buckets))
+        edges = first + width * np.arange(buckets)
+        bounds = np.searchsorted(timestamps, edges, side="left")
+        occupied = bounds < np.append(bounds[1:], len(timestamps))
+        edges, bounds = edges[occupied], bounds[occupied]
+
+        values = values.astype(np.float64)
+        if method == "min":
+            result = np.fmin.reduceat(values, bounds)
+        elif method == "max":
+            result = np.fmax.reduceat(values, bounds)
+        else:
+            sums = np.add.reduceat(np.where(present, values, 0.0), bounds)
+            counts = np.add.reduceat(present.astype(np.int64), bounds)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = np.where(counts > 0, sums / counts, np.nan)
+        return edges, result
@@ -0,0 +1,49 @@
+import numpy as np
+
+
+class SortedColumnIndex:
+    """
+    Sorted index over one numeric column for repeated threshold queries.
+
+    Sorting happens once; afterwards every ``<``, ``<=``, ``>`` or ``>=`` query is
+    answered with a binary search. Counts never touch the rows themselves and
+    matching row positions are a contiguous slice of the sort order. Missing
+    values never match a threshold, like pandas comparisons.
+    """
+
+    def __init__(self, values: np.ndarray):
+        """
+        Build the index.
+
+        Args:
+            values: Column values in row order
+        """
+        values = np.asarray(values, dtype=np.float64)
+        # NaN sorts to the end, so the valid values are a prefix of the order
+        self.order = np.argsort(values, kind='stable')
+        self.sorted_values = values[self.order]
+        self.valid = len(values) - int(np.count_nonzero(np.isnan(values)))
+
+    def __len__(self):
+        return len(self.order)
+
+    def _split(self, threshold: float, side: str) -> int:
+        """Position in the sort order where ``threshold`` would be inserted."""
+        return int(np.searchsorted(self.sorted_values[:self.valid], threshold, side=side))
+
+    def count_below(self, threshold: float, inclusive: bool = False) -> int:
+        """Count rows with value < threshold (or <= when inclusive)."""
+        return self._split(threshold, 'right' if inclusive else 'left')
+
+    def count_above(self, threshold: float, inclusive: bool = False) -> int:
+        """Count rows with value > threshold (or >= when inclusive)."""
+        return self.valid - self._split(threshold, 'left' if inclusive else 'right')
+
+    def positions_below(self, threshold: float, inclusive: bool = False) -> np.ndarray:
+        """Row positions with value < threshold (or <= when inclusive), in row order."""
+        return np.sort(self.order[:self.count_below(threshold, inclusive)])
+
+    def positions_above(self, threshold: float, inclusive: bool = False) -> np.ndarray:
+        """Row positions with value > threshold (or >= when inclusive), in row order."""
+        start = self._split(threshold, 'left' if inclusive else 'right')
+        return np.sort(self.order[start:self.valid])
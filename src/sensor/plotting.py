@@ -0,0 +1,239 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.sensor.correlation import CorrelationService
+from src.sensor.sensor import REFERENCE_YEAR
+
+# Above this many columns the heatmap is drawn without per-cell labels
+ANNOTATION_LIMIT = 30
+
+PLOT_FILES = {
+    "machine_types": "machine_types.png",
+    "remaining_life": "remaining_life.png",
+    "temp_vs_vibration": "temp_vs_vibration.png",
+    "age_vs_remaining_life": "age_vs_remaining_life.png",
+    "correlation_heatmap": "correlation_heatmap.png",
+}
+
+
+def _finite_range(values: np.ndarray):
+    """Get the (min, max) of the finite values, widened when all values are equal."""
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return 0.0, 1.0
+    low, high = float(finite.min()), float(finite.max())
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return low, high
+
+
+def _binned_counts(x: np.ndarray, y: np.ndarray, bins: int):
+    """Bin (x, y) pairs into a 2D grid, ignoring rows with missing values."""
+    valid = np.isfinite(x) & np.isfinite(y)
+    x_range = _finite_range(x[valid])
+    y_range = _finite_range(y[valid])
+    counts, x_edges, y_edges = np.histogram2d(x[valid], y[valid], bins=bins,
+                                              range=[x_range, y_range])
+    return counts, x_edges, y_edges
+
+
+def aggregate_machine_health(data: pd.DataFrame, correlation: CorrelationService,
+                             bins: int = 200, failure_sample: int = 5000,
+                             current_year: int = REFERENCE_YEAR, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """
+    Reduce the machine health dataset to small per-plot aggregates.
+
+    The returned payloads only hold binned counts, sampled points and the
+    correlation matrix, so their size does not depend on the number of rows.
+
+    Args:
+        data: Machine records as loaded by SensorDataAnalyzer
+        correlation: Correlation service built over the same records
+        bins: Number of bins per axis for the 2D density plots
+        failure_sample: Maximum number of failure points overlaid on the density plot
+        current_year: Year used to compute machine age
+        seed: Seed for the failure point sample
+
+    Returns:
+        Dictionary mapping plot names to their aggregated payloads
+    """
+    payloads = {}
+
+    # Plot 1: Machine types distribution
+    machine_counts = data['Machine_Type'].value_counts().sort_values(ascending=False)
+    payloads["machine_types"] = {
+        "labels": [str(label) for label in machine_counts.index],
+        "counts": machine_counts.to_numpy(),
+    }
+
+    # Plot 2: Remaining Useful Life Distribution
+    remaining_life = data['Remaining_Useful_Life_days'].to_numpy(dtype=np.float64)
+    counts, edges = np.histogram(remaining_life[np.isfinite(remaining_life)], bins=30)
+    payloads["remaining_life"] = {"counts": counts, "edges": edges}
+
+    # Plot 3: Temperature vs Vibration density with sampled failure points
+    temperature = data['Temperature_C'].to_numpy(dtype=np.float64)
+    vibration = data['Vibration_mms'].to_numpy(dtype=np.float64)
+    failure_rows = np.flatnonzero(data['Failure_Within_7_Days'].to_numpy(dtype=bool))
+    if len(failure_rows) > failure_sample:
+        rng = np.random.default_rng(seed)
+        failure_rows = np.sort(rng.choice(failure_rows, size=failure_sample, replace=False))
+    counts, x_edges, y_edges = _binned_counts(temperature, vibration, bins)
+    payloads["temp_vs_vibration"] = {
+        "counts": counts,
+        "x_edges": x_edges,
+        "y_edges": y_edges,
+        "failure_x": temperature[failure_rows],
+        "failure_y": vibration[failure_rows],
+        "failure_total": int(data['Failure_Within_7_Days'].sum()),
+    }
+
+    # Plot 4: Machine Age vs Remaining Life, colored by mean operational hours per bin
+    age = current_year - data['Installation_Year'].to_numpy(dtype=np.float64)
+    hours = data['Operational_Hours'].to_numpy(dtype=np.float64)
+    valid = np.isfinite(age) & np.isfinite(remaining_life) & np.isfinite(hours)
+    counts, x_edges, y_edges = _binned_counts(age[valid], remaining_life[valid], bins)
+    hour_sums, _, _ = np.histogram2d(age[valid], remaining_life[valid], bins=[x_edges, y_edges],
+                                     weights=hours[valid])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_hours = np.where(counts > 0, hour_sums / counts, np.nan)
+    payloads["age_vs_remaining_life"] = {
+        "mean_hours": mean_hours,
+        "x_edges": x_edges,
+        "y_edges": y_edges,
+    }
+
+    # Plot 5: Correlation heatmap
+    matrix = correlation.correlation_matrix(columns=[
+        column for column in correlation.columns if column != 'Failure_Within_7_Days'])
+    payloads["correlation_heatmap"] = {
+        "matrix": matrix.to_numpy(),
+        "columns": list(matrix.columns),
+    }
+
+    return payloads
+
+
+def render_plot(name: str, payload: Dict[str, Any], output_path: Optional[str]) -> Optional[str]:
+    """
+    Render one aggregated plot. Runs inside a worker process.
+
+    Args:
+        name: Plot name, one of PLOT_FILES
+        payload: Aggregated payload produced by aggregate_machine_health
+        output_path: File to save the figure to, or None to discard it
+
+    Returns:
+        The path of the saved figure, or None
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    if name == "machine_types":
+        plt.figure(figsize=(12, 6))
+        positions = np.arange(len(payload["labels"]))
+        plt.bar(positions, payload["counts"], color='skyblue')
+        plt.title('Distribution of Machine Types')
+        plt.xlabel('Machine Type')
+        plt.ylabel('Count')
+        plt.xticks(positions, payload["labels"], rotation=90)
+        plt.tight_layout()
+
+    elif name == "remaining_life":
+        plt.figure(figsize=(10, 6))
+        edges = payload["edges"]
+        plt.hist(edges[:-1], bins=edges, weights=payload["counts"], color='green', alpha=0.7)
+        plt.title('Distribution of Remaining Useful Life')
+        plt.xlabel('Days')
+        plt.ylabel('Count')
+        plt.grid(True, alpha=0.3)
+
+    elif name == "temp_vs_vibration":
+        plt.figure(figsize=(10, 8))
+        counts = np.ma.masked_equal(payload["counts"].T, 0)
+        plt.pcolormesh(payload["x_edges"], payload["y_edges"], counts,
+                       cmap='Blues', norm=LogNorm() if counts.count() else None)
+        plt.colorbar(label='Machines per bin')
+        plt.scatter(payload["failure_x"], payload["failure_y"], s=4, alpha=0.7, color='red',
+                    label=f'Failure Within 7 Days ({len(payload["failure_x"])} of '
+                          f'{payload["failure_total"]} shown)')
+        plt.title('Temperature vs Vibration by Failure Risk')
+        plt.xlabel('Temperature (°C)')
+        plt.ylabel('Vibration (mm/s)')
+        plt.legend()
+        plt.grid(True, alpha=0.3)
+
+    elif name == "age_vs_remaining_life":
+        plt.figure(figsize=(10, 6))
+        mean_hours = np.ma.masked_invalid(payload["mean_hours"].T)
+        plt.pcolormesh(payload["x_edges"], payload["y_edges"], mean_hours, cmap='viridis')
+        plt.colorbar(label='Mean Operational Hours')
+        plt.title('Machine Age vs Remaining Useful Life')
+        plt.xlabel('Age (Years)')
+        plt.ylabel('Remaining Useful Life (Days)')
+        plt.grid(True, alpha=0.3)
+
+    elif name == "correlation_heatmap":
+        plt.figure(figsize=(12, 10))
+        matrix = payload["matrix"]
+        columns = payload["columns"]
+        plt.imshow(matrix, cmap='coolwarm', vmin=-1, vmax=1)
+        plt.colorbar(label='Correlation Coefficient')
+        plt.title('Correlation Between Machine Metrics')
+
+        if len(columns) <= ANNOTATION_LIMIT:
+            for i in range(len(columns)):
+                for j in range(len(columns)):
+                    plt.text(i, j, f"{matrix[i, j]:.2f}", ha='center', va='center',
+                             color='white' if abs(matrix[i, j]) > 0.5 else 'black')
+
+        plt.xticks(range(len(columns)), columns, rotation=90)
+        plt.yticks(range(len(columns)), columns)
+        plt.tight_layout()
+
+    else:
+        raise ValueError(f"Unknown plot: {name}")
+
+    if output_path:
+        plt.savefig(output_path)
+    plt.close()
+    return output_path
+
+
+def render_machine_health(data: pd.DataFrame, correlation: CorrelationService,
+                          output_dir: str = None, workers: int = None,
+                          **aggregate_options) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregate the machine health plots in this process and render them in parallel.
+
+    Args:
+        data: Machine records as loaded by SensorDataAnalyzer
+        correlation: Correlation service built over the same records
+        output_dir: Directory to save the figures to, or None to skip saving
+        workers: Number of worker processes (defaults to one per plot)
+        **aggregate_options: Extra options passed to aggregate_machine_health
+
+    Returns:
+        The aggregated payloads the figures were rendered from
+    """
+    payloads = aggregate_machine_health(data, correlation, **aggregate_options)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    max_workers = workers or min(len(payloads), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(render_plot, name, payload,
+                        os.path.join(output_dir, PLOT_FILES[name]) if output_dir else None)
+            for name, payload in payloads.items()
+        ]
+        for future in futures:
+            future.result()
+
+    return payloads
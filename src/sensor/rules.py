@@ -0,0 +1,346 @@
+import json
+import re
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from src.sensor.topk import top_k_indices
+
+# pandas is only needed for chunked scoring and is imported on first use
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Rows evaluated at a time: every term of a chunk runs while its columns are still in cache,
+# and the scratch buffers stay this small however long the input is
+CHUNK_ROWS = 65536
+# Rows read at a time from a CSV
+CSV_CHUNK_ROWS = 1_000_000
+
+# Maintenance risk of the analyzer CSV schema (SensorDataAnalyzer)
+BATCH_RISK_RULES = {
+    "name": "batch maintenance risk",
+    "risk": [
+        {"when": "Remaining_Useful_Life_days < 30", "weight": 5},
+        {"when": "Failure_Within_7_Days", "weight": 10},
+        {"when": "Temperature_C > 75", "weight": 2},
+        {"when": "Vibration_mms > 15", "weight": 3},
+        {"when": "Last_Maintenance_Days_Ago > 300", "weight": 2},
+        {"add": "Error_Codes_Last_30_Days"},
+        {"add": "Failure_History_Count"},
+    ],
+    "critical": [
+        "Failure_Within_7_Days",
+        "Remaining_Useful_Life_days < 30",
+        "Temperature_C > 80 and Vibration_mms > 15",
+        "Error_Codes_Last_30_Days > 5",
+    ],
+}
+
+# Maintenance risk of the live per-machine features (StreamingAnalyzer)
+LIVE_RISK_RULES = {
+    "name": "live maintenance risk",
+    "risk": [
+        {"add": "Out_Of_Range_Now", "weight": 5},
+        {"add": "Safety_Trips", "weight": 10},
+        {"add": "Running_High", "weight": 3},
+        {"add": "Abnormal_Events", "weight": 2},
+        {"add": "Out_Of_Range_Total"},
+    ],
+    "critical": [
+        "Out_Of_Range_Now > 0",
+        "Safety_Trips > 0",
+        "Running_High >= 3",
+    ],
+}
+
+_OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+_COMPARISON = re.compile(r"^\s*([A-Za-z_]\w*)\s*(?:(<=|>=|==|!=|<|>)\s*(\S+))?\s*$")
+
+
+def parse_condition(text: str) -> List[Tuple[Any, str, float]]:
+    """
+    Parse a condition such as ``Temperature_C > 80 and Vibration_mms > 15``.
+
+    A condition is one or more comparisons of a column with a number joined by
+    ``and``; a bare column name means the column is non-zero (true).
+
+    Returns:
+        List of ``(ufunc, column, value)`` comparisons that must all hold; the
+        ufunc is None for a bare column
+    """
+    comparisons = []
+    for part in re.split(r"\s+and\s+", text.strip()):
+        match = _COMPARISON.match(part)
+        if match is None:
+            raise ValueError(f"Cannot parse condition {part!r} in {text!r}")
+        column, operator, value = match.groups()
+        if operator is None:
+            comparisons.append((None, column, None))
+            continue
+        try:
+            comparisons.append((_OPERATORS[operator], column, float(value)))
+        except ValueError:
+            raise ValueError(f"Expected a number after {operator!r} in {text!r}") from None
+    return comparisons
+
+
+def _as_array(values) -> np.ndarray:
+    """Get a column as a numpy array without copying where possible."""
+    return values.to_numpy() if hasattr(values, "to_numpy") else np.asarray(values)
+
+
+class RiskRules:
+    """
+    Risk score and critical condition rules compiled into one fused evaluator.
+
+    Rules are declared as data, e.g. in a JSON file::
+
+        {"risk": [{"when": "Temperature_C > 75", "weight": 2},
+                  {"add": "Error_Codes_Last_30_Days"}],
+         "critical": ["Failure_Within_7_Days", "Temperature_C > 80 and Vibration_mms > 15"]}
+
+    A ``when`` term adds its weight where its condition holds; an ``add`` term
+    adds a column times its weight (default 1). A row is critical when any of
+    the ``critical`` conditions holds.
+
+    The rules are parsed once into a flat list of numpy ufunc steps. Input is
+    evaluated in chunks of ``CHUNK_ROWS`` rows: every step writes into the
+    output slice or into two reused scratch buffers, so no column-sized
+    temporary is allocated per term, and a chunk's columns stay in cache while
+    all terms run over them. ``score_chunks`` and ``score_csv`` apply the rules
+    to inputs that do not fit in memory, keeping only the top rows.
+    """
+
+    def __init__(self, risk: List[Dict[str, Any]] = (), critical: List[str] = (), name: str = ""):
+        """
+        Compile a rule set.
+
+        Args:
+            risk: Risk terms, each ``{"when": condition, "weight": w}`` or ``{"add": column, "weight": w}``
+            critical: Conditions any of which makes a row critical
+            name: Name of the rule set
+        """
+        self.name = name
+        self._conditions: List[Tuple[List[Tuple[Any, str, float]], float]] = []
+        self._linear: List[Tuple[str, float]] = []
+        for term in risk:
+            weight = term.get("weight", 1)
+            if "when" in term:
+                self._conditions.append((parse_condition(term["when"]), weight))
+            elif "add" in term:
+                self._linear.append((term["add"], weight))
+            else:
+                raise ValueError(f"Risk term {term!r} needs 'when' or 'add'")
+        self._critical = [parse_condition(condition) for condition in critical]
+        self._integral_weights = all(float(weight).is_integer()
+                                     for _, weight in self._conditions + self._linear)
+
+        columns = [column for comparisons, _ in self._conditions for _, column, _ in comparisons]
+        columns += [column for column, _ in self._linear]
+        columns += [column for comparisons in self._critical for _, column, _ in comparisons]
+        self.columns = list(dict.fromkeys(columns))
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any]) -> "RiskRules":
+        """Compile a rule set from its dictionary form."""
+        return cls(spec.get("risk", []), spec.get("critical", []), spec.get("name", ""))
+
+    @classmethod
+    def load(cls, path: str) -> "RiskRules":
+        """Load and compile a rule set from a JSON file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            rules = cls.from_dict(json.load(f))
+        rules.name = rules.name or path
+        return rules
+
+    def _arrays(self, columns: Mapping[str, Any]) -> Tuple[Dict[str, np.ndarray], int]:
+        arrays = {}
+        for column in self.columns:
+            try:
+                arrays[column] = _as_array(columns[column])
+            except KeyError:
+                raise KeyError(f"Risk rules '{self.name}' need column {column!r}") from None
+        lengths = {len(array) for array in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns of different lengths: {sorted(lengths)}")
+        return arrays, lengths.pop() if lengths else 0
+
+    def _score_dtype(self, arrays: Dict[str, np.ndarray]):
+        """Integer scores when every weight and added column is integral, float otherwise."""
+        if self._integral_weights and all(arrays[column].dtype.kind in "biu" for column, _ in self._linear):
+            return np.int64
+        return np.float64
+
+    @staticmethod
+    def _compare(ufunc, values: np.ndarray, value, out: np.ndarray):
+        if ufunc is not None:
+            ufunc(values, value, out=out)
+        elif values.dtype == bool:
+            np.copyto(out, values)
+        else:
+            np.not_equal(values, 0, out=out)
+
+    def _condition(self, comparisons, chunk: Dict[str, np.ndarray], out: np.ndarray, scratch: np.ndarray):
+        """Evaluate an ``and`` of comparisons into ``out``."""
+        ufunc, column, value = comparisons[0]
+        self._compare(ufunc, chunk[column], value, out)
+        for ufunc, column, value in comparisons[1:]:
+            self._compare(ufunc, chunk[column], value, scratch)
+            np.logical_and(out, scratch, out=out)
+
+    @staticmethod
+    def _add(out: np.ndarray, values: np.ndarray, weight: float, product: np.ndarray):
+        """Add ``values * weight`` to ``out`` in place."""
+        if weight == 1:
+            np.add(out, values, out=out, casting="unsafe")
+        else:
+            np.multiply(values, weight, out=product, casting="unsafe")
+            np.add(out, product, out=out)
+
+    def evaluate(self, columns: Mapping[str, Any], score: bool = True,
+                 critical: bool = True) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Evaluate the rules over whole columns.
+
+        Args:
+            columns: DataFrame or mapping of column names to equally long arrays
+            score: Compute the risk scores
+            critical: Compute the critical flags
+
+        Returns:
+            Tuple of the risk scores and the boolean critical flags (None for the parts not asked for)
+        """
+        arrays, rows = self._arrays(columns)
+        scores = np.zeros(rows, dtype=self._score_dtype(arrays)) if score else None
+        flags = np.zeros(rows, dtype=bool) if critical else None
+        size = min(rows, CHUNK_ROWS)
+        mask, scratch = np.empty(size, dtype=bool), np.empty(size, dtype=bool)
+        product = np.empty(size, dtype=scores.dtype) if score else None
+
+        for start in range(0, rows, CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, rows)
+            n = stop - start
+            chunk = {column: array[start:stop] for column, array in arrays.items()}
+            chunk_mask, chunk_scratch = mask[:n], scratch[:n]
+            if score:
+                out = scores[start:stop]
+                # Masks and columns are weighted into one reused buffer (a masked ``where=`` add is far slower)
+                for comparisons, weight in self._conditions:
+                    self._condition(comparisons, chunk, chunk_mask, chunk_scratch)
+                    self._add(out, chunk_mask, weight, product[:n])
+                for column, weight in self._linear:
+                    self._add(out, chunk[column], weight, product[:n])
+            if critical and self._critical:
+                out = flags[start:stop]
+                self._condition(self._critical[0], chunk, out, chunk_scratch)
+                for comparisons in self._critical[1:]:
+                    self._condition(comparisons, chunk, chunk_mask, chunk_scratch)
+                    np.logical_or(out, chunk_mask, out=out)
+        return scores, flags
+
+    def score(self, columns: Mapping[str, Any]) -> np.ndarray:
+        """Risk score of every row."""
+        return self.evaluate(columns, critical=False)[0]
+
+    def critical(self, columns: Mapping[str, Any]) -> np.ndarray:
+        """Boolean flag of every row that is in critical condition."""
+        return self.evaluate(columns, score=False)[1]
+
+    def score_chunks(self, chunks: Iterable['pd.DataFrame'], top: int = 20) -> Dict[str, Any]:
+        """
+        Score a stream of DataFrame chunks, keeping only the highest-risk rows.
+
+        Args:
+            chunks: DataFrames with the rule columns (e.g. ``pd.read_csv(..., chunksize=...)``)
+            top: Number of highest-risk rows to keep
+
+        Returns:
+            Dictionary with the number of rows, the number of critical rows and
+            ``report``, the top rows with their Risk_Score, highest first
+        """
+        import pandas as pd
+
+        rows = critical = 0
+        candidates = []
+        for chunk in chunks:
+            scores, flags = self.evaluate(chunk)
+            positions = top_k_indices(scores, top)
+            candidates.append(chunk.iloc[positions].assign(Risk_Score=scores[positions]))
+            rows += len(chunk)
+            critical += int(np.count_nonzero(flags))
+        report = pd.concat(candidates, ignore_index=True) if candidates else pd.DataFrame(columns=["Risk_Score"])
+        report = report.iloc[top_k_indices(report["Risk_Score"].to_numpy(), top)].reset_index(drop=True)
+        return {"rows": rows, "critical": critical, "report": report}
+
+    def score_csv(self, path: str, top: int = 20, chunksize: int = CSV_CHUNK_ROWS,
+                  keep: Iterable[str] = ("Machine_ID", "Machine_Type")) -> Dict[str, Any]:
+        """
+        Score a CSV file chunk by chunk, reading only the columns the rules and the report need.
+
+        Args:
+            path: CSV file
+            top: Number of highest-risk rows to keep
+            chunksize: Rows read at a time
+            keep: Extra columns to include in the report where the file has them
+
+        Returns:
+            Result of score_chunks plus the elapsed time in seconds
+        """
+        import pandas as pd
+
+        start = time.perf_counter()
+        header = list(pd.read_csv(path, nrows=0).columns)
+        usecols = [column for column in header if column in self.columns or column in keep]
+        result = self.score_chunks(pd.read_csv(path, usecols=usecols, chunksize=chunksize), top)
+        result["elapsed_s"] = round(time.perf_counter() - start, 3)
+        return result
+
+
+_compiled: Dict[Any, RiskRules] = {}
+
+
+def batch_rules(life_threshold: float = 30, temperature_threshold: float = 80,
+                vibration_threshold: float = 15, error_threshold: int = 5) -> RiskRules:
+    """Compiled BATCH_RISK_RULES, with the critical thresholds replaced by the given ones."""
+    key = ("batch", life_threshold, temperature_threshold, vibration_threshold, error_threshold)
+    if key not in _compiled:
+        spec = dict(BATCH_RISK_RULES, critical=[
+            "Failure_Within_7_Days",
+            f"Remaining_Useful_Life_days < {life_threshold}",
+            f"Temperature_C > {temperature_threshold} and Vibration_mms > {vibration_threshold}",
+            f"Error_Codes_Last_30_Days > {error_threshold}",
+        ])
+        _compiled[key] = RiskRules.from_dict(spec)
+    return _compiled[key]
+
+
+def live_rules() -> RiskRules:
+    """Compiled LIVE_RISK_RULES."""
+    if "live" not in _compiled:
+        _compiled["live"] = RiskRules.from_dict(LIVE_RISK_RULES)
+    return _compiled["live"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score an analyzer CSV chunk by chunk with a risk rule set")
+    parser.add_argument("csv_path", help="CSV file in the analyzer schema")
+    parser.add_argument("--rules", default=None, help="JSON rule set (default: the built-in batch rules)")
+    parser.add_argument("--top", type=int, default=10, help="Number of highest-risk machines to print")
+    parser.add_argument("--chunksize", type=int, default=CSV_CHUNK_ROWS, help="Rows read at a time")
+    args = parser.parse_args()
+
+    rules = RiskRules.load(args.rules) if args.rules else batch_rules()
+    result = rules.score_csv(args.csv_path, top=args.top, chunksize=args.chunksize)
+    print(f"Scored {result['rows']:,} rows with '{rules.name}' in {result['elapsed_s']}s: "
+          f"{result['critical']:,} in critical condition")
+    print(result["report"].to_string(index=False))
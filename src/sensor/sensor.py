@@ -2,10 +2,18 @@ from dataclasses import dataclass
 from typing import List, Optional, Dict, Tuple
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
 import os
 
+from src.sensor.cache import ColumnarCache
+from src.sensor.correlation import CorrelationService
+from src.sensor.indexes import SortedColumnIndex
+from src.sensor.rules import RiskRules, batch_rules
+from src.sensor.topk import BoundedTopK
+
+# Reference year for machine age
+REFERENCE_YEAR = 2025
+
 @dataclass
 class Sensor:
     Machine_ID: str
@@ -31,24 +39,100 @@ class Sensor:
     Heat_Index: Optional[float]
     AI_Override_Events: int
 
+# Datasets larger than this are plotted as binned densities in 'auto' mode
+AGGREGATED_PLOT_ROWS = 100_000
+
+MAINTENANCE_REPORT_COLUMNS = ['Machine_ID', 'Machine_Type', 'Risk_Score', 'Remaining_Useful_Life_days', 
+                              'Failure_Within_7_Days', 'Temperature_C', 'Vibration_mms', 
+                              'Last_Maintenance_Days_Ago', 'Error_Codes_Last_30_Days']
+
 class SensorDataAnalyzer:
     """Class to analyze factory sensor data and provide insights."""
     
-    def __init__(self, csv_path: str):
-        """Initialize with the path to the CSV file."""
+    def __init__(self, csv_path: str, use_cache: bool = True, cache_dir: str = None,
+                 rules: Optional[RiskRules] = None):
+        """
+        Initialize with the path to the CSV file.
+        
+        Args:
+            csv_path: Path to the CSV file
+            use_cache: Load through a memory-mapped columnar cache of the CSV
+            cache_dir: Directory of the cache (defaults to .sensor_cache next to the CSV)
+            rules: Rule set for risk scores and critical machines (default: the built-in
+                batch rules, whose critical machines are found with the sorted column indexes)
+        """
         self.csv_path = csv_path
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.rules = rules if rules is not None else batch_rules()
+        self._custom_rules = rules is not None
         self.data = None
+        self.correlation = None
+        self.maintenance_top = None
+        self.indexes = {}
         self.load_data()
     
-    def load_data(self):
-        """Load the sensor data from CSV file."""
-        self.data = pd.read_csv(self.csv_path)
+    @staticmethod
+    def _prepare(data: pd.DataFrame) -> pd.DataFrame:
+        """Normalize column types of freshly parsed records."""
         # Convert AI_Supervision to boolean
-        self.data['AI_Supervision'] = self.data['AI_Supervision'].astype(bool)
+        data['AI_Supervision'] = data['AI_Supervision'].astype(bool)
         # Convert Failure_Within_7_Days to boolean
-        self.data['Failure_Within_7_Days'] = self.data['Failure_Within_7_Days'].astype(bool)
+        data['Failure_Within_7_Days'] = data['Failure_Within_7_Days'].astype(bool)
+        return data
+    
+    def load_data(self):
+        """Load the sensor data from CSV file."""
+        if self.use_cache:
+            try:
+                self.data = ColumnarCache(self.csv_path, self.cache_dir, prepare=self._prepare).load()
+            except OSError as e:
+                print(f"Columnar cache unavailable ({e}), reading CSV directly")
+                self.data = self._prepare(pd.read_csv(self.csv_path))
+        else:
+            self.data = self._prepare(pd.read_csv(self.csv_path))
+        self.correlation = None
+        self.maintenance_top = None
+        self.indexes = {}
         print(f"Loaded {len(self.data)} machine records from {self.csv_path}")
     
+    def append_data(self, new_rows: pd.DataFrame):
+        """Append newly arrived machine records without rescanning existing ones."""
+        new_rows = self._prepare(new_rows.copy())
+        if self.maintenance_top is not None:
+            # Only the new rows are scored; they compete with the kept top-K
+            scores = self.rules.score(new_rows)
+            new_rows['Risk_Score'] = scores
+            self.maintenance_top.push_many(scores, np.arange(len(self.data), len(self.data) + len(new_rows)))
+        self.data = pd.concat([self.data, new_rows], ignore_index=True)
+        if self.correlation is not None:
+            self.correlation.update(self._correlation_frame(new_rows))
+        self.indexes = {}
+    
+    def get_index(self, column: str) -> SortedColumnIndex:
+        """Get the sorted threshold index of a column, building it once per load."""
+        if column not in self.indexes:
+            self.indexes[column] = SortedColumnIndex(self.data[column].to_numpy(dtype=np.float64))
+        return self.indexes[column]
+    
+    def get_correlation_service(self) -> CorrelationService:
+        """Get the correlation moments of the loaded data, building them on first use."""
+        if self.correlation is None:
+            frame = self._correlation_frame(self.data)
+            self.correlation = CorrelationService.from_frame(frame, columns=list(frame.columns))
+        return self.correlation
+    
+    def _correlation_frame(self, rows: pd.DataFrame, current_year: int = REFERENCE_YEAR) -> pd.DataFrame:
+        """
+        Columns correlated with failure: the numeric columns, the derived Age and Risk_Score
+        (always included, as the full analysis computes them before ranking), then Failure_Within_7_Days.
+        """
+        numeric_cols = [col for col in rows.select_dtypes(include=['number']).columns
+                        if col not in ('Age', 'Risk_Score')]
+        risk_score = rows['Risk_Score'] if 'Risk_Score' in rows else self.rules.score(rows)
+        return rows[numeric_cols].assign(Age=current_year - rows['Installation_Year'], Risk_Score=risk_score,
+                                         Failure_Within_7_Days=rows['Failure_Within_7_Days'])
+    
     def get_summary_statistics(self):
         """Get summary statistics of the sensor data."""
         numeric_cols = self.data.select_dtypes(include=['number']).columns
@@ -60,9 +144,14 @@ class SensorDataAnalyzer:
     
     def get_failure_risk_machines(self, days_threshold: int = 7):
         """Get machines that are at risk of failure within specified days."""
-        return self.data[self.data['Remaining_Useful_Life_days'] <= days_threshold]
+        index = self.get_index('Remaining_Useful_Life_days')
+        return self.data.iloc[index.positions_below(days_threshold, inclusive=True)]
+    
+    def count_failure_risk_machines(self, days_threshold: int = 7) -> int:
+        """Count machines at risk of failure within specified days."""
+        return self.get_index('Remaining_Useful_Life_days').count_below(days_threshold, inclusive=True)
     
-    def get_machines_by_age(self, current_year: int = 2025):
+    def get_machines_by_age(self, current_year: int = REFERENCE_YEAR):
         """Group machines by age categories."""
         self.data['Age'] = current_year - self.data['Installation_Year']
         age_bins = [0, 5, 10, 15, 20, 25, float('inf')]
@@ -72,37 +161,70 @@ class SensorDataAnalyzer:
     
     def get_maintenance_needed_machines(self, days_threshold: int = 180):
         """Get machines that haven't been maintained in a long time."""
-        return self.data[self.data['Last_Maintenance_Days_Ago'] > days_threshold]
+        index = self.get_index('Last_Maintenance_Days_Ago')
+        return self.data.iloc[index.positions_above(days_threshold)]
+    
+    def count_maintenance_needed_machines(self, days_threshold: int = 180) -> int:
+        """Count machines that haven't been maintained in a long time."""
+        return self.get_index('Last_Maintenance_Days_Ago').count_above(days_threshold)
     
     def analyze_failure_correlation(self):
         """Analyze correlation between various factors and failure probability."""
-        failure_data = self.data.copy()
+        # Rank every numeric column by its correlation with Failure_Within_7_Days
+        return self.get_correlation_service().correlations_with('Failure_Within_7_Days')
+    
+    def _critical_positions(self, life_threshold: float, temperature_threshold: float,
+                            vibration_threshold: float, error_threshold: int) -> np.ndarray:
+        """Row positions of critical machines, combined from the threshold indexes for the built-in rules."""
+        if self._custom_rules:
+            return np.flatnonzero(self.rules.critical(self.data))
+        # Failure_Within_7_Days is boolean, so its index splits at 0.5
+        failing = self.get_index('Failure_Within_7_Days').positions_above(0.5)
+        short_life = self.get_index('Remaining_Useful_Life_days').positions_below(life_threshold)
+        many_errors = self.get_index('Error_Codes_Last_30_Days').positions_above(error_threshold)
+        hot = self.get_index('Temperature_C').positions_above(temperature_threshold)
+        hot_and_shaking = hot[self.data['Vibration_mms'].to_numpy()[hot] > vibration_threshold]
+        return np.union1d(np.union1d(failing, short_life), np.union1d(many_errors, hot_and_shaking))
+    
+    def get_critical_machines(self, life_threshold: float = 30, temperature_threshold: float = 80,
+                              vibration_threshold: float = 15, error_threshold: int = 5):
+        """
+        Get machines that are in critical condition (multiple warning signs).
+        
+        The thresholds are those of the built-in rules; an analyzer given its own
+        rule set flags the rows matching the set's critical conditions instead.
+        """
+        return self.data.iloc[self._critical_positions(
+            life_threshold, temperature_threshold, vibration_threshold, error_threshold)]
+    
+    def count_critical_machines(self, life_threshold: float = 30, temperature_threshold: float = 80,
+                                vibration_threshold: float = 15, error_threshold: int = 5) -> int:
+        """Count machines in critical condition without copying their rows."""
+        return len(self._critical_positions(
+            life_threshold, temperature_threshold, vibration_threshold, error_threshold))
+    
+    def visualize_machine_health(self, output_dir: str = None, mode: str = 'auto', workers: int = None):
+        """
+        Create visualizations of machine health metrics.
+        
+        Args:
+            output_dir: Directory to save the figures to
+            mode: 'exact' plots every row, 'aggregated' plots binned densities rendered
+                in parallel worker processes, 'auto' picks based on the dataset size
+            workers: Number of worker processes used in aggregated mode
+        """
+        if mode == 'auto':
+            mode = 'aggregated' if len(self.data) > AGGREGATED_PLOT_ROWS else 'exact'
+        if mode == 'aggregated':
+            from src.sensor.plotting import render_machine_health
+            render_machine_health(self.data, self.get_correlation_service(), output_dir, workers=workers)
+            return
+        if mode != 'exact':
+            raise ValueError(f"Unknown visualization mode: {mode}")
         
-        # Calculate correlation with Failure_Within_7_Days
-        numeric_cols = failure_data.select_dtypes(include=['number']).columns
-        correlations = {}
-        for col in numeric_cols:
-            if col != 'Failure_Within_7_Days':
-                correlations[col] = failure_data[col].corr(failure_data['Failure_Within_7_Days'].astype(int))
+        # pyplot is the slowest import of the analyzer, load it only to plot
+        import matplotlib.pyplot as plt
         
-        # Sort correlations by absolute value
-        sorted_correlations = {k: v for k, v in sorted(correlations.items(), 
-                                                      key=lambda item: abs(item[1]), 
-                                                      reverse=True)}
-        return sorted_correlations
-    
-    def get_critical_machines(self):
-        """Get machines that are in critical condition (multiple warning signs)."""
-        critical = self.data[
-            (self.data['Failure_Within_7_Days'] == True) | 
-            (self.data['Remaining_Useful_Life_days'] < 30) |
-            ((self.data['Temperature_C'] > 80) & (self.data['Vibration_mms'] > 15)) |
-            (self.data['Error_Codes_Last_30_Days'] > 5)
-        ]
-        return critical
-    
-    def visualize_machine_health(self, output_dir: str = None):
-        """Create visualizations of machine health metrics."""
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
         
@@ -151,7 +273,7 @@ class SensorDataAnalyzer:
         
         # Plot 4: Machine Age vs Remaining Life
         plt.figure(figsize=(10, 6))
-        current_year = 2025
+        current_year = REFERENCE_YEAR
         self.data['Age'] = current_year - self.data['Installation_Year']
         
         plt.scatter(self.data['Age'], self.data['Remaining_Useful_Life_days'], 
@@ -168,8 +290,8 @@ class SensorDataAnalyzer:
         
         # Plot 5: Correlation heatmap
         plt.figure(figsize=(12, 10))
-        numeric_data = self.data.select_dtypes(include=['number'])
-        correlation = numeric_data.corr()
+        service = self.get_correlation_service()
+        correlation = service.correlation_matrix(columns=service.columns[:-1])
         
         plt.imshow(correlation, cmap='coolwarm')
         plt.colorbar(label='Correlation Coefficient')
@@ -188,30 +310,42 @@ class SensorDataAnalyzer:
             plt.savefig(f"{output_dir}/correlation_heatmap.png")
         plt.close()
     
-    def generate_maintenance_report(self):
+    def generate_maintenance_report(self, top: int = 20):
         """Generate a maintenance prioritization report."""
-        # Score each machine based on various risk factors
-        self.data['Risk_Score'] = (
-            (self.data['Remaining_Useful_Life_days'] < 30).astype(int) * 5 +
-            self.data['Failure_Within_7_Days'].astype(int) * 10 +
-            (self.data['Temperature_C'] > 75).astype(int) * 2 +
-            (self.data['Vibration_mms'] > 15).astype(int) * 3 +
-            (self.data['Last_Maintenance_Days_Ago'] > 300).astype(int) * 2 +
-            self.data['Error_Codes_Last_30_Days'] +
-            self.data['Failure_History_Count']
-        )
+        if self.maintenance_top is None or self.maintenance_top.k < top:
+            risk_score = self.rules.score(self.data)
+            self.data['Risk_Score'] = risk_score
+            # Partial selection of the top rows instead of sorting the whole frame
+            self.maintenance_top = BoundedTopK(top)
+            self.maintenance_top.push_many(risk_score, np.arange(len(risk_score)))
         
-        # Sort by risk score
-        maintenance_report = self.data.sort_values(by='Risk_Score', ascending=False)
-        columns = ['Machine_ID', 'Machine_Type', 'Risk_Score', 'Remaining_Useful_Life_days', 
-                  'Failure_Within_7_Days', 'Temperature_C', 'Vibration_mms', 
-                  'Last_Maintenance_Days_Ago', 'Error_Codes_Last_30_Days']
-        
-        return maintenance_report[columns].head(20)
+        positions = self.maintenance_top.keys()[:top]
+        return self.data.iloc[positions][MAINTENANCE_REPORT_COLUMNS]
 
-def analyze_factory_data(csv_path: str, output_dir: str = None):
-    """Analyze factory sensor data and generate reports and visualizations."""
-    analyzer = SensorDataAnalyzer(csv_path)
+def analyze_factory_data(csv_path: str, output_dir: str = None, visualization_mode: str = 'auto',
+                         workers: int = None, rules: Optional[RiskRules] = None):
+    """
+    Analyze factory sensor data and generate reports and visualizations.
+    
+    Args:
+        csv_path: Path to a CSV file, or a directory/glob of CSV files to analyze
+            as one partitioned dataset in a process pool
+        output_dir: Directory to save visualizations to (single-file mode only)
+        visualization_mode: Plotting mode passed to visualize_machine_health
+        workers: Number of worker processes in dataset mode
+        rules: Rule set for risk scores and critical machines (default: the built-in batch rules)
+    """
+    from src.sensor.dataset import analyze_dataset, is_dataset_path
+    
+    if is_dataset_path(csv_path):
+        results = analyze_dataset(csv_path, workers=workers, rules=rules)
+        _print_findings(results["rows"], results)
+        print(f"\nDataset mode: merged {results['partitions']} partitions")
+        if output_dir:
+            print("Visualizations are not generated in dataset mode")
+        return results
+    
+    analyzer = SensorDataAnalyzer(csv_path, rules=rules)
     
     # Generate reports
     summary = analyzer.get_summary_statistics()
@@ -223,41 +357,48 @@ def analyze_factory_data(csv_path: str, output_dir: str = None):
     maintenance_report = analyzer.generate_maintenance_report()
     failure_correlation = analyzer.analyze_failure_correlation()
     
-    # Print key findings
+    results = {
+        "summary": summary,
+        "machine_distribution": machine_distribution,
+        "failure_risk": failure_risk,
+        "age_distribution": age_distribution,
+        "maintenance_needed": maintenance_needed,
+        "critical_machines": critical_machines,
+        "maintenance_report": maintenance_report,
+        "failure_correlation": failure_correlation
+    }
+    _print_findings(len(analyzer.data), results)
+    
+    # Generate visualizations
+    if output_dir:
+        analyzer.visualize_machine_health(output_dir, mode=visualization_mode)
+        print(f"\nVisualizations saved to {output_dir}")
+    
+    return results
+
+def _print_findings(total: int, results: dict):
+    """Print key findings of an analysis report."""
+    def count(value):
+        return value if isinstance(value, int) else len(value)
+    
     print("\n=== FACTORY SENSOR DATA ANALYSIS ===")
-    print(f"\nTotal machines analyzed: {len(analyzer.data)}")
-    print(f"Machines at risk of failure within 7 days: {len(failure_risk)}")
-    print(f"Machines in critical condition: {len(critical_machines)}")
-    print(f"Machines needing maintenance: {len(maintenance_needed)}")
+    print(f"\nTotal machines analyzed: {total}")
+    print(f"Machines at risk of failure within 7 days: {count(results['failure_risk'])}")
+    print(f"Machines in critical condition: {count(results['critical_machines'])}")
+    print(f"Machines needing maintenance: {count(results['maintenance_needed'])}")
     
     print("\n=== TOP 10 PRIORITY MACHINES FOR MAINTENANCE ===")
-    print(maintenance_report.head(10))
+    print(results["maintenance_report"].head(10))
     
     print("\n=== MACHINE TYPE DISTRIBUTION ===")
-    print(machine_distribution)
+    print(results["machine_distribution"])
     
     print("\n=== MACHINE AGE DISTRIBUTION ===")
-    print(age_distribution)
+    print(results["age_distribution"])
     
     print("\n=== TOP FACTORS CORRELATED WITH FAILURE ===")
-    for factor, correlation in list(failure_correlation.items())[:10]:
+    for factor, correlation in list(results["failure_correlation"].items())[:10]:
         print(f"{factor}: {correlation:.4f}")
-    
-    # Generate visualizations
-    if output_dir:
-        analyzer.visualize_machine_health(output_dir)
-        print(f"\nVisualizations saved to {output_dir}")
-    
-    return {
-        "summary": summary,
-        "machine_distribution": machine_distribution,
-        "failure_risk": failure_risk,
-        "age_distribution": age_distribution,
-        "maintenance_needed": maintenance_needed,
-        "critical_machines": critical_machines,
-        "maintenance_report": maintenance_report,
-        "failure_correlation": failure_correlation
-    }
 
 if __name__ == "__main__":
     # Path to the CSV file
@@ -0,0 +1,288 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.thingsboard.fleet import FleetLayout, FleetTick
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "simulation_data/sensor_history.db"
+DEFAULT_QUEUE_SIZE = 4
+CACHE_KIB = 65536
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS machines (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    machine_type TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sensors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS readings (
+    machine INTEGER NOT NULL REFERENCES machines (id),
+    sensor INTEGER NOT NULL REFERENCES sensors (id),
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS readings_machine_ts ON readings (machine, ts);
+CREATE VIEW IF NOT EXISTS readings_named AS
+    SELECT machines.name AS machine, sensors.name AS sensor, readings.ts, readings.value
+    FROM readings
+    JOIN machines ON machines.id = readings.machine
+    JOIN sensors ON sensors.id = readings.sensor;
+"""
+
+_INSERT = "INSERT INTO readings (machine, sensor, ts, value) VALUES (?, ?, ?, ?)"
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open a connection in autocommit mode with WAL journaling and a large page cache."""
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # WAL commits stay consistent without an fsync each; only the last ticks can be lost on power failure
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(f"PRAGMA cache_size=-{CACHE_KIB}")
+    return connection
+
+
+class SQLiteSink:
+    """
+    Time-series sink writing every tick of the live SensorSimulator stream to SQLite.
+
+    Readings are stored in one narrow ``readings (machine, sensor, ts, value)``
+    table, with machines and sensors as integer keys into small lookup tables
+    (the ``readings_named`` view joins the names back for ad-hoc SQL). Rows are
+    appended in tick order and indexed on ``(machine, ts)``, which keeps each
+    commit to the table's tail plus one index page per machine, and answers
+    "one machine (or one of its sensors) over a time range" with a single
+    index range scan.
+
+    The tick thread only copies the tick's fleet matrix into a bounded queue. A
+    writer thread owns the connection and stores each tick in one transaction
+    with a single prepared ``executemany``; the database runs in WAL mode so
+    queries from other threads or processes never block the writer. When the
+    writer falls ``queue_size`` ticks behind, the tick loop waits for it rather
+    than losing readings.
+    """
+
+    def __init__(self, simulator=None, path: str = DEFAULT_DB_PATH, queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        Open (or create) the database and start the writer thread.
+
+        Args:
+            simulator: Optional SensorSimulator to subscribe to immediately
+            path: SQLite database file
+            queue_size: Ticks the writer may fall behind before the tick loop waits
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = connect(path)
+        self._connection.executescript(SCHEMA)
+        self._read_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._layout: Optional[FleetLayout] = None
+        self._keys: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self.stats = {"ticks": 0, "rows": 0, "write_ms": 0.0, "max_write_ms": 0.0, "waits": 0}
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sqlite-sink")
+        self._thread.start()
+        logger.info(f"Writing sensor readings to {path}")
+
+        if simulator is not None:
+            self.attach(simulator)
+
+    def attach(self, simulator):
+        """Subscribe to a simulator's per-tick output."""
+        simulator.add_tick_listener(self.on_tick)
+
+    def detach(self, simulator):
+        """Stop receiving ticks from a simulator."""
+        simulator.remove_tick_listener(self.on_tick)
+
+    def on_tick(self, tick: FleetTick):
+        """Queue a copy of the tick's fleet matrix for the writer."""
+        item = (tick.layout, tick.timestamp, np.array(tick.get_matrix(), dtype=np.float64))
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats["waits"] += 1
+            self._queue.put(item)
+
+    def _resolve(self, layout: FleetLayout):
+        """Register a layout's machines and sensors and precompute the keys of its valid cells."""
+        connection = self._connection
+        connection.execute("BEGIN")
+        try:
+            connection.executemany("INSERT OR IGNORE INTO machines (name, machine_type) VALUES (?, ?)",
+                                   zip(layout.machine_ids, layout.machine_types))
+            connection.executemany("INSERT OR IGNORE INTO sensors (name) VALUES (?)",
+                                   ((sensor,) for sensor in layout.sensor_types))
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        machine_key = dict(connection.execute("SELECT name, id FROM machines"))
+        sensor_key = dict(connection.execute("SELECT name, id FROM sensors"))
+
+        cells = np.flatnonzero(layout.valid.ravel())
+        rows = cells // max(layout.width, 1)
+        machine_keys = np.array([machine_key[machine_id] for machine_id in layout.machine_ids], dtype=np.int64)
+        sensor_keys = np.array([sensor_key[sensor] for sensor in layout.sensor_types], dtype=np.int64)
+        self._keys = (cells, machine_keys[rows], sensor_keys[layout.sensor_codes.ravel()[cells]])
+        self._layout = layout
+
+    def _write(self, layout: FleetLayout, timestamp: int, matrix: np.ndarray):
+        """Store one tick in one transaction."""
+        start = time.perf_counter()
+        if layout is not self._layout:
+            self._resolve(layout)
+        cells, machine_keys, sensor_keys = self._keys
+        values = matrix.ravel()[cells]
+        present = ~np.isnan(values)
+        if not present.all():
+            values, machine_keys, sensor_keys = values[present], machine_keys[present], sensor_keys[present]
+        connection = self._connection
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(_INSERT, zip(machine_keys.tolist(), sensor_keys.tolist(),
+                                                repeat(int(timestamp)), values.tolist()))
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stats["ticks"] += 1
+        self.stats["rows"] += len(values)
+        self.stats["write_ms"] += elapsed
+        self.stats["max_write_ms"] = max(self.stats["max_write_ms"], elapsed)
+
+    def _run(self):
+        """Writer thread: store queued ticks until close()."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write tick at {item[1]} to {self.path}: {e}")
+
+    def _read(self, sql: str, parameters=()) -> List[tuple]:
+        """Run a query on a separate connection, which sees the last committed tick."""
+        with self._read_lock:
+            if not hasattr(self, "_reader"):
+                self._reader = connect(self.path)
+            return self._reader.execute(sql, parameters).fetchall()
+
+    def query(self, machine_id: str, sensor_type: str, start: Optional[int] = None,
+              end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read the stored readings of one sensor.
+
+        Args:
+            machine_id: Machine of the sensor
+            sensor_type: Sensor to read
+            start: First timestamp in milliseconds (default: oldest stored reading)
+            end: Last timestamp in milliseconds (default: newest stored reading)
+
+        Returns:
+            Tuple of timestamps (int64 milliseconds) and float64 values, oldest first
+        """
+        rows = self._read(
+            "SELECT readings.ts, readings.value FROM readings"
+            " JOIN machines ON machines.id = readings.machine"
+            " JOIN sensors ON sensors.id = readings.sensor"
+            " WHERE machines.name = ? AND sensors.name = ? AND readings.ts BETWEEN ? AND ?"
+            " ORDER BY readings.ts",
+            (machine_id, sensor_type, -2 ** 63 if start is None else start, 2 ** 63 - 1 if end is None else end))
+        timestamps = np.array([row[0] for row in rows], dtype=np.int64)
+        values = np.array([row[1] for row in rows], dtype=np.float64)
+        return timestamps, values
+
+    def machine_window(self, machine_id: str, start: Optional[int] = None,
+                       end: Optional[int] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Read every sensor of one machine in a time range.
+
+        Args:
+            machine_id: Machine to read
+            start: First timestamp in milliseconds (default: oldest stored reading)
+            end: Last timestamp in milliseconds (default: newest stored reading)
+
+        Returns:
+            Dictionary mapping each sensor type to its timestamps and values, oldest first
+        """
+        rows = self._read(
+            "SELECT sensors.name, readings.ts, readings.value FROM readings"
+            " JOIN machines ON machines.id = readings.machine"
+            " JOIN sensors ON sensors.id = readings.sensor"
+            " WHERE machines.name = ? AND readings.ts BETWEEN ? AND ?"
+            " ORDER BY readings.ts",
+            (machine_id, -2 ** 63 if start is None else start, 2 ** 63 - 1 if end is None else end))
+        series: Dict[str, Tuple[List[int], List[float]]] = {}
+        for sensor, timestamp, value in rows:
+            timestamps, values = series.setdefault(sensor, ([], []))
+            timestamps.append(timestamp)
+            values.append(value)
+        return {sensor: (np.array(timestamps, dtype=np.int64), np.array(values, dtype=np.float64))
+                for sensor, (timestamps, values) in series.items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the write statistics."""
+        stats = dict(self.stats)
+        stats["queued"] = self._queue.qsize()
+        stats["mean_write_ms"] = round(stats["write_ms"] / stats["ticks"], 3) if stats["ticks"] else 0.0
+        stats["write_ms"] = round(stats["write_ms"], 3)
+        stats["max_write_ms"] = round(stats["max_write_ms"], 3)
+        return stats
+
+    def close(self):
+        """Write the queued ticks and close the database."""
+        self._queue.put(None)
+        self._thread.join()
+        self._connection.execute("PRAGMA optimize")
+        self._connection.close()
+        with self._read_lock:
+            if hasattr(self, "_reader"):
+                self._reader.close()
+                del self._reader
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query sensor readings stored by the SQLite sink")
+    parser.add_argument("machine_id", help="Machine to read, e.g. CNC_MACHINE_003")
+    parser.add_argument("--sensor", default=None, help="Sensor to read (default: every sensor of the machine)")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"Database file (default: {DEFAULT_DB_PATH})")
+    parser.add_argument("--last", type=float, default=3600, metavar="SECONDS",
+                        help="Read the last SECONDS before the newest reading (default: 3600)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    reader = connect(args.db)
+    newest = reader.execute("SELECT max(ts) FROM readings").fetchone()[0]
+    reader.close()
+    if newest is None:
+        raise SystemExit(f"No readings in {args.db}")
+    sink = SQLiteSink(path=args.db)
+    start = newest - int(args.last * 1000)
+    if args.sensor:
+        windows = {args.sensor: sink.query(args.machine_id, args.sensor, start)}
+    else:
+        windows = sink.machine_window(args.machine_id, start)
+    sink.close()
+    for sensor, (timestamps, values) in windows.items():
+        if len(values):
+            print(f"{sensor}: {len(values)} readings, min={values.min():.2f}, mean={values.mean():.2f}, "
+                  f"max={values.max():.2f}, last={values[-1]:.2f}")
@@ -0,0 +1,198 @@
+from typing import Dict, Optional, TYPE_CHECKING
+
+import numpy as np
+
+from src.sensor.rules import RiskRules, live_rules
+from src.sensor.topk import top_k_indices
+from src.thingsboard.fleet import FleetLayout, FleetTick
+
+# pandas is only needed to build reports and is imported on first use
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class StreamingAnalyzer:
+    """
+    Online analysis of the live SensorSimulator stream.
+
+    Statistics are kept per machine and sensor in (machines x sensors) arrays
+    laid out by FleetLayout and updated in place every tick, so memory does not
+    grow with the number of ticks seen. Means and variances use Welford's
+    algorithm; the EWMA tracks the recent level of each sensor. Risk scores and
+    critical conditions are evaluated over the per-machine features with a
+    RiskRules set.
+    """
+
+    def __init__(self, simulator=None, ewma_alpha: float = 0.1, high_fraction: float = 0.95,
+                 rules: Optional[RiskRules] = None):
+        """
+        Initialize the streaming analyzer.
+
+        Args:
+            simulator: Optional SensorSimulator to subscribe to immediately
+            ewma_alpha: Smoothing factor of the exponentially weighted moving average
+            high_fraction: Position within a sensor's normal range above which its
+                EWMA counts as running high
+            rules: Risk rules over the machine features (Out_Of_Range_Now, Running_High,
+                Safety_Trips, Out_Of_Range_Total, Abnormal_Events); default rules.LIVE_RISK_RULES
+        """
+        self.ewma_alpha = ewma_alpha
+        self.high_fraction = high_fraction
+        self.rules = rules or live_rules()
+        self.layout: Optional[FleetLayout] = None
+        self.ticks = 0
+
+        if simulator is not None:
+            self.attach(simulator)
+
+    def attach(self, simulator):
+        """Subscribe to a simulator's per-tick output."""
+        self._allocate(simulator.get_layout())
+        simulator.add_tick_listener(self.on_tick)
+
+    def detach(self, simulator):
+        """Stop receiving ticks from a simulator."""
+        simulator.remove_tick_listener(self.on_tick)
+
+    def _allocate(self, layout: FleetLayout):
+        """Allocate empty statistics for a layout."""
+        self.layout = layout
+        shape = layout.shape
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.minimum = np.full(shape, np.inf)
+        self.maximum = np.full(shape, -np.inf)
+        self.ewma = np.full(shape, np.nan)
+        self.last = np.full(shape, np.nan)
+        self.out_of_range_total = np.zeros(shape, dtype=np.int64)
+        self.event_count = np.zeros(shape[0], dtype=np.int64)
+
+    def _relayout(self, layout: FleetLayout):
+        """Carry statistics over to a new layout after the fleet changed shape."""
+        old = self.layout
+        self.count = layout.remap(self.count, old, fill=0)
+        self.mean = layout.remap(self.mean, old, fill=0.0)
+        self.m2 = layout.remap(self.m2, old, fill=0.0)
+        self.minimum = layout.remap(self.minimum, old, fill=np.inf)
+        self.maximum = layout.remap(self.maximum, old, fill=-np.inf)
+        self.ewma = layout.remap(self.ewma, old)
+        self.last = layout.remap(self.last, old)
+        self.out_of_range_total = layout.remap(self.out_of_range_total, old, fill=0)
+        self.event_count = layout.remap(self.event_count[:, None], old, fill=0)[:, 0]
+        self.layout = layout
+
+    def on_tick(self, tick: FleetTick):
+        """Fold one tick into the running statistics."""
+        if self.layout is None:
+            self._allocate(tick.layout)
+        elif tick.layout is not self.layout:
+            self._relayout(tick.layout)
+
+        values = tick.get_matrix()
+        present = ~np.isnan(values)
+
+        # Welford update, applied only where a reading arrived this tick
+        self.count += present
+        delta = np.where(present, values - self.mean, 0.0)
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += np.where(present, delta * (values - self.mean), 0.0)
+
+        np.fmin(self.minimum, values, out=self.minimum)
+        np.fmax(self.maximum, values, out=self.maximum)
+
+        seeded = present & np.isnan(self.ewma)
+        self.ewma[seeded] = values[seeded]
+        smoothing = present & ~seeded
+        self.ewma[smoothing] += self.ewma_alpha * (values[smoothing] - self.ewma[smoothing])
+        self.last[present] = values[present]
+
+        with np.errstate(invalid='ignore'):
+            self.out_of_range_total += present & ((values > self.layout.high) | (values < self.layout.low))
+
+        for event in tick.events:
+            row = self.layout.row_of.get(event.machine_id)
+            if row is not None:
+                self.event_count[row] += 1
+
+        self.ticks += 1
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance of every sensor (NaN until two readings arrived)."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+    def get_sensor_statistics(self, machine_id: str) -> 'pd.DataFrame':
+        """
+        Get the running statistics of every sensor on a machine.
+
+        Args:
+            machine_id: Machine to describe
+
+        Returns:
+            DataFrame indexed by sensor type
+        """
+        import pandas as pd
+        row = self.layout.row_of[machine_id]
+        sensors = self.layout.sensors_of(row)
+        width = len(sensors)
+        return pd.DataFrame({
+            "count": self.count[row, :width],
+            "mean": self.mean[row, :width],
+            "std": np.sqrt(self.variance[row, :width]),
+            "min": self.minimum[row, :width],
+            "max": self.maximum[row, :width],
+            "ewma": self.ewma[row, :width],
+            "last": self.last[row, :width],
+            "out_of_range_total": self.out_of_range_total[row, :width],
+        }, index=pd.Index(sensors, name="sensor_type"))
+
+    def _machine_features(self) -> Dict[str, np.ndarray]:
+        """Reduce the per-sensor statistics to per-machine health features."""
+        layout = self.layout
+        analog = layout.valid & ~layout.binary
+        with np.errstate(invalid='ignore', divide='ignore'):
+            position = (self.ewma - layout.low) / (layout.high - layout.low)
+            out_of_range_now = (self.last > layout.high) | (self.last < layout.low)
+
+        return {
+            "Out_Of_Range_Now": np.sum(out_of_range_now & layout.valid, axis=1),
+            "Running_High": np.sum(analog & (position > self.high_fraction), axis=1),
+            "Safety_Trips": np.sum(layout.safety & (self.last == 0), axis=1),
+            "Out_Of_Range_Total": np.sum(self.out_of_range_total, axis=1),
+            "Abnormal_Events": self.event_count.copy(),
+        }
+
+    def _machine_frame(self, rows: np.ndarray, features: Dict[str, np.ndarray]) -> 'pd.DataFrame':
+        """Build a per-machine report frame for the given rows."""
+        import pandas as pd
+        frame = pd.DataFrame({
+            "Machine_ID": [self.layout.machine_ids[row] for row in rows],
+            "Machine_Type": [self.layout.machine_types[row] for row in rows],
+        })
+        for name, values in features.items():
+            frame[name] = values[rows]
+        return frame
+
+    def get_critical_machines(self) -> 'pd.DataFrame':
+        """Get machines that are currently in critical condition (live equivalent of SensorDataAnalyzer)."""
+        features = self._machine_features()
+        return self._machine_frame(np.flatnonzero(self.rules.critical(features)), features)
+
+    def generate_maintenance_report(self, top: int = 20) -> 'pd.DataFrame':
+        """
+        Generate a live maintenance prioritization report.
+
+        Args:
+            top: Number of machines to include
+
+        Returns:
+            DataFrame of the highest-risk machines, sorted by Risk_Score
+        """
+        features = self._machine_features()
+        risk_score = self.rules.score(features)
+        order = top_k_indices(risk_score, top)
+        report = self._machine_frame(order, features)
+        report.insert(2, "Risk_Score", risk_score[order])
+        return report
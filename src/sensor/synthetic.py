@@ -0,0 +1,229 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.sensor.sensor import REFERENCE_YEAR
+
+# Column order of factory_sensor_simulator_2040.csv (see the Sensor dataclass)
+COLUMNS = ['Machine_ID', 'Machine_Type', 'Installation_Year', 'Operational_Hours', 'Temperature_C',
+           'Vibration_mms', 'Sound_dB', 'Oil_Level_pct', 'Coolant_Level_pct', 'Power_Consumption_kW',
+           'Last_Maintenance_Days_Ago', 'Maintenance_History_Count', 'Failure_History_Count',
+           'AI_Supervision', 'Error_Codes_Last_30_Days', 'Remaining_Useful_Life_days',
+           'Failure_Within_7_Days', 'Laser_Intensity', 'Hydraulic_Pressure_bar', 'Coolant_Flow_L_min',
+           'Heat_Index', 'AI_Override_Events']
+
+# Machine types with (base temperature C, base vibration mm/s, base power kW)
+MACHINE_TYPES: Dict[str, Tuple[float, float, float]] = {
+    '3D_Printer': (55, 3, 2), 'AGV': (40, 4, 5), 'Automated_Screwdriver': (38, 3, 1),
+    'Boiler': (85, 5, 150), 'CMM': (30, 1, 3), 'CNC_Lathe': (60, 8, 25), 'CNC_Mill': (62, 9, 30),
+    'Carton_Former': (40, 6, 8), 'Compressor': (70, 10, 55), 'Conveyor_Belt': (40, 6, 10),
+    'Crane': (45, 7, 40), 'Dryer': (75, 4, 35), 'Forklift_Electric': (42, 6, 15),
+    'Furnace': (90, 4, 200), 'Grinder': (58, 11, 20), 'Heat_Exchanger': (70, 3, 20),
+    'Hydraulic_Press': (55, 9, 60), 'Industrial_Chiller': (35, 6, 80), 'Injection_Molder': (68, 7, 90),
+    'Labeler': (38, 4, 3), 'Laser_Cutter': (60, 5, 45), 'Mixer': (50, 8, 30), 'Palletizer': (42, 6, 12),
+    'Pick_and_Place': (40, 4, 4), 'Press_Brake': (52, 9, 35), 'Pump': (52, 9, 25),
+    'Robot_Arm': (45, 5, 8), 'Shrink_Wrapper': (65, 4, 18), 'Shuttle_System': (40, 5, 10),
+    'Vacuum_Packer': (48, 5, 9), 'Valve_Controller': (38, 2, 1), 'Vision_System': (36, 1, 1),
+    'XRay_Inspector': (40, 1, 6),
+}
+
+# Optional readings and the machine types that report them; other rows are empty
+OPTIONAL_COLUMNS: Dict[str, List[str]] = {
+    'Laser_Intensity': ['Laser_Cutter'],
+    'Hydraulic_Pressure_bar': ['Hydraulic_Press', 'Press_Brake', 'Injection_Molder'],
+    'Coolant_Flow_L_min': ['CNC_Lathe', 'CNC_Mill', 'Grinder', 'Industrial_Chiller'],
+    'Heat_Index': ['Furnace', 'Boiler', 'Dryer', 'Heat_Exchanger'],
+}
+
+DEFAULT_CHUNK_ROWS = 250_000
+
+
+def generate_chunk(start: int, rows: int, seed: int = 0, degradation: float = 1.0,
+                   current_year: int = REFERENCE_YEAR) -> pd.DataFrame:
+    """
+    Generate one chunk of synthetic machine records.
+
+    Every machine gets a latent wear level from its age, hours, time since
+    maintenance and failure history. Temperature, vibration, sound, power and
+    error codes rise with wear while the remaining useful life falls, and
+    ``Failure_Within_7_Days`` is true exactly when the remaining life is at most
+    seven days. The chunk depends only on ``seed``, ``start`` and ``rows``, so a
+    dataset does not depend on the number of workers generating it.
+
+    Args:
+        start: Global index of the first row (used for Machine_ID and seeding)
+        rows: Number of rows
+        seed: Dataset seed
+        degradation: Scale of the wear level; larger values give more failing machines
+        current_year: Reference year for machine age
+
+    Returns:
+        DataFrame with the columns of the Sensor schema
+    """
+    rng = np.random.default_rng([seed, start])
+    type_names = np.array(list(MACHINE_TYPES))
+    type_codes = rng.integers(0, len(type_names), rows)
+    base_temperature, base_vibration, base_power = (
+        np.array(values, dtype=np.float64)[type_codes] for values in zip(*MACHINE_TYPES.values()))
+
+    installation_year = rng.integers(current_year - 25, current_year + 1, rows)
+    age = current_year - installation_year
+    operational_hours = np.minimum(age * 8760.0, rng.gamma(2.0, 2500.0, rows) * (1 + age / 5))
+    last_maintenance = rng.integers(0, 400, rows)
+    maintenance_count = rng.poisson(2 + age * 0.8)
+    failure_count = rng.poisson(0.2 + age * 0.15)
+
+    # Latent wear in [0, 1]
+    wear = (0.35 * age / 25 + 0.2 * np.minimum(operational_hours / 100_000, 1)
+            + 0.3 * last_maintenance / 400 + 0.15 * np.minimum(failure_count / 5, 1))
+    wear = np.clip(wear * degradation + rng.normal(0, 0.08, rows), 0, 1)
+
+    temperature = base_temperature + 30 * wear + rng.normal(0, 4, rows)
+    vibration = np.maximum(0.1, base_vibration + 14 * wear ** 1.5 + rng.normal(0, 1.5, rows))
+    sound = 60 + 25 * wear + 0.6 * base_vibration + rng.normal(0, 4, rows)
+    oil_level = np.clip(95 - 60 * last_maintenance / 400 - 15 * wear + rng.normal(0, 8, rows), 0, 100)
+    coolant_level = np.clip(rng.normal(70, 15, rows) - 20 * wear, 0, 100)
+    power = base_power * (1 + 0.4 * wear) * rng.lognormal(0, 0.15, rows)
+    errors = rng.poisson(0.5 + 10 * wear ** 2)
+    ai_supervision = rng.random(rows) < 0.5
+    ai_override = rng.poisson(np.where(ai_supervision, 3 + 4 * wear, 0.5))
+
+    # Remaining life shrinks with wear; most healthy machines have months left
+    remaining_life = np.maximum(0.0, 400 * (1 - wear) ** 2 * rng.lognormal(0, 0.35, rows) - 5)
+    failure_soon = remaining_life <= 7
+
+    data = pd.DataFrame({
+        'Machine_ID': pd.Series(np.arange(start, start + rows)).map('MC_{:07d}'.format).to_numpy(),
+        'Machine_Type': type_names[type_codes],
+        'Installation_Year': installation_year,
+        'Operational_Hours': operational_hours,
+        'Temperature_C': temperature,
+        'Vibration_mms': vibration,
+        'Sound_dB': sound,
+        'Oil_Level_pct': oil_level,
+        'Coolant_Level_pct': coolant_level,
+        'Power_Consumption_kW': power,
+        'Last_Maintenance_Days_Ago': last_maintenance,
+        'Maintenance_History_Count': maintenance_count,
+        'Failure_History_Count': failure_count,
+        'AI_Supervision': ai_supervision,
+        'Error_Codes_Last_30_Days': errors,
+        'Remaining_Useful_Life_days': remaining_life,
+        'Failure_Within_7_Days': failure_soon,
+    })
+
+    optional = {
+        'Laser_Intensity': lambda: 80 + 15 * (1 - wear) + rng.normal(0, 3, rows),
+        'Hydraulic_Pressure_bar': lambda: 150 - 30 * wear + rng.normal(0, 10, rows),
+        'Coolant_Flow_L_min': lambda: 40 - 15 * wear + rng.normal(0, 4, rows),
+        'Heat_Index': lambda: temperature * 1.1 + rng.normal(0, 5, rows),
+    }
+    for column, machine_types in OPTIONAL_COLUMNS.items():
+        values = optional[column]()
+        codes = [list(MACHINE_TYPES).index(machine_type) for machine_type in machine_types]
+        data[column] = np.where(np.isin(type_codes, codes), values, np.nan)
+
+    data['AI_Override_Events'] = ai_override
+    return data[COLUMNS]
+
+
+def _chunk_csv(start: int, rows: int, seed: int, degradation: float, current_year: int,
+               float_format: Optional[str], header: bool) -> bytes:
+    """Generate a chunk and format it as CSV. Runs inside a worker process."""
+    data = generate_chunk(start, rows, seed, degradation, current_year)
+    return data.to_csv(index=False, header=header, float_format=float_format).encode()
+
+
+def _chunk_bounds(start: int, rows: int, chunk_rows: int) -> Iterator[Tuple[int, int]]:
+    for offset in range(0, rows, chunk_rows):
+        yield start + offset, min(chunk_rows, rows - offset)
+
+
+def _write_file(pool: ProcessPoolExecutor, path: str, start: int, rows: int, chunk_rows: int,
+                max_pending: int, options: tuple) -> None:
+    """Stream the chunks of one file to disk in order, keeping a bounded number in flight."""
+    temporary = f"{path}.tmp"
+    pending = []
+    # An empty file still gets its header, so every partition stays readable
+    bounds = list(_chunk_bounds(start, rows, chunk_rows)) or [(start, 0)]
+    with open(temporary, 'wb') as f:
+        for index, (chunk_start, chunk_size) in enumerate(bounds):
+            pending.append(pool.submit(_chunk_csv, chunk_start, chunk_size, *options, index == 0))
+            if len(pending) >= max_pending:
+                f.write(pending.pop(0).result())
+        for future in pending:
+            f.write(future.result())
+    os.replace(temporary, path)
+
+
+def generate_dataset(output: str, rows: int, partitions: int = 1, seed: int = 0,
+                     degradation: float = 1.0, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                     workers: int = None, current_year: int = REFERENCE_YEAR,
+                     float_format: Optional[str] = '%.4f') -> List[str]:
+    """
+    Generate a synthetic dataset in the factory_sensor_simulator_2040.csv schema.
+
+    Chunks are generated and formatted in a process pool and written in order,
+    so memory stays bounded by a few chunks per worker whatever the row count.
+
+    Args:
+        output: CSV file path, or a directory when ``partitions`` > 1
+        rows: Total number of rows
+        partitions: Number of files to split the rows into (readable by dataset mode)
+        seed: Dataset seed
+        degradation: Scale of the wear level; larger values give more failing machines
+        chunk_rows: Rows generated per task
+        workers: Number of worker processes (defaults to the CPU count)
+        current_year: Reference year for machine age
+        float_format: Format of float columns, None for full precision
+
+    Returns:
+        Paths of the written files
+    """
+    workers = workers or os.cpu_count() or 1
+    options = (seed, degradation, current_year, float_format)
+    if partitions > 1:
+        os.makedirs(output, exist_ok=True)
+        paths = [os.path.join(output, f"part-{index:05d}.csv") for index in range(partitions)]
+    else:
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        paths = [output]
+
+    # The first ``extra`` files take one row more, so sizes differ by at most one
+    per_file, extra = divmod(rows, len(paths))
+    start = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for index, path in enumerate(paths):
+            size = per_file + (index < extra)
+            _write_file(pool, path, start, size, chunk_rows, 2 * workers, options)
+            start += size
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate synthetic factory sensor data for load tests')
+    parser.add_argument('output', help='Output CSV file, or directory when --partitions > 1')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Total number of rows')
+    parser.add_argument('--partitions', type=int, default=1, help='Number of output files')
+    parser.add_argument('--seed', type=int, default=0, help='Dataset seed')
+    parser.add_argument('--degradation', type=float, default=1.0,
+                        help='Scale of machine wear; larger values give more failing machines')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='Rows per generated chunk')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--full-precision', action='store_true', help='Write floats at full precision')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    files = generate_dataset(args.output, args.rows, args.partitions, args.seed, args.degradation,
+                             args.chunk_rows, args.workers,
+                             float_format=None if args.full_precision else '%.4f')
+    elapsed = time.perf_counter() - started
+    size = sum(os.path.getsize(path) for path in files)
+    print(f"Wrote {args.rows:,} rows to {len(files)} file(s), {size / 1e6:.1f} MB "
+          f"in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s)")
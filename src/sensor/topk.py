@@ -0,0 +1,119 @@
+import heapq
+import itertools
+from typing import Any, Hashable, Iterable, List, Tuple
+
+import numpy as np
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Get the positions of the ``k`` highest scores without sorting the whole array.
+
+    Uses a linear-time partial selection; only the selected positions are sorted.
+    Ties are broken by position so the result is deterministic. NaN scores are
+    never selected.
+
+    Args:
+        scores: One-dimensional array of scores
+        k: Number of positions to return
+
+    Returns:
+        Positions of the top ``k`` scores, highest first
+    """
+    scores = np.asarray(scores)
+    if np.issubdtype(scores.dtype, np.floating):
+        valid = np.flatnonzero(~np.isnan(scores))
+        if len(valid) < len(scores):
+            return valid[top_k_indices(scores[valid], k)]
+
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < n:
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        positions = np.concatenate([above, ties])
+    else:
+        positions = np.arange(n)
+
+    # Sort the k survivors by score descending, then position ascending
+    order = np.lexsort((positions, -scores[positions].astype(np.float64)))
+    return positions[order]
+
+
+class BoundedTopK:
+    """
+    Keep the ``k`` highest-scoring items of a stream in a bounded min-heap.
+
+    Memory stays O(k) however many items are pushed. Among equal scores the
+    item pushed first wins, matching ``top_k_indices`` on the concatenated data.
+    """
+
+    def __init__(self, k: int):
+        """
+        Initialize an empty top-K tracker.
+
+        Args:
+            k: Number of items to keep
+        """
+        self.k = k
+        self._heap: List[Tuple[float, int, Hashable, Any]] = []
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    @property
+    def threshold(self) -> float:
+        """Lowest score that is currently kept, or -inf while the heap is not full."""
+        if len(self._heap) < self.k:
+            return float('-inf')
+        return self._heap[0][0]
+
+    def push(self, score: float, key: Hashable, payload: Any = None) -> bool:
+        """
+        Offer one item.
+
+        Args:
+            score: Score of the item
+            key: Identifier returned by ``items``
+            payload: Optional data stored alongside the key
+
+        Returns:
+            True if the item is now among the top ``k``
+        """
+        if self.k <= 0 or score != score:
+            return False
+        # The sequence is negated so that, among equal scores, earlier items sit
+        # higher in the min-heap and later items are evicted first.
+        entry = (score, -next(self._sequence), key, payload)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def push_many(self, scores: np.ndarray, keys: Iterable[Hashable]) -> None:
+        """
+        Offer a batch of items, pre-filtering it with a partial selection.
+
+        Args:
+            scores: Scores of the batch
+            keys: Keys aligned with ``scores``
+        """
+        keys = list(keys) if not isinstance(keys, np.ndarray) else keys
+        for position in sorted(top_k_indices(scores, self.k)):
+            self.push(float(scores[position]), keys[position])
+
+    def items(self) -> List[Tuple[float, Hashable, Any]]:
+        """Get the kept items as (score, key, payload), highest score first."""
+        return [(score, key, payload) for score, _, key, payload in sorted(self._heap, reverse=True)]
+
+    def keys(self) -> List[Hashable]:
+        """Get the kept keys, highest score first."""
+        return [key for _, key, _ in self.items()]
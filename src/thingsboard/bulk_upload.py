@@ -0,0 +1,380 @@
+import gzip
+import json
+import logging
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from src.thingsboard.distributed import parse_address
+from src.thingsboard.resilience import HttpSender
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("gzip", "deflate")
+DEFAULT_THRESHOLD = 1024
+DEFAULT_LEVEL = 6
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 10.0
+
+_TELEMETRY_PATH = re.compile(r"^/api/v1/([^/]+)/telemetry$")
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    """Compress a request body for the given Content-Encoding."""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    return zlib.compress(body, level)
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Decode a request body sent with the given Content-Encoding (None or identity means plain)."""
+    if not encoding or encoding == "identity":
+        return body
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        return zlib.decompress(body)
+    raise ValueError(f"Unsupported Content-Encoding {encoding!r}")
+
+
+class _Pending:
+    """Records queued by one sending thread, per device token."""
+    __slots__ = ("thread", "batches", "queued_at", "failed")
+
+    def __init__(self, thread: threading.Thread):
+        self.thread = thread
+        self.batches: Dict[str, List[Dict[str, Any]]] = {}
+        self.queued_at: Dict[str, float] = {}
+        # Records of full batches whose upload failed in add(), reported by the next flush()
+        self.failed = 0
+
+    def take(self, max_age: Optional[float] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Remove and return the batches whose oldest record has waited at least ``max_age`` seconds (default: all)."""
+        if max_age is None:
+            batches, self.batches, self.queued_at = self.batches, {}, {}
+            return batches
+        cutoff = time.monotonic() - max_age
+        due = [token for token, queued_at in self.queued_at.items() if queued_at <= cutoff]
+        for token in due:
+            del self.queued_at[token]
+        return {token: self.batches.pop(token) for token in due}
+
+
+class BulkUploader:
+    """
+    Batched, compressed telemetry uploads over the ThingsBoard HTTP device API.
+
+    Telemetry records (``{"ts": ..., "values": {...}}``) are collected per device
+    token and posted as one JSON array per token, which the device API accepts
+    in place of a single record. A device's batch is posted once it holds
+    ``batch_size`` records, or by flush_due() once its oldest record has waited
+    ``flush_interval`` seconds, so a live simulation sends several ticks per
+    request instead of one record per device per tick. Batches are kept per
+    sending thread, so each send-pipeline worker uploads, and is told about the
+    failures of, only the records it queued itself. Bodies of at least
+    ``threshold`` bytes are compressed with gzip or deflate and sent with a
+    matching Content-Encoding; thanks to the repeated sensor-name keys a batch
+    typically shrinks more than 10x. Requests go through an HttpSender (keep-alive sessions, timeouts,
+    background retries) with two prebuilt header dictionaries.
+
+    Bytes before and after compression, and the CPU time spent compressing, are
+    counted in ``stats``; failed requests are those not delivered by their first
+    attempt, which the sender may still deliver on a retry.
+    """
+
+    def __init__(self, host: str, port: int, threshold: int = DEFAULT_THRESHOLD, level: int = DEFAULT_LEVEL,
+                 encoding: str = "gzip", batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, sender: Optional[HttpSender] = None):
+        """
+        Initialize the uploader.
+
+        Args:
+            host: ThingsBoard host
+            port: ThingsBoard HTTP port
+            threshold: Smallest body in bytes that is compressed (0 compresses everything)
+            level: Compression level, 1 (fastest) to 9 (smallest)
+            encoding: ``gzip`` or ``deflate``
+            batch_size: Records per device that trigger an upload without waiting for flush()
+            flush_interval: Seconds a device's oldest queued record waits before flush_due() uploads its batch
+            sender: HttpSender to post with (default: HttpSender())
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding {encoding!r}, expected one of {', '.join(ENCODINGS)}")
+        self.base_url = f"http://{host}:{port}/api/v1"
+        self.threshold = threshold
+        self.level = level
+        self.encoding = encoding
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sender = sender or HttpSender()
+        self._headers = {"Content-Type": "application/json"}
+        self._compressed_headers = {"Content-Type": "application/json", "Content-Encoding": encoding}
+        self._local = threading.local()
+        self._scopes: List[_Pending] = []
+        # Guards the pending batches and the statistics, which several send threads may update
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "records": 0, "failed_requests": 0, "failed_records": 0,
+                      "compressed_requests": 0, "raw_bytes": 0, "sent_bytes": 0, "compress_cpu_ms": 0.0}
+
+    def _own(self) -> _Pending:
+        """Get the calling thread's pending batches."""
+        pending = getattr(self._local, "pending", None)
+        if pending is None:
+            pending = self._local.pending = _Pending(threading.current_thread())
+            with self._lock:
+                # Forget threads that have exited with nothing queued
+                self._scopes = [scope for scope in self._scopes if scope.batches or scope.thread.is_alive()]
+                self._scopes.append(pending)
+        return pending
+
+    def add(self, token: str, payload: Dict[str, Any]) -> bool:
+        """
+        Queue one telemetry record, uploading the device's batch once it is full.
+
+        Args:
+            token: Device access token
+            payload: Telemetry record with ``ts`` and ``values``
+
+        Returns:
+            True; if the batch completed by this record fails to upload, all of its
+            records are counted by the calling thread's next flush()
+        """
+        pending = self._own()
+        with self._lock:
+            batch = pending.batches.get(token)
+            if batch is None:
+                batch = pending.batches[token] = []
+                pending.queued_at[token] = time.monotonic()
+            batch.append(payload)
+            if len(batch) < self.batch_size:
+                return True
+            del pending.batches[token], pending.queued_at[token]
+        if not self.upload(token, batch):
+            with self._lock:
+                pending.failed += len(batch)
+        return True
+
+    def _upload_all(self, batches: Dict[str, List[Dict[str, Any]]]) -> int:
+        return sum(len(batch) for token, batch in batches.items() if not self.upload(token, batch))
+
+    def flush(self, max_age: Optional[float] = None) -> int:
+        """
+        Upload the records queued by the calling thread.
+
+        Args:
+            max_age: Only upload the batches whose oldest record has waited at least this many seconds
+                (default: every batch)
+
+        Returns:
+            Number of the thread's records whose upload failed since its last flush,
+            including full batches uploaded by add()
+        """
+        pending = self._own()
+        with self._lock:
+            batches = pending.take(max_age)
+            failed, pending.failed = pending.failed, 0
+        return failed + self._upload_all(batches)
+
+    def flush_due(self) -> int:
+        """
+        Upload the calling thread's batches whose oldest record has waited ``flush_interval`` seconds.
+
+        Returns:
+            Number of records whose upload failed, as for flush()
+        """
+        return self.flush(self.flush_interval)
+
+    def encode(self, records: List[Dict[str, Any]]):
+        """
+        Serialize and, above the threshold, compress a batch.
+
+        Returns:
+            Tuple of the request body and its headers
+        """
+        body = json.dumps(records, separators=(",", ":")).encode("utf-8")
+        if len(body) < self.threshold:
+            with self._lock:
+                self.stats["raw_bytes"] += len(body)
+            return body, self._headers
+        raw_bytes = len(body)
+        # CPU time of this thread only, as other send threads may be compressing at the same time
+        start = time.thread_time()
+        body = compress(body, self.encoding, self.level)
+        elapsed = (time.thread_time() - start) * 1000
+        with self._lock:
+            self.stats["raw_bytes"] += raw_bytes
+            self.stats["compress_cpu_ms"] += elapsed
+            self.stats["compressed_requests"] += 1
+        return body, self._compressed_headers
+
+    def upload(self, token: str, records: List[Dict[str, Any]]) -> bool:
+        """
+        Post a batch of records for one device.
+
+        Args:
+            token: Device access token
+            records: Telemetry records
+
+        Returns:
+            True if the server accepted the batch
+        """
+        if not records:
+            return True
+        body, headers = self.encode(records)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["records"] += len(records)
+            self.stats["sent_bytes"] += len(body)
+        if self.sender.post(f"{self.base_url}/{token}/telemetry", body, headers):
+            return True
+        with self._lock:
+            self.stats["failed_requests"] += 1
+            self.stats["failed_records"] += len(records)
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the upload statistics, including bytes saved by compression."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["bytes_saved"] = stats["raw_bytes"] - stats["sent_bytes"]
+        stats["ratio"] = round(stats["raw_bytes"] / stats["sent_bytes"], 2) if stats["sent_bytes"] else 0.0
+        stats["compress_cpu_ms"] = round(stats["compress_cpu_ms"], 3)
+        return stats
+
+    def close(self) -> int:
+        """
+        Upload the remaining records of every thread.
+
+        Returns:
+            Number of records whose upload failed and that no flush() has reported yet
+        """
+        with self._lock:
+            scopes, self._scopes, self._local = self._scopes, [], threading.local()
+            batches = [scope.take() for scope in scopes]
+            failed = sum(scope.failed for scope in scopes)
+        return failed + sum(self._upload_all(scope_batches) for scope_batches in batches)
+
+
+class TelemetryStandIn:
+    """
+    Local stand-in for the ThingsBoard HTTP device telemetry API.
+
+    Accepts ``POST /api/v1/<token>/telemetry`` with a single record or an array
+    of records, plain or gzip/deflate encoded, and answers 400 for bodies that
+    do not decode to telemetry JSON. Decoded records are kept per token so a
+    test can compare them with what was sent.
+    """
+
+    def __init__(self, address: str = "127.0.0.1:0"):
+        """
+        Initialize the stand-in server.
+
+        Args:
+            address: ``host:port`` to listen on (port 0 picks a free port)
+        """
+        self.received: Dict[str, List[Dict[str, Any]]] = {}
+        self.encodings: Dict[str, int] = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                match = _TELEMETRY_PATH.match(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status = 404 if match is None else server._receive(
+                    match.group(1), body, self.headers.get("Content-Encoding"))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} {format % args}")
+
+        self._server = ThreadingHTTPServer(parse_address(address), Handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+        self._thread: Optional[threading.Thread] = None
+
+    def _receive(self, token: str, body: bytes, encoding: Optional[str]) -> int:
+        try:
+            content = json.loads(decompress(body, encoding))
+            records = content if isinstance(content, list) else [content]
+            if not all(isinstance(record, dict) and "values" in record for record in records):
+                raise ValueError("not a telemetry record")
+        except (ValueError, OSError, zlib.error) as e:
+            logger.warning(f"Stand-in rejected a {encoding or 'plain'} body of {len(body)} bytes: {e}")
+            with self._lock:
+                self.errors += 1
+            return 400
+        with self._lock:
+            self.received.setdefault(token, []).extend(records)
+            self.encodings[encoding or "identity"] = self.encodings.get(encoding or "identity", 0) + 1
+        return 200
+
+    def start(self):
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="telemetry-stand-in")
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def verify(devices: int = 20, ticks: int = 100, batch_size: int = DEFAULT_BATCH_SIZE,
+           threshold: int = DEFAULT_THRESHOLD, levels=(1, 6, 9)) -> List[Dict[str, Any]]:
+    """
+    Upload simulated telemetry to a local stand-in with each encoding and level and check it decodes unchanged.
+
+    Returns:
+        One statistics row per encoding and level
+    """
+    from src.thingsboard.simulator import SensorSimulator
+
+    simulator = SensorSimulator({"MIXER": devices // 2, "CNC_MACHINE": devices - devices // 2}, seed=1)
+    sent: Dict[str, List[Dict[str, Any]]] = {}
+    for tick in range(ticks):
+        for machine_id, values in simulator.generate_sensor_data().items():
+            sent.setdefault(machine_id, []).append({"ts": 1_700_000_000_000 + tick * 1000, "values": values})
+    expected = json.loads(json.dumps(sent))
+
+    rows = []
+    for encoding in ENCODINGS:
+        for level in levels:
+            stand_in = TelemetryStandIn()
+            stand_in.start()
+            uploader = BulkUploader(*stand_in.address, threshold=threshold, level=level, encoding=encoding,
+                                    batch_size=batch_size)
+            start = time.perf_counter()
+            for machine_id, records in sent.items():
+                for record in records:
+                    uploader.add(machine_id, record)
+            uploader.close()
+            elapsed = time.perf_counter() - start
+            stand_in.stop()
+            if stand_in.received != expected or stand_in.errors:
+                raise AssertionError(f"Stand-in did not decode the {encoding} level {level} uploads unchanged")
+            rows.append(dict(encoding=encoding, level=level, elapsed_s=round(elapsed, 3), **uploader.get_stats()))
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Verify compressed bulk uploads against a local stand-in server")
+    parser.add_argument("--devices", type=int, default=20, help="Number of simulated devices")
+    parser.add_argument("--ticks", type=int, default=100, help="Records per device")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Records per upload")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD, help="Compression threshold in bytes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    for row in verify(args.devices, args.ticks, args.batch_size, args.threshold):
+        print(", ".join(f"{k}={v}" for k, v in row.items()))
@@ -2,22 +2,35 @@ import json
 import logging
 import time
 from datetime import datetime
-import requests
-import paho.mqtt.client as mqtt
+
+from src.thingsboard.profiling import phase
+from src.thingsboard.resilience import HttpSender
 
 logger = logging.getLogger(__name__)
 
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
 class ThingsBoardConnector:
     
-    def __init__(self, host, port=1883, access_token=None, https_mode=False):
+    def __init__(self, host, port=1883, access_token=None, https_mode=False, save_local=True, bulk_uploader=None,
+                 http_sender=None, payload_encoder=None):
         self.host = host
         self.port = port
         self.access_token = access_token
         self.https_mode = https_mode
+        self.save_local = save_local
         self.mqtt_client = None
+        self.profiler = None
+        # Optional BulkUploader that batches and compresses HTTP uploads
+        self.bulk_uploader = bulk_uploader
+        # HTTP requests are bounded by timeouts and retried in the background
+        self.http_sender = http_sender or (HttpSender() if https_mode else None)
+        # Optional ProtobufEncoder that replaces JSON MQTT payloads
+        self.payload_encoder = payload_encoder
         
         if not https_mode and access_token:
-            # Initialize MQTT client
+            # Initialize MQTT client; paho is only imported when MQTT is actually used
+            import paho.mqtt.client as mqtt
             self.mqtt_client = mqtt.Client()
             self.mqtt_client.username_pw_set(access_token)
     
@@ -41,7 +54,7 @@ class ThingsBoardConnector:
             self.mqtt_client.disconnect()
             logger.info("Disconnected from ThingsBoard MQTT")
     
-    def send_telemetry(self, device_id, telemetry_data, timestamp=None):
+    def send_telemetry(self, device_id, telemetry_data, timestamp=None, machine_type=None):
 
         if timestamp is None:
             timestamp = int(time.time() * 1000)  # Convert to milliseconds
@@ -53,23 +66,30 @@ class ThingsBoardConnector:
         }
         
         # Save data locally for debugging/backup
-        self._save_data_locally(device_id, payload)
+        if self.save_local:
+            with phase(self.profiler, "save"):
+                self._save_data_locally(device_id, payload)
         
         if self.https_mode:
             return self._send_via_https(device_id, payload)
         else:
-            return self._send_via_mqtt(payload)
+            return self._send_via_mqtt(payload, machine_type or telemetry_data.get("machine_type"))
     
-    def _send_via_mqtt(self, payload):
+    def _send_via_mqtt(self, payload, machine_type=None):
         if not self.mqtt_client:
             logger.error("MQTT client not initialized.")
             return False
         
         try:
-            # Convert payload to JSON string
-            payload_json = json.dumps(payload)
+            # Convert payload to a JSON string or Protobuf message
+            with phase(self.profiler, "serialize"):
+                if self.payload_encoder:
+                    payload_body = self.payload_encoder.encode(payload, machine_type)
+                else:
+                    payload_body = json.dumps(payload)
             # Send to ThingsBoard
-            result = self.mqtt_client.publish('v1/devices/me/telemetry', payload_json, 1)
+            import paho.mqtt.client as mqtt
+            result = self.mqtt_client.publish('v1/devices/me/telemetry', payload_body, 1)
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
                 logger.debug("Data sent successfully via MQTT")
@@ -86,19 +106,19 @@ class ThingsBoardConnector:
             logger.error("Access token not provided for HTTPS connection.")
             return False
         
+        if self.bulk_uploader:
+            return self.bulk_uploader.add(self.access_token, payload)
+        
         try:            # ThingsBoard REST API endpoint
             url = f"http://{self.host}:{self.port}/api/v1/{self.access_token}/telemetry"
             
             # Send request
-            headers = {'Content-Type': 'application/json'}
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
-            
-            if response.status_code == 200:
+            with phase(self.profiler, "serialize"):
+                body = json.dumps(payload)
+            if self.http_sender.post(url, body, JSON_HEADERS):
                 logger.debug("Data sent successfully via HTTPS")
                 return True
-            else:
-                logger.error(f"Failed to send data via HTTPS. Status code: {response.status_code}")
-                return False
+            return False
         except Exception as e:
             logger.error(f"Error sending data via HTTPS: {e}")
             return False
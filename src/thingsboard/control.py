@@ -0,0 +1,188 @@
+import argparse
+import json
+import logging
+import socket
+import socketserver
+import threading
+from typing import Any, Dict, List, Optional
+
+from src.thingsboard.distributed import parse_address
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTROL_ADDRESS = "127.0.0.1:7701"
+
+
+def _machine_ids(value) -> List[str]:
+    """Accept machine IDs as a list or a comma-separated string."""
+    if isinstance(value, str):
+        return [machine_id for machine_id in value.split(",") if machine_id]
+    return list(value or [])
+
+
+class _ControlTCPServer(socketserver.ThreadingTCPServer):
+    """Threading TCP server that can rebind its port right after a restart."""
+
+    allow_reuse_address = True
+
+
+class ControlServer:
+    """
+    Runtime control of a running SensorSimulator over a local TCP socket.
+
+    Each request is one JSON object per line with a ``command`` key, answered
+    with one JSON line holding ``ok`` and either the result or an ``error``:
+
+        {"command": "status"}
+        {"command": "add_machines", "machine_type": "MIXER", "count": 10}
+        {"command": "remove_machines", "machine_ids": ["MIXER_011"]}
+        {"command": "remove_machines", "machine_type": "MIXER", "count": 10}
+        {"command": "set_interval", "interval": 2}
+        {"command": "set_maintenance_mode", "machine_ids": ["CNC_MACHINE_003"], "enabled": true}
+        {"command": "history", "machine_id": "MIXER_001", "sensor_type": "RTD_PT100", "buckets": 60}
+
+    Commands are applied between ticks through the simulator's own methods, so
+    only the affected machines' state and connections are touched.
+    """
+
+    def __init__(self, simulator, address: str = DEFAULT_CONTROL_ADDRESS, history=None):
+        """
+        Initialize the control server.
+
+        Args:
+            simulator: SensorSimulator to control
+            address: ``host:port`` to listen on; keep it on localhost, there is no authentication
+            history: Optional SensorHistory answering ``history`` queries
+        """
+        self.simulator = simulator
+        self.history = history
+        self.commands = {
+            "status": self._status,
+            "add_machines": self._add_machines,
+            "remove_machines": self._remove_machines,
+            "set_interval": self._set_interval,
+            "set_maintenance_mode": self._set_maintenance_mode,
+            "history": self._history,
+        }
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    response = server.handle(line)
+                    self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+        self._server = _ControlTCPServer(parse_address(address), Handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+        self._thread: Optional[threading.Thread] = None
+
+    def handle(self, line) -> Dict[str, Any]:
+        """
+        Execute one request line.
+
+        Args:
+            line: JSON request as bytes or str
+
+        Returns:
+            Response dictionary
+        """
+        try:
+            request = json.loads(line)
+            command = request.pop("command", None)
+            if command not in self.commands:
+                raise ValueError(f"Unknown command {command!r}, expected one of {', '.join(self.commands)}")
+            result = self.commands[command](**request)
+            return {"ok": True, "result": result}
+        except Exception as e:
+            logger.warning(f"Control request failed: {e}")
+            return {"ok": False, "error": str(e)}
+
+    def _status(self) -> Dict[str, Any]:
+        return self.simulator.get_status()
+
+    def _add_machines(self, machine_type: str, count: int = 1) -> List[str]:
+        return self.simulator.add_machines(machine_type, int(count))
+
+    def _remove_machines(self, machine_ids=None, machine_type: str = None, count: int = None) -> List[str]:
+        if machine_ids is not None:
+            return self.simulator.remove_machines(_machine_ids(machine_ids))
+        if machine_type is None or count is None:
+            raise ValueError("remove_machines needs machine_ids, or machine_type and count")
+        # Select and remove under the fleet lock, so a tick or another request never changes the fleet in between
+        with self.simulator.fleet_lock:
+            # The most recently numbered machines of the type go first
+            of_type = [machine_id for machine_id, kind in self.simulator.machines.items() if kind == machine_type]
+            machine_ids = of_type[len(of_type) - int(count):] if int(count) > 0 else []
+            return self.simulator.remove_machines(machine_ids)
+
+    def _set_interval(self, interval: float) -> float:
+        self.simulator.set_interval(float(interval))
+        return self.simulator.interval
+
+    def _set_maintenance_mode(self, machine_ids, enabled: bool = True) -> List[str]:
+        return self.simulator.set_maintenance_mode(_machine_ids(machine_ids), bool(enabled))
+
+    def _history(self, machine_id: str, sensor_type: str, start: int = None, end: int = None,
+                 buckets: int = None, method: str = "avg") -> Dict[str, List]:
+        if self.history is None:
+            raise ValueError("No sensor history is kept; start the simulator with --history-hours")
+        if buckets:
+            timestamps, values = self.history.downsample(machine_id, sensor_type, int(buckets), method, start, end)
+        else:
+            timestamps, values = self.history.query(machine_id, sensor_type, start, end)
+        return {"timestamps": timestamps.tolist(),
+                "values": [None if value != value else round(value, 4) for value in values.tolist()]}
+
+    def start(self):
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="control-server")
+        self._thread.start()
+        logger.info(f"Control API listening on {self.address[0]}:{self.address[1]}")
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def send_command(address: str, command: str, timeout: float = 30.0, **params) -> Dict[str, Any]:
+    """
+    Send one command to a ControlServer.
+
+    Args:
+        address: Control server ``host:port``
+        command: Command name, see ControlServer
+        timeout: Socket timeout in seconds
+        **params: Command parameters
+
+    Returns:
+        Response dictionary with ``ok`` and ``result`` or ``error``
+    """
+    with socket.create_connection(parse_address(address), timeout=timeout) as sock:
+        sock.sendall((json.dumps(dict(params, command=command)) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as stream:
+            return json.loads(stream.readline())
+
+
+def _parse_value(value: str):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a control command to a running simulator")
+    parser.add_argument("command",
+                        help="status, add_machines, remove_machines, set_interval, set_maintenance_mode or history")
+    parser.add_argument("params", nargs="*", metavar="KEY=VALUE",
+                        help="Command parameters, e.g. machine_type=MIXER count=10 or machine_ids=MIXER_001,MIXER_002")
+    parser.add_argument("--address", default=DEFAULT_CONTROL_ADDRESS, help="Control API address (host:port)")
+    args = parser.parse_args()
+
+    params = dict(param.split("=", 1) for param in args.params)
+    response = send_command(args.address, args.command, **{key: _parse_value(value) for key, value in params.items()})
+    print(json.dumps(response, indent=2))
@@ -0,0 +1,250 @@
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Per-tick step of an analog sensor as a fraction of its range; steps are
+# uniform over +-STEP_FRACTION/2 of the range like the independent walk.
+STEP_FRACTION = 0.05
+
+
+def normal_cdf(values: np.ndarray) -> np.ndarray:
+    """
+    Standard normal CDF without scipy (Abramowitz & Stegun 7.1.26, error < 1.5e-7).
+
+    Args:
+        values: Array of standard normal draws
+
+    Returns:
+        Array of probabilities in [0, 1]
+    """
+    x = np.abs(values) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.copysign(erf, values))
+
+
+def correlation_matrix(sensors: Sequence[str],
+                       correlations: Sequence[Tuple[str, str, float]]) -> np.ndarray:
+    """
+    Build a full correlation matrix from declared sensor pairs.
+
+    Args:
+        sensors: Sensor types in column order
+        correlations: (sensor_a, sensor_b, coefficient) pairs; pairs naming sensors
+            outside ``sensors`` are ignored
+
+    Returns:
+        Symmetric matrix with a unit diagonal
+    """
+    index = {sensor: i for i, sensor in enumerate(sensors)}
+    matrix = np.eye(len(sensors))
+    for sensor_a, sensor_b, coefficient in correlations:
+        if not -1.0 <= coefficient <= 1.0:
+            raise ValueError(f"Correlation of {sensor_a} and {sensor_b} must be within [-1, 1], got {coefficient}")
+        if sensor_a in index and sensor_b in index and sensor_a != sensor_b:
+            matrix[index[sensor_a], index[sensor_b]] = coefficient
+            matrix[index[sensor_b], index[sensor_a]] = coefficient
+    return matrix
+
+
+def cholesky_factor(covariance: np.ndarray, name: str = "") -> np.ndarray:
+    """
+    Lower-triangular factor ``L`` with ``L @ L.T == covariance``.
+
+    Declared correlations are not guaranteed to be jointly consistent. If the
+    matrix is not positive definite, its eigenvalues are clipped to a small
+    positive floor and the original variances are restored before factorizing.
+
+    Args:
+        covariance: Symmetric covariance matrix
+        name: Label used in the warning when the matrix had to be repaired
+
+    Returns:
+        Lower-triangular factor
+    """
+    if covariance.size == 0:
+        return covariance.copy()
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        logger.warning(f"Sensor covariance of {name or 'machine type'} is not positive definite, "
+                       "using the nearest valid matrix")
+    std = np.sqrt(np.diag(covariance))
+    correlation = covariance / np.outer(std, std)
+    eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+    correlation = (eigenvectors * np.maximum(eigenvalues, 1e-6)) @ eigenvectors.T
+    scale = np.sqrt(np.diag(correlation))
+    correlation /= np.outer(scale, scale)
+    return np.linalg.cholesky(correlation * np.outer(std, std))
+
+
+class CorrelatedSensorBlock:
+    """
+    State of every machine of one machine type, advanced with correlated steps.
+
+    Values are kept as a (machines x sensors) matrix whose columns follow the
+    type's ``MACHINE_SENSORS`` list. Each tick, standard normal noise for all
+    machines of the type is multiplied once by the precomputed Cholesky factor
+    and mapped through the normal CDF (a Gaussian copula). Analog steps therefore
+    keep the bounded uniform distribution of the independent walk, so detectors
+    tuned on it see no heavier tails, while their covariance is the declared one.
+    Binary sensors keep the simulator's toggle behavior, vectorized.
+    """
+
+    def __init__(self, machine_type: str, machine_ids: List[str], sensors: List[str],
+                 sensor_ranges: Dict[str, tuple], sensor_units: Dict[str, str],
+                 safety_sensors: Sequence[str] = (),
+                 correlations: Sequence[Tuple[str, str, float]] = (),
+                 initial_values: Optional[Dict[str, Dict[str, float]]] = None,
+                 step_fraction: float = STEP_FRACTION):
+        """
+        Initialize the block.
+
+        Args:
+            machine_type: Machine type of every machine in the block
+            machine_ids: Machines of this type, in row order
+            sensors: The type's sensors, in column order
+            sensor_ranges: Normal (min, max) range for each sensor type
+            sensor_units: Unit for each sensor type
+            safety_sensors: Binary sensors where 1 means safe and 0 means tripped
+            correlations: Declared (sensor_a, sensor_b, coefficient) pairs
+            initial_values: Current value of every machine's sensors
+            step_fraction: Step size of analog sensors as a fraction of their range
+        """
+        self.machine_type = machine_type
+        self.machine_ids = list(machine_ids)
+        self.row_of = {machine_id: row for row, machine_id in enumerate(self.machine_ids)}
+        self.sensors = list(sensors)
+
+        self.units = [sensor_units.get(s, "") for s in self.sensors]
+        binary = np.array([unit == "binary" for unit in self.units], dtype=bool)
+        self.is_binary = binary.tolist()
+        self.analog_columns = np.flatnonzero(~binary)
+        self.binary_columns = np.flatnonzero(binary)
+        self.safety = np.array([self.sensors[c] in safety_sensors for c in self.binary_columns], dtype=bool)
+
+        analog = [self.sensors[c] for c in self.analog_columns]
+        self.low = np.array([sensor_ranges.get(s, (0, 100))[0] for s in analog], dtype=np.float64)
+        self.high = np.array([sensor_ranges.get(s, (0, 100))[1] for s in analog], dtype=np.float64)
+        self.step_width = step_fraction * (self.high - self.low)
+        step_std = self.step_width / np.sqrt(12.0)
+        self.correlation = correlation_matrix(analog, correlations)
+        self.covariance = self.correlation * np.outer(step_std, step_std)
+        # Uniform marginals of a Gaussian copula with correlation r have Pearson
+        # correlation (6 / pi) * asin(r / 2); invert that so the steps match the declaration.
+        latent = 2.0 * np.sin(np.pi * self.correlation / 6.0)
+        self.factor_t = np.ascontiguousarray(cholesky_factor(latent, machine_type).T)
+
+        # ``values`` is a view of the first rows of ``_storage``, which grows by doubling
+        # so machines can be added to a running block without copying it every time
+        self._storage = np.zeros((len(self.machine_ids), len(self.sensors)), dtype=np.float64)
+        self.values = self._storage
+        if initial_values:
+            self.values[:] = self._initial_rows(self.machine_ids, initial_values)
+
+    def _initial_rows(self, machine_ids: Sequence[str], initial_values: Dict[str, Dict[str, float]]) -> np.ndarray:
+        rows = [[initial_values.get(machine_id, {}).get(sensor, 0) for sensor in self.sensors]
+                for machine_id in machine_ids]
+        return np.array(rows, dtype=np.float64).reshape(len(machine_ids), len(self.sensors))
+
+    def add_rows(self, machine_ids: Sequence[str], initial_values: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Append machines to the block.
+
+        The per-type correlation factors are shared by every row, so only the new
+        rows are written; storage is over-allocated to keep repeated additions cheap.
+
+        Args:
+            machine_ids: Machines to append, in row order
+            initial_values: Current value of the new machines' sensors
+        """
+        start = len(self.machine_ids)
+        end = start + len(machine_ids)
+        if end > len(self._storage):
+            storage = np.zeros((max(end, 2 * len(self._storage)), len(self.sensors)), dtype=np.float64)
+            storage[:start] = self.values
+            self._storage = storage
+        self._storage[start:end] = self._initial_rows(machine_ids, initial_values or {})
+        self.values = self._storage[:end]
+        self.machine_ids.extend(machine_ids)
+        self.row_of.update((machine_id, start + offset) for offset, machine_id in enumerate(machine_ids))
+
+    def remove_rows(self, machine_ids: Sequence[str]):
+        """
+        Drop machines from the block.
+
+        Each removed row is filled with the current last row, so the cost depends
+        only on the number of removed machines; the order of the remaining rows
+        is not preserved.
+
+        Args:
+            machine_ids: Machines to remove; machines not in the block are ignored
+        """
+        rows = sorted((self.row_of.pop(machine_id) for machine_id in machine_ids if machine_id in self.row_of),
+                      reverse=True)
+        # Going from the bottom up, the last row is never one that still has to be removed
+        for row in rows:
+            last = len(self.machine_ids) - 1
+            moved = self.machine_ids.pop()
+            if row != last:
+                self.values[row] = self.values[last]
+                self.machine_ids[row] = moved
+                self.row_of[moved] = row
+        self.values = self._storage[:len(self.machine_ids)]
+
+    def step(self, rng: np.random.Generator, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Advance the state by one tick.
+
+        Args:
+            rng: Random generator
+            rows: Rows to advance (defaults to every machine of the block)
+
+        Returns:
+            The updated values of the advanced rows
+        """
+        values = self.values if rows is None else self.values[rows]
+        count = len(values)
+
+        if len(self.analog_columns):
+            analog = values[:, self.analog_columns]
+            latent = rng.standard_normal((count, len(self.analog_columns))) @ self.factor_t
+            analog += (normal_cdf(latent) - 0.5) * self.step_width
+            np.clip(analog, self.low, self.high, out=analog)
+            values[:, self.analog_columns] = np.round(analog, 2)
+
+        if len(self.binary_columns):
+            draws = rng.random((count, len(self.binary_columns)))
+            binary = values[:, self.binary_columns]
+            # Safety sensors trip with 1% probability, other switches toggle with 5%
+            toggled = np.where(draws < 0.05, 1.0 - binary, binary)
+            values[:, self.binary_columns] = np.where(self.safety, (draws >= 0.01).astype(np.float64), toggled)
+
+        if rows is not None:
+            self.values[rows] = values
+        return values
+
+
+def fleet_matrix(blocks: Dict[str, CorrelatedSensorBlock], layout) -> np.ndarray:
+    """
+    Assemble the fleet matrix of a FleetLayout directly from the block states.
+
+    Layout columns follow ``MACHINE_SENSORS`` like the blocks do, so each block is
+    copied into its machines' rows without going through per-machine dictionaries.
+
+    Args:
+        blocks: Blocks by machine type
+        layout: FleetLayout of the same machines
+
+    Returns:
+        Float matrix of shape ``layout.shape`` with NaN in padding cells
+    """
+    matrix = np.full(layout.shape, np.nan)
+    for block in blocks.values():
+        rows = [layout.row_of[machine_id] for machine_id in block.machine_ids]
+        matrix[rows, :len(block.sensors)] = block.values
+    return matrix
@@ -0,0 +1,418 @@
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 7700
+# Lead time between handing out the assignments and the first synchronized tick,
+# long enough for every worker to build its fleet before the grid starts
+DEFAULT_START_DELAY = 5.0
+PROTOCOL_VERSION = 1
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_address(address: str, default_host: str = "127.0.0.1") -> Tuple[str, int]:
+    """
+    Split a ``host:port`` (or bare ``port``) address.
+
+    Args:
+        address: Address string
+        default_host: Host used when the address only holds a port
+
+    Returns:
+        (host, port) tuple
+    """
+    host, _, port = address.rpartition(":")
+    return host or default_host, int(port or DEFAULT_PORT)
+
+
+def partition_machines(machine_count: Dict[str, int], workers: int) -> List[Dict[str, Dict[str, int]]]:
+    """
+    Split a fleet into contiguous per-type machine-ID ranges, one per worker.
+
+    Each machine type's count is spread as evenly as possible, with the
+    remainders of successive types given to successive workers so that fleet
+    totals per worker differ by at most one machine; worker ``i``
+    receives machines ``first_index .. first_index + count - 1`` of every type,
+    so the union of all workers is exactly the fleet a single simulator with
+    ``machine_count`` would create.
+
+    Args:
+        machine_count: Fleet-wide machine count per machine type
+        workers: Number of workers
+
+    Returns:
+        One ``{"machine_count": ..., "first_index": ...}`` assignment per worker
+    """
+    if workers < 1:
+        raise ValueError(f"At least one worker is required, got {workers}")
+    assignments = [{"machine_count": {}, "first_index": {}} for _ in range(workers)]
+    # Each type's remainder starts at the worker after the previous type's, so totals stay within one machine
+    offset = 0
+    for machine_type, count in machine_count.items():
+        first = 1
+        for index, assignment in enumerate(assignments):
+            share = count // workers + ((index - offset) % workers < count % workers)
+            assignment["machine_count"][machine_type] = share
+            assignment["first_index"][machine_type] = first
+            first += share
+        offset = (offset + count % workers) % workers
+    return assignments
+
+
+def _send_message(sock: socket.socket, message: Dict[str, Any]):
+    """Write one newline-delimited JSON message."""
+    sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+def _read_messages(stream):
+    """Yield the JSON messages of a socket file until the peer closes it."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+class _WorkerHandle:
+    """Coordinator-side state of one connected worker."""
+
+    def __init__(self, index: int, sock: socket.socket, address: Tuple[str, int], name: str):
+        self.index = index
+        self.sock = sock
+        self.address = address
+        self.name = name
+        self.machines = 0
+        self.stats: Dict[str, Any] = {}
+        self.done = False
+        self.error: Optional[str] = None
+
+
+class Coordinator:
+    """
+    Drive a fleet simulation spread over several worker processes or hosts.
+
+    The coordinator waits for the expected number of workers to connect, hands
+    each one a disjoint machine-ID range and a common tick grid, then collects
+    the counters the workers report and logs an aggregated view. Messages are
+    newline-delimited JSON over TCP.
+
+    The tick grid is sent as a delay relative to the moment of sending rather
+    than as an absolute time, so workers do not need synchronized clocks; ticks
+    are aligned up to the one-way network latency of the assignment.
+    """
+
+    def __init__(self, machine_count: Dict[str, int], workers: int, interval: float = 5,
+                 duration: float = 0, host: str = "0.0.0.0", port: int = DEFAULT_PORT,
+                 correlated: bool = True, seed: Optional[int] = None,
+                 start_delay: float = DEFAULT_START_DELAY, report_every: float = None,
+                 accept_timeout: float = 120.0):
+        """
+        Initialize the coordinator.
+
+        Args:
+            machine_count: Fleet-wide machine count per machine type
+            workers: Number of workers to wait for
+            interval: Tick interval of every worker in seconds
+            duration: Simulation duration in seconds (0 runs until stopped)
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port, see ``address``)
+            correlated: Whether workers use correlated sensor generation
+            seed: Base seed of the workers' generators; worker ``i`` uses ``seed + i``
+            start_delay: Seconds between sending the assignments and the first tick
+            report_every: Seconds between aggregated reports (defaults to the interval)
+            accept_timeout: Seconds to wait for all workers to connect
+        """
+        self.machine_count = dict(machine_count)
+        self.worker_count = workers
+        self.interval = interval
+        self.duration = duration
+        self.correlated = correlated
+        self.seed = seed
+        self.start_delay = start_delay
+        self.report_every = report_every or max(interval, 1)
+        self.accept_timeout = accept_timeout
+        self.workers: List[_WorkerHandle] = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._start = None
+
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(workers)
+        self.address = self._server.getsockname()
+
+    def _accept_workers(self):
+        """Accept connections until every expected worker has said hello."""
+        deadline = time.monotonic() + self.accept_timeout
+        while len(self.workers) < self.worker_count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Only {len(self.workers)} of {self.worker_count} workers connected "
+                                   f"within {self.accept_timeout} seconds")
+            self._server.settimeout(remaining)
+            sock, address = self._server.accept()
+            # A connected but silent peer may only use up the remaining accept budget
+            sock.settimeout(max(deadline - time.monotonic(), 0.001))
+            stream = sock.makefile("r", encoding="utf-8")
+            try:
+                hello = json.loads(stream.readline() or "{}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Rejecting connection from {address[0]}:{address[1]}: no greeting ({e})")
+                sock.close()
+                continue
+            sock.settimeout(None)
+            if hello.get("type") != "hello" or hello.get("version") != PROTOCOL_VERSION:
+                logger.warning(f"Rejecting connection from {address[0]}:{address[1]}: unexpected greeting {hello}")
+                sock.close()
+                continue
+            worker = _WorkerHandle(len(self.workers), sock, address, hello.get("name") or f"{address[0]}:{address[1]}")
+            self.workers.append(worker)
+            threading.Thread(target=self._read_worker, args=(worker, stream), daemon=True,
+                             name=f"coordinator-{worker.name}").start()
+            logger.info(f"Worker {worker.name} connected ({len(self.workers)}/{self.worker_count})")
+
+    def _read_worker(self, worker: _WorkerHandle, stream):
+        """Store the reports of one worker as they arrive."""
+        try:
+            for message in _read_messages(stream):
+                with self._changed:
+                    if message.get("type") in ("stats", "done"):
+                        worker.stats = message.get("stats", {})
+                    if message.get("type") == "done":
+                        worker.done = True
+                    elif message.get("type") == "error":
+                        worker.error = message.get("error")
+                    self._changed.notify_all()
+        except (OSError, ValueError) as e:
+            worker.error = worker.error or str(e)
+        with self._changed:
+            if not worker.done:
+                worker.error = worker.error or "connection closed"
+                worker.done = True
+                logger.error(f"Worker {worker.name} stopped unexpectedly: {worker.error}")
+            self._changed.notify_all()
+
+    def _assign(self):
+        """Send every worker its machine range and the common tick grid."""
+        assignments = partition_machines(self.machine_count, self.worker_count)
+        self._start = time.monotonic() + self.start_delay
+        for worker, assignment in zip(self.workers, assignments):
+            worker.machines = sum(assignment["machine_count"].values())
+            _send_message(worker.sock, {
+                "type": "assign",
+                "worker": worker.index,
+                "machine_count": assignment["machine_count"],
+                "first_index": assignment["first_index"],
+                "interval": self.interval,
+                "duration": self.duration,
+                "correlated": self.correlated,
+                "seed": None if self.seed is None else self.seed + worker.index,
+                "start_in": max(0.0, self._start - time.monotonic()),
+                "report_every": self.report_every,
+            })
+        logger.info(f"Assigned {sum(self.machine_count.values())} machines to {self.worker_count} workers, "
+                    f"first tick in {self.start_delay:.1f} seconds")
+
+    def aggregate(self) -> Dict[str, Any]:
+        """
+        Combine the latest reports of all workers.
+
+        Returns:
+            Fleet-wide totals, message throughput since the first tick and the
+            worst tick lateness, plus a ``workers`` list with each worker's report
+        """
+        with self._lock:
+            reports = [(worker, dict(worker.stats)) for worker in self.workers]
+        elapsed = max(0.0, time.monotonic() - self._start) if self._start is not None else 0.0
+        messages = sum(stats.get("messages", 0) for _, stats in reports)
+        ticks = [stats.get("ticks", 0) for _, stats in reports]
+        return {
+            "workers_total": len(reports),
+            "workers_running": sum(not worker.done for worker, _ in reports),
+            "workers_failed": sum(worker.error is not None for worker, _ in reports),
+            "machines": sum(worker.machines for worker, _ in reports),
+            "messages": messages,
+            "send_failures": sum(stats.get("send_failures", 0) for _, stats in reports),
+            "late_ticks": sum(stats.get("late_ticks", 0) for _, stats in reports),
+            "ticks_min": min(ticks, default=0),
+            "ticks_max": max(ticks, default=0),
+            "max_start_lag_ms": max((stats.get("max_start_lag_ms", 0.0) for _, stats in reports), default=0.0),
+            "messages_per_s": round(messages / elapsed, 1) if elapsed > 0 else 0.0,
+            "elapsed_s": round(elapsed, 3),
+            "workers": [dict(stats, name=worker.name, machines=worker.machines, error=worker.error)
+                        for worker, stats in reports],
+        }
+
+    def stop(self):
+        """Ask every worker to finish its current tick and report."""
+        for worker in self.workers:
+            try:
+                _send_message(worker.sock, {"type": "stop"})
+            except OSError:
+                pass
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Run the distributed simulation until every worker has finished.
+
+        Returns:
+            Final aggregated report, see aggregate
+        """
+        logger.info(f"Coordinator listening on {self.address[0]}:{self.address[1]}, "
+                    f"waiting for {self.worker_count} workers")
+        try:
+            self._accept_workers()
+            self._assign()
+            next_report = self._start + self.report_every
+            while True:
+                with self._changed:
+                    if all(worker.done for worker in self.workers):
+                        break
+                    self._changed.wait(max(0.0, next_report - time.monotonic()))
+                if time.monotonic() >= next_report:
+                    next_report += self.report_every
+                    self._log_report(self.aggregate())
+        except KeyboardInterrupt:
+            logger.info("Stopping workers")
+            self.stop()
+            with self._changed:
+                self._changed.wait_for(lambda: all(worker.done for worker in self.workers),
+                                       timeout=self.interval + 10)
+        finally:
+            self._server.close()
+
+        summary = self.aggregate()
+        for worker in self.workers:
+            worker.sock.close()
+        return summary
+
+    @staticmethod
+    def _log_report(report: Dict[str, Any]):
+        logger.info(f"Fleet: {report['messages']} messages ({report['messages_per_s']}/s), "
+                    f"{report['send_failures']} send failures, ticks {report['ticks_min']}-{report['ticks_max']}, "
+                    f"{report['late_ticks']} late ticks, max start lag {report['max_start_lag_ms']} ms, "
+                    f"{report['workers_running']}/{report['workers_total']} workers running")
+
+
+class Worker:
+    """
+    Simulate the machine range handed out by a Coordinator.
+
+    The worker connects, receives its assignment, builds a SensorSimulator for
+    its machine-ID range and runs it on the coordinator's tick grid, sending its
+    counters back every ``report_every`` seconds and once more when it finishes.
+    The ThingsBoard connection is configured locally, so every host can use its
+    own tokens file or local-only mode.
+    """
+
+    def __init__(self, coordinator: str, thingsboard_config: Optional[Dict[str, Any]] = None,
+                 name: str = None, connect_timeout: float = 60.0):
+        """
+        Initialize the worker.
+
+        Args:
+            coordinator: Coordinator address as ``host:port``
+            thingsboard_config: Connector configuration, as for SensorSimulator.simulate
+            name: Name shown in the coordinator's reports (defaults to host:pid)
+            connect_timeout: Seconds to keep retrying while the coordinator is not up yet
+        """
+        self.address = parse_address(coordinator)
+        self.thingsboard_config = thingsboard_config
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.connect_timeout = connect_timeout
+        self.simulator = None
+
+    def _connect(self) -> socket.socket:
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return socket.create_connection(self.address)
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+    def _listen_for_stop(self, stream):
+        """Stop the simulation when the coordinator asks to or goes away."""
+        try:
+            for message in _read_messages(stream):
+                if message.get("type") == "stop":
+                    break
+        except (OSError, ValueError):
+            pass
+        if self.simulator:
+            self.simulator.stop()
+
+    def _report(self, sock: socket.socket, every: float, finished: threading.Event):
+        while not finished.wait(every):
+            try:
+                _send_message(sock, {"type": "stats", "stats": self.simulator.get_stats()})
+            except OSError:
+                return
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Connect, simulate the assigned machines and report back.
+
+        Returns:
+            Final counters of the local simulation, see SensorSimulator.get_stats
+        """
+        from src.thingsboard.simulator import SensorSimulator
+
+        sock = self._connect()
+        stream = sock.makefile("r", encoding="utf-8")
+        _send_message(sock, {"type": "hello", "version": PROTOCOL_VERSION, "name": self.name})
+        assignment = json.loads(stream.readline() or "{}")
+        if assignment.get("type") != "assign":
+            sock.close()
+            raise ConnectionError("Coordinator closed the connection without an assignment")
+        # Convert the relative start to the local monotonic clock before doing any work
+        start_at = time.monotonic() + assignment["start_in"]
+
+        finished = threading.Event()
+        try:
+            self.simulator = SensorSimulator(assignment["machine_count"], correlated=assignment["correlated"],
+                                             seed=assignment["seed"], first_index=assignment["first_index"])
+            logger.info(f"Worker {assignment['worker']} simulating {len(self.simulator.machines)} machines")
+            threading.Thread(target=self._listen_for_stop, args=(stream,), daemon=True).start()
+            threading.Thread(target=self._report, args=(sock, assignment["report_every"], finished),
+                             daemon=True).start()
+            self.simulator.simulate(interval=assignment["interval"], duration=assignment["duration"],
+                                    thingsboard_config=self.thingsboard_config, start_at=start_at)
+        except Exception as e:
+            _send_message(sock, {"type": "error", "error": str(e)})
+            raise
+        finally:
+            finished.set()
+
+        stats = self.simulator.get_stats()
+        try:
+            _send_message(sock, {"type": "done", "stats": stats})
+        except OSError:
+            logger.warning("Coordinator went away before the final report")
+        sock.close()
+        return stats
+
+
+def spawn_local_workers(coordinator: str, count: int, worker_args: Sequence[str] = ("--local-only",)) -> List[subprocess.Popen]:
+    """
+    Start worker processes on this host, e.g. to test the distributed mode.
+
+    Args:
+        coordinator: Coordinator address the workers connect to
+        count: Number of worker processes
+        worker_args: Extra command line arguments of every worker (connection options)
+
+    Returns:
+        The started processes
+    """
+    command = [sys.executable, "-m", "src.thingsboard.main", "--worker", coordinator, *worker_args]
+    return [subprocess.Popen(command, cwd=_REPO_ROOT) for _ in range(count)]
@@ -0,0 +1,338 @@
+import heapq
+import itertools
+import json
+import logging
+import random
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.thingsboard.fleet import InjectedEvent
+
+logger = logging.getLogger(__name__)
+
+FAULT_KINDS = ("spike", "drift", "stuck", "dropout", "cascade")
+
+# Defaults of the per-tick random spike injector, matching the original simulator
+RANDOM_RATE = 0.01
+REPEAT_WEIGHT = 3
+SPIKE_FACTOR = 1.5
+
+
+class RandomSpikeInjector:
+    """
+    Spike one random sensor with a small probability per tick.
+
+    Machines that already had an event are ``repeat_weight`` times as likely to be
+    picked. Instead of building a weight per machine for every event, the pick is
+    split in two uniform draws: with probability ``N / (N + (w - 1) * R)`` any of
+    the N machines, otherwise one of the R machines with a previous event. This
+    gives every machine exactly its weight and costs O(1) per event.
+    """
+
+    def __init__(self, rate: float = RANDOM_RATE, repeat_weight: float = REPEAT_WEIGHT,
+                 factor: float = SPIKE_FACTOR, rng: random.Random = None):
+        """
+        Initialize the injector.
+
+        Args:
+            rate: Probability of an event per tick (0 disables the injector)
+            repeat_weight: Relative weight of machines that already had an event
+            factor: Spiked value as a multiple of the sensor's maximum
+            rng: Random generator (defaults to the ``random`` module)
+        """
+        self.rate = rate
+        self.repeat_weight = repeat_weight
+        self.factor = factor
+        self._random = rng or random
+        self.event_count: Dict[str, int] = {}
+        self._repeat: List[str] = []
+
+    def inject(self, data: Dict[str, Dict[str, Any]], simulator) -> List[InjectedEvent]:
+        """Possibly spike one reading of this tick's data in place."""
+        if self.rate <= 0 or self._random.random() >= self.rate:
+            return []
+        machine_ids = simulator.get_machine_ids()
+        if not machine_ids:
+            return []
+
+        total = len(machine_ids) + (self.repeat_weight - 1) * len(self._repeat)
+        if self._random.random() * total < len(machine_ids):
+            machine_id = machine_ids[int(self._random.random() * len(machine_ids))]
+        else:
+            slot = int(self._random.random() * len(self._repeat))
+            machine_id = self._repeat[slot]
+            if machine_id not in simulator.machines:
+                # Forget removed machines lazily with a swap-pop
+                self._repeat[slot] = self._repeat[-1]
+                self._repeat.pop()
+                del self.event_count[machine_id]
+                return []
+        # Machines in maintenance mode are not part of the tick
+        sensors = simulator.machine_sensors[machine_id] if machine_id in data else None
+        if not sensors:
+            return []
+
+        sensor = self._random.choice(sensors)
+        _, max_val = simulator.SENSOR_RANGES.get(sensor, (0, 100))
+        value = round(max_val * self.factor, 2)
+        data[machine_id][sensor] = value
+        if machine_id not in self.event_count:
+            self.event_count[machine_id] = 0
+            self._repeat.append(machine_id)
+        self.event_count[machine_id] += 1
+        logger.warning(f"[EVENT] Abnormal value injected: {machine_id} - {sensor} = {value} "
+                       f"(event #{self.event_count[machine_id]})")
+        return [InjectedEvent(machine_id, sensor, value)]
+
+
+class ActiveFault:
+    """
+    A fault applied to a fixed set of (machine, sensor) cells while it is active.
+
+    The per-cell parameters (sensor range, held value) are kept as arrays so a
+    tick transforms all of the fault's cells with a few vectorized operations;
+    the cost of a tick is proportional to the number of faulted cells.
+    """
+
+    def __init__(self, spec: Dict[str, Any], start: int, machine_ids: Sequence[str],
+                 sensors: Sequence[str], sensor_ranges: Dict[str, tuple]):
+        self.kind = spec["kind"]
+        self.spec = spec
+        self.start = start
+        duration = spec.get("duration", 1)
+        self.end = None if duration is None else start + duration
+        self.machine_ids = list(machine_ids)
+        self.sensors = list(sensors)
+        ranges = [sensor_ranges.get(sensor, (0, 100)) for sensor in self.sensors]
+        self.low = np.array([low for low, _ in ranges], dtype=np.float64)
+        self.high = np.array([high for _, high in ranges], dtype=np.float64)
+        self.held = np.full(len(self.sensors), np.nan)
+        if self.kind == "stuck" and spec.get("value") is not None:
+            self.held[:] = spec["value"]
+
+    def expired(self, tick_index: int) -> bool:
+        return self.end is not None and tick_index >= self.end
+
+    def apply(self, tick_index: int, data: Dict[str, Dict[str, Any]]) -> List[InjectedEvent]:
+        """Apply the fault to this tick's data in place and return the affected cells."""
+        present = [i for i, (machine_id, sensor) in enumerate(zip(self.machine_ids, self.sensors))
+                   if sensor in data.get(machine_id, ())]
+        if not present:
+            return []
+        index = np.array(present)
+
+        if self.kind == "dropout":
+            for i in present:
+                readings = data[self.machine_ids[i]]
+                del readings[self.sensors[i]]
+                readings.pop(f"{self.sensors[i]}_unit", None)
+            values = [float("nan")] * len(present)
+        else:
+            base = np.array([data[self.machine_ids[i]][self.sensors[i]] for i in present], dtype=np.float64)
+            if self.kind == "spike":
+                values = np.round(self.high[index] * self.spec.get("factor", SPIKE_FACTOR), 2)
+            elif self.kind == "drift":
+                # Offset grows by ``rate`` of the sensor range per tick since the fault started
+                age = tick_index - self.start + 1
+                span = self.high[index] - self.low[index]
+                values = np.round(base + self.spec.get("rate", 0.01) * span * age, 2)
+            else:
+                held = self.held[index]
+                unset = np.isnan(held)
+                held[unset] = base[unset]
+                self.held[index] = held
+                values = held
+            values = values.tolist()
+            for i, value in zip(present, values):
+                data[self.machine_ids[i]][self.sensors[i]] = value
+
+        return [InjectedEvent(self.machine_ids[i], self.sensors[i], value, self.kind)
+                for i, value in zip(present, values)]
+
+
+class FaultCampaign:
+    """
+    Fault scenario loaded from a JSON file.
+
+    Example::
+
+        {
+          "name": "line 2 bearing wear",
+          "seed": 7,
+          "random": {"rate": 0.0},
+          "faults": [
+            {"kind": "spike", "start": 10, "machines": ["MIXER_001"], "sensors": ["ROTARY_ENCODER"]},
+            {"kind": "drift", "start": 20, "duration": 200, "machine_type": "PUMP_SYSTEM", "count": 2,
+             "sensors": ["DIAPHRAGM_PRESSURE"], "rate": 0.005},
+            {"kind": "stuck", "start": 50, "duration": 30, "machines": ["CNC_MACHINE_002"]},
+            {"kind": "dropout", "start": 60, "duration": 10, "machine_type": "MIXER", "fraction": 0.1},
+            {"kind": "cascade", "start": 80, "machines": ["CONVEYOR_SYSTEM_001"], "hops": 3, "spread": 1,
+             "delay": 5, "fault": {"kind": "drift", "rate": 0.02, "duration": 40}}
+          ]
+        }
+
+    Ticks are counted from 0. ``duration`` is in ticks (default 1, ``null`` keeps
+    the fault active until the end). Targets are explicit ``machines``, or a random
+    ``count``/``fraction`` of ``machine_type`` (or of the whole fleet), picked when
+    the fault starts; ``sensors`` defaults to every sensor of each machine.
+    A cascade applies ``fault`` to its machines, then every ``delay`` ticks to the
+    next ``spread`` machines of the same type (by machine number) for ``hops`` hops.
+    ``random`` configures the per-tick random spike injector (``rate``,
+    ``repeat_weight``, ``factor``); set its rate to 0 to only run the listed faults.
+    """
+
+    def __init__(self, faults: Sequence[Dict[str, Any]] = (), name: str = "",
+                 seed: Optional[int] = None, random_spikes: Optional[Dict[str, Any]] = None):
+        """
+        Initialize a campaign.
+
+        Args:
+            faults: Fault specifications, see the class documentation
+            name: Campaign name used in logs
+            seed: Seed of the target selection and of the random injector
+            random_spikes: Settings of the random spike injector
+        """
+        self.name = name
+        self.seed = seed
+        self.random_spikes = dict(random_spikes or {})
+        self.faults = [self._validate(dict(spec)) for spec in faults]
+
+    @staticmethod
+    def _validate(spec: Dict[str, Any]) -> Dict[str, Any]:
+        kind = spec.get("kind")
+        if kind not in FAULT_KINDS:
+            raise ValueError(f"Unknown fault kind {kind!r}, expected one of {', '.join(FAULT_KINDS)}")
+        if kind == "cascade":
+            if "fault" not in spec:
+                raise ValueError("A cascade fault needs a 'fault' to propagate")
+            spec["fault"] = FaultCampaign._validate(dict(spec["fault"]))
+            if spec["fault"]["kind"] == "cascade":
+                raise ValueError("Cascades cannot be nested")
+        if spec.get("duration", 1) is not None and spec.get("duration", 1) < 1:
+            raise ValueError(f"Fault duration must be at least one tick, got {spec['duration']}")
+        return spec
+
+    @classmethod
+    def from_dict(cls, content: Dict[str, Any]) -> "FaultCampaign":
+        return cls(content.get("faults", []), content.get("name", ""), content.get("seed"), content.get("random"))
+
+    @classmethod
+    def load(cls, path: str) -> "FaultCampaign":
+        """Load a campaign from a JSON file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            campaign = cls.from_dict(json.load(f))
+        campaign.name = campaign.name or path
+        return campaign
+
+
+class FaultInjector:
+    """
+    Apply a FaultCampaign and the random spike injector to the simulator's ticks.
+
+    Faults wait in a heap ordered by start tick and move to the active list when
+    they start, so a tick only touches the faults that are active on it.
+    """
+
+    def __init__(self, campaign: Optional[FaultCampaign] = None):
+        """
+        Initialize the injector.
+
+        Args:
+            campaign: Fault campaign, or None to only run the random spike injector
+        """
+        self.campaign = campaign or FaultCampaign()
+        seed = self.campaign.seed
+        self._random = random.Random(seed) if seed is not None else random
+        self.random_spikes = RandomSpikeInjector(rng=self._random, **self.campaign.random_spikes)
+        self.active: List[ActiveFault] = []
+        self._order = itertools.count()
+        self._schedule = []
+        for spec in self.campaign.faults:
+            self._push(spec.get("start", 0), spec, None, 0)
+
+    def _push(self, tick_index: int, spec: Dict[str, Any], machines: Optional[List[str]], hop: int):
+        heapq.heappush(self._schedule, (tick_index, next(self._order), spec, machines, hop))
+
+    @property
+    def pending(self) -> int:
+        """Number of scheduled faults and cascade hops that have not started yet."""
+        return len(self._schedule)
+
+    def _select_machines(self, spec: Dict[str, Any], simulator) -> List[str]:
+        if "machines" in spec:
+            return [machine_id for machine_id in spec["machines"] if machine_id in simulator.machines]
+        candidates = simulator.get_machine_ids()
+        if spec.get("machine_type"):
+            candidates = [machine_id for machine_id in candidates
+                          if simulator.machines[machine_id] == spec["machine_type"]]
+        if "count" in spec or "fraction" in spec:
+            count = spec.get("count", round(spec.get("fraction", 0) * len(candidates)))
+            return self._random.sample(candidates, min(int(count), len(candidates)))
+        return list(candidates)
+
+    def _activate(self, spec: Dict[str, Any], tick_index: int, machine_ids: List[str], simulator):
+        machine_cells, sensor_cells = [], []
+        for machine_id in machine_ids:
+            sensors = simulator.machine_sensors[machine_id]
+            for sensor in spec.get("sensors") or sensors:
+                if sensor in sensors:
+                    machine_cells.append(machine_id)
+                    sensor_cells.append(sensor)
+        if machine_cells:
+            self.active.append(ActiveFault(spec, tick_index, machine_cells, sensor_cells, simulator.SENSOR_RANGES))
+            logger.info(f"Fault {spec['kind']} started on {len(machine_ids)} machines ({len(machine_cells)} sensors)")
+
+    def _neighbors(self, machine_ids: List[str], spread: int, simulator) -> List[str]:
+        """The next ``spread`` existing machines of the same type after each machine."""
+        neighbors = []
+        for machine_id in machine_ids:
+            machine_type = simulator.machines.get(machine_id)
+            prefix, _, number = machine_id.rpartition("_")
+            if machine_type is None or not number.isdigit():
+                continue
+            found = 0
+            for offset in range(1, 4 * spread + 1):
+                candidate = f"{prefix}_{int(number) + offset:03d}"
+                if candidate in simulator.machines and candidate not in neighbors:
+                    neighbors.append(candidate)
+                    found += 1
+                    if found == spread:
+                        break
+        return neighbors
+
+    def _start_due(self, tick_index: int, simulator):
+        while self._schedule and self._schedule[0][0] <= tick_index:
+            _, _, spec, machines, hop = heapq.heappop(self._schedule)
+            if machines is None:
+                machines = self._select_machines(spec, simulator)
+            elif hop > 0:
+                machines = self._neighbors(machines, spec.get("spread", 1), simulator)
+
+            if spec["kind"] != "cascade":
+                self._activate(spec, tick_index, machines, simulator)
+                continue
+            self._activate(spec["fault"], tick_index, machines, simulator)
+            if machines and hop < spec.get("hops", 3):
+                self._push(tick_index + spec.get("delay", 1), spec, machines, hop + 1)
+
+    def inject(self, tick_index: int, data: Dict[str, Dict[str, Any]], simulator) -> List[InjectedEvent]:
+        """
+        Apply every fault active on a tick to its data in place.
+
+        Args:
+            tick_index: Index of the tick, counted from 0
+            data: Output of SensorSimulator.generate_sensor_data for the tick
+            simulator: SensorSimulator that generated the data
+
+        Returns:
+            One InjectedEvent per faulted reading (NaN values for dropouts)
+        """
+        self._start_due(tick_index, simulator)
+        events = []
+        for fault in self.active:
+            events.extend(fault.apply(tick_index, data))
+        if self.active:
+            self.active = [fault for fault in self.active if not fault.expired(tick_index + 1)]
+        events.extend(self.random_spikes.inject(data, simulator))
+        return events
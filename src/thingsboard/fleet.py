@@ -0,0 +1,152 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class InjectedEvent:
+    """Abnormal value injected into a tick by the simulator (ground truth for detectors)."""
+    machine_id: str
+    sensor_type: str
+    value: float
+    kind: str = "spike"
+
+
+class FleetLayout:
+    """
+    Fixed mapping between the simulated fleet and a dense (machines x sensors) matrix.
+
+    Each machine occupies one row. Column ``j`` of a row holds the ``j``-th sensor
+    in ``MachineType.MACHINE_SENSORS`` for that machine's type, so machines of the
+    same type share a column meaning and the matrix is as wide as the machine type
+    with the most sensors. Unused cells are marked invalid and hold NaN.
+    """
+
+    def __init__(self, machines: Dict[str, str], machine_sensors: Dict[str, List[str]],
+                 sensor_ranges: Dict[str, tuple], sensor_units: Dict[str, str],
+                 safety_sensors: List[str] = (), version: int = 0):
+        """
+        Build a layout for a set of machines.
+
+        Args:
+            machines: Dictionary mapping machine IDs to machine types
+            machine_sensors: Dictionary mapping machine IDs to their sensor types
+            sensor_ranges: Normal (min, max) range for each sensor type
+            sensor_units: Unit for each sensor type
+            safety_sensors: Binary sensors where 1 means safe and 0 means tripped
+            version: Layout version, increased every time the fleet changes shape
+        """
+        self.version = version
+        self.machine_ids = list(machines)
+        self.machine_types = [machines[machine_id] for machine_id in self.machine_ids]
+        self.row_of = {machine_id: row for row, machine_id in enumerate(self.machine_ids)}
+        self.width = max((len(machine_sensors[machine_id]) for machine_id in self.machine_ids), default=0)
+
+        # Sensor types are also encoded as integer codes so per-type parameters
+        # can be gathered into (machines x sensors) arrays with one indexing operation.
+        self.sensor_types = sorted({sensor for machine_id in self.machine_ids
+                                    for sensor in machine_sensors[machine_id]})
+        code_of = {sensor: code for code, sensor in enumerate(self.sensor_types)}
+
+        shape = (len(self.machine_ids), self.width)
+        self.sensor_codes = np.full(shape, -1, dtype=np.int32)
+        self.columns: Dict[str, List[str]] = {}
+        for row, machine_id in enumerate(self.machine_ids):
+            sensors = machine_sensors[machine_id]
+            self.columns.setdefault(machines[machine_id], list(sensors))
+            self.sensor_codes[row, :len(sensors)] = [code_of[sensor] for sensor in sensors]
+        self.valid = self.sensor_codes >= 0
+
+        type_low = np.array([sensor_ranges.get(s, (0, 100))[0] for s in self.sensor_types] + [np.nan])
+        type_high = np.array([sensor_ranges.get(s, (0, 100))[1] for s in self.sensor_types] + [np.nan])
+        type_binary = np.array([sensor_units.get(s) == "binary" for s in self.sensor_types] + [False])
+        type_safety = np.array([s in safety_sensors for s in self.sensor_types] + [False])
+
+        # Code -1 (padding) picks the trailing sentinel entry of each lookup table
+        self.low = type_low[self.sensor_codes].astype(np.float64)
+        self.high = type_high[self.sensor_codes].astype(np.float64)
+        self.binary = type_binary[self.sensor_codes]
+        self.safety = type_safety[self.sensor_codes]
+
+    @property
+    def shape(self):
+        """Shape of the fleet matrix."""
+        return len(self.machine_ids), self.width
+
+    def sensors_of(self, row: int) -> List[str]:
+        """Get the sensor types in column order for a row."""
+        return self.columns[self.machine_types[row]]
+
+    def cell(self, machine_id: str, sensor_type: str) -> Optional[tuple]:
+        """Get the (row, column) of a machine's sensor, or None if it has no such sensor."""
+        row = self.row_of.get(machine_id)
+        if row is None:
+            return None
+        sensors = self.sensors_of(row)
+        if sensor_type not in sensors:
+            return None
+        return row, sensors.index(sensor_type)
+
+    def matrix_from_tick(self, data: Dict[str, Dict[str, Any]]) -> np.ndarray:
+        """
+        Pack the per-machine dictionaries of a tick into a fleet matrix.
+
+        Args:
+            data: Output of SensorSimulator.generate_sensor_data
+
+        Returns:
+            Float matrix of shape ``self.shape`` with NaN for missing readings
+        """
+        matrix = np.full(self.shape, np.nan)
+        for machine_id, values in data.items():
+            row = self.row_of.get(machine_id)
+            if row is None:
+                continue
+            matrix[row, :len(self.sensors_of(row))] = [
+                values.get(sensor, np.nan) for sensor in self.sensors_of(row)]
+        return matrix
+
+    def remap(self, array: np.ndarray, old_layout: "FleetLayout", fill=np.nan) -> np.ndarray:
+        """
+        Move per-machine rows of an array built for ``old_layout`` onto this layout.
+
+        Rows are matched by machine ID; machines that are new in this layout are
+        filled with ``fill``. Extra trailing dimensions are preserved.
+
+        Args:
+            array: Array whose first two dimensions follow ``old_layout.shape``
+            old_layout: Layout the array was built for
+            fill: Value for rows and columns that have no previous data
+
+        Returns:
+            Array whose first two dimensions follow ``self.shape``
+        """
+        result = np.full(self.shape + array.shape[2:], fill, dtype=array.dtype)
+        width = min(self.width, old_layout.width)
+        new_rows, old_rows = [], []
+        for machine_id, old_row in old_layout.row_of.items():
+            new_row = self.row_of.get(machine_id)
+            if new_row is not None:
+                new_rows.append(new_row)
+                old_rows.append(old_row)
+        if new_rows:
+            result[new_rows, :width] = array[old_rows, :width]
+        return result
+
+
+@dataclass
+class FleetTick:
+    """One simulation tick as delivered to in-process tick listeners."""
+    index: int
+    timestamp: int
+    data: Dict[str, Dict[str, Any]]
+    layout: FleetLayout
+    events: List[InjectedEvent] = field(default_factory=list)
+    matrix: Optional[np.ndarray] = None
+
+    def get_matrix(self) -> np.ndarray:
+        """Get the tick's values as a fleet matrix, packing them on first use."""
+        if self.matrix is None:
+            self.matrix = self.layout.matrix_from_tick(self.data)
+        return self.matrix
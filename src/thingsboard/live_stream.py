@@ -0,0 +1,312 @@
+import base64
+import hashlib
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from src.thingsboard.distributed import parse_address
+from src.thingsboard.fleet import FleetTick
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_ADDRESS = "127.0.0.1:7702"
+DEFAULT_CLIENT_QUEUE = 16
+DEFAULT_SEND_TIMEOUT = 5.0
+KEEPALIVE_INTERVAL = 15.0
+
+SSE = "sse"
+WEBSOCKET = "websocket"
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _split(values: List[str]) -> FrozenSet[str]:
+    """Collect repeated or comma-separated query parameter values."""
+    return frozenset(item for value in values for item in value.split(",") if item)
+
+
+def _websocket_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """Frame a payload as a single unmasked server-to-client WebSocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 1 << 16:
+        header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, "big")
+    else:
+        header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, "big")
+    return header + payload
+
+
+class _Client:
+    """One subscriber: its filter, protocol and bounded queue of framed messages."""
+
+    def __init__(self, connection: socket.socket, address, protocol: str,
+                 machine_types: FrozenSet[str], machine_ids: FrozenSet[str], queue_size: int):
+        self.connection = connection
+        self.address = address
+        self.protocol = protocol
+        self.machine_types = machine_types
+        self.machine_ids = machine_ids
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    @property
+    def filter_key(self) -> Optional[Tuple[FrozenSet[str], FrozenSet[str]]]:
+        """Key shared by clients that receive the same payload (None means everything)."""
+        if not self.machine_types and not self.machine_ids:
+            return None
+        return self.machine_types, self.machine_ids
+
+    def drop(self):
+        """Disconnect a client that fell behind; its handler thread exits on the broken socket."""
+        self.dropped = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _StreamHTTPServer(ThreadingHTTPServer):
+    """Threading HTTP server that can rebind its port right after a restart."""
+
+    allow_reuse_address = True
+
+
+class LiveStreamServer:
+    """
+    Broadcast every simulated tick to local subscribers over SSE or WebSocket.
+
+    Each tick is sent as one JSON message ``{"tick", "ts", "data"}`` where
+    ``data`` maps machine IDs to their readings, as returned by
+    ``SensorSimulator.generate_sensor_data``. Clients connect to any path, e.g.
+    ``/stream?machine_type=MIXER,CNC_MACHINE`` or ``/stream?machine_id=PUMP_SYSTEM_001``,
+    and get a WebSocket if they ask for an upgrade and a Server-Sent Events
+    stream otherwise. ``/status`` returns the server's statistics.
+
+    Serialization happens once per tick on the tick thread: every machine's
+    readings are encoded once and the payload of each distinct filter is joined
+    from those fragments, so clients with the same filter share one buffer. Each
+    client has a bounded queue drained by its own connection thread; a client
+    whose queue is full is disconnected instead of slowing down the simulation.
+    """
+
+    def __init__(self, simulator=None, address: str = DEFAULT_STREAM_ADDRESS,
+                 queue_size: int = DEFAULT_CLIENT_QUEUE, send_timeout: float = DEFAULT_SEND_TIMEOUT):
+        """
+        Initialize the server.
+
+        Args:
+            simulator: Optional SensorSimulator to subscribe to immediately
+            address: ``host:port`` to listen on; keep it on localhost, there is no authentication
+            queue_size: Ticks buffered per client before it is dropped as too slow
+            send_timeout: Seconds a write to one client may block before it is dropped
+        """
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self._clients: List[_Client] = []
+        # Guards the client list and the statistics, which connection threads and the tick thread both update
+        self._clients_lock = threading.Lock()
+        self._layout = None
+        self._type_of: Dict[str, str] = {}
+        self.stats = {"ticks": 0, "clients": 0, "connected": 0, "dropped": 0,
+                      "messages": 0, "bytes_serialized": 0, "serialize_ms": 0.0}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} {format % args}")
+
+        self._server = _StreamHTTPServer(parse_address(address), Handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+        self._thread: Optional[threading.Thread] = None
+
+        if simulator is not None:
+            self.attach(simulator)
+
+    def attach(self, simulator):
+        """Subscribe to a simulator's per-tick output."""
+        simulator.add_tick_listener(self.on_tick)
+
+    def detach(self, simulator):
+        """Stop receiving ticks from a simulator."""
+        simulator.remove_tick_listener(self.on_tick)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the fan-out statistics."""
+        with self._clients_lock:
+            stats = dict(self.stats)
+            stats["clients"] = len(self._clients)
+        stats["serialize_ms"] = round(stats["serialize_ms"], 3)
+        return stats
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        """Serve one HTTP request on its connection thread."""
+        url = urlsplit(handler.path)
+        if url.path == "/status":
+            body = json.dumps(self.get_stats()).encode("utf-8")
+            handler.send_response(200)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+            return
+
+        query = parse_qs(url.query)
+        if handler.headers.get("Upgrade", "").lower() == "websocket":
+            key = handler.headers.get("Sec-WebSocket-Key")
+            if not key:
+                handler.send_error(400, "Missing Sec-WebSocket-Key")
+                return
+            accept = base64.b64encode(hashlib.sha1((key + _WEBSOCKET_GUID).encode("ascii")).digest())
+            handler.send_response(101)
+            handler.send_header("Upgrade", "websocket")
+            handler.send_header("Connection", "Upgrade")
+            handler.send_header("Sec-WebSocket-Accept", accept.decode("ascii"))
+            protocol = WEBSOCKET
+        else:
+            handler.send_response(200)
+            handler.send_header("Content-Type", "text/event-stream")
+            handler.send_header("Cache-Control", "no-cache")
+            protocol = SSE
+        handler.end_headers()
+        handler.close_connection = True
+
+        client = _Client(handler.connection, handler.client_address, protocol,
+                         _split(query.get("machine_type", [])), _split(query.get("machine_id", [])),
+                         self.queue_size)
+        handler.connection.settimeout(self.send_timeout)
+        with self._clients_lock:
+            self._clients.append(client)
+            self.stats["connected"] += 1
+        logger.info(f"Live stream client {client.address[0]}:{client.address[1]} connected ({protocol})")
+        try:
+            self._serve(client, handler.wfile)
+        except OSError:
+            if not client.dropped:
+                logger.info(f"Live stream client {client.address[0]}:{client.address[1]} disconnected")
+        finally:
+            with self._clients_lock:
+                if client in self._clients:
+                    self._clients.remove(client)
+
+    def _serve(self, client: _Client, stream):
+        """Write a client's queued messages until it disconnects, is dropped or the server stops."""
+        keepalive = _websocket_frame(b"", opcode=0x9) if client.protocol == WEBSOCKET else b":\n\n"
+        while not client.dropped:
+            try:
+                message = client.queue.get(timeout=KEEPALIVE_INTERVAL)
+            except queue.Empty:
+                message = keepalive
+            if message is None:
+                break
+            stream.write(message)
+
+    def on_tick(self, tick: FleetTick):
+        """Serialize a tick once and queue it for every client."""
+        with self._clients_lock:
+            clients = list(self._clients)
+            self.stats["ticks"] += 1
+        if not clients:
+            return
+
+        start = time.perf_counter()
+        if tick.layout is not self._layout:
+            self._layout = tick.layout
+            self._type_of = dict(zip(tick.layout.machine_ids, tick.layout.machine_types))
+        prefix = f'{{"tick":{tick.index},"ts":{tick.timestamp},"data":{{'.encode("utf-8")
+        payloads: Dict[Any, bytes] = {}
+        fragments = None
+        if all(client.filter_key is None for client in clients):
+            payloads[None] = prefix + json.dumps(tick.data, separators=(",", ":"))[1:].encode("utf-8") + b"}"
+        else:
+            # Encode each machine once; every payload is joined from these
+            fragments = [(machine_id, self._type_of.get(machine_id),
+                          json.dumps({machine_id: values}, separators=(",", ":"))[1:-1].encode("utf-8"))
+                         for machine_id, values in tick.data.items()]
+            payloads[None] = prefix + b",".join(fragment for _, _, fragment in fragments) + b"}}"
+
+        frames: Dict[Tuple[Any, str], bytes] = {}
+        serialized = messages = 0
+        dropped = []
+        for client in clients:
+            key = client.filter_key
+            if key not in payloads:
+                machine_types, machine_ids = key
+                payloads[key] = prefix + b",".join(
+                    fragment for machine_id, machine_type, fragment in fragments
+                    if machine_id in machine_ids or machine_type in machine_types) + b"}}"
+            frame = frames.get((key, client.protocol))
+            if frame is None:
+                payload = payloads[key]
+                if client.protocol == WEBSOCKET:
+                    frame = _websocket_frame(payload)
+                else:
+                    frame = b"id: %d\ndata: %s\n\n" % (tick.index, payload)
+                frames[(key, client.protocol)] = frame
+                serialized += len(frame)
+            try:
+                client.queue.put_nowait(frame)
+                messages += 1
+            except queue.Full:
+                logger.warning(f"Dropping live stream client {client.address[0]}:{client.address[1]}: "
+                               f"{self.queue_size} ticks behind")
+                dropped.append(client)
+        with self._clients_lock:
+            for client in dropped:
+                if client in self._clients:
+                    self._clients.remove(client)
+            self.stats["bytes_serialized"] += serialized
+            self.stats["messages"] += messages
+            self.stats["dropped"] += len(dropped)
+            self.stats["serialize_ms"] += (time.perf_counter() - start) * 1000
+        for client in dropped:
+            client.drop()
+
+    def start(self):
+        """Serve clients in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="live-stream")
+        self._thread.start()
+        logger.info(f"Live stream listening on http://{self.address[0]}:{self.address[1]}/stream")
+
+    def stop(self):
+        """Disconnect every client, stop serving and close the socket."""
+        with self._clients_lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.dropped = True
+            try:
+                client.queue.put_nowait(None)
+            except queue.Full:
+                client.drop()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import urllib.request
+
+    parser = argparse.ArgumentParser(description="Print the ticks streamed by a running simulator")
+    parser.add_argument("--address", default=DEFAULT_STREAM_ADDRESS, help="Live stream address (host:port)")
+    parser.add_argument("--machine-type", default=None, help="Only stream these machine types (comma-separated)")
+    parser.add_argument("--machine-id", default=None, help="Only stream these machines (comma-separated)")
+    args = parser.parse_args()
+
+    params = [f"machine_type={args.machine_type}"] if args.machine_type else []
+    params += [f"machine_id={args.machine_id}"] if args.machine_id else []
+    with urllib.request.urlopen(f"http://{args.address}/stream?{'&'.join(params)}") as response:
+        for line in response:
+            if line.startswith(b"data: "):
+                message = json.loads(line[6:])
+                print(f"tick {message['tick']}: {json.dumps(message['data'])}")
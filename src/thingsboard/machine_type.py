@@ -111,4 +111,104 @@ class MachineType:
             SensorType.MEMS_ACCELEROMETER,
             SensorType.PROXIMITY_PROBE
         ]
-    } 
\ No newline at end of file
+    }
+
+    # Correlation between the per-tick changes of a machine's analog sensors,
+    # declared as (sensor_a, sensor_b, coefficient) over that type's MACHINE_SENSORS.
+    # Together with each sensor's step size this defines the covariance that
+    # SensorSimulator samples from; pairs that are not listed are uncorrelated.
+    # Sensors coupled through a common cause also list their indirect pair, which
+    # keeps every matrix positive definite.
+    SENSOR_CORRELATIONS = {
+        MIXER: [
+            # Temperature probes measure the same bath
+            (SensorType.RTD_PT100, SensorType.THERMOCOUPLE_K_TYPE, 0.9),
+            (SensorType.RTD_PT100, SensorType.INFRARED_TEMP, 0.85),
+            (SensorType.THERMOCOUPLE_K_TYPE, SensorType.INFRARED_TEMP, 0.85),
+            # Electrical load drives speed and heat
+            (SensorType.CURRENT_TRANSFORMER, SensorType.POWER_METER, 0.95),
+            (SensorType.POWER_METER, SensorType.ROTARY_ENCODER, 0.6),
+            (SensorType.CURRENT_TRANSFORMER, SensorType.ROTARY_ENCODER, 0.6),
+            (SensorType.POWER_METER, SensorType.RTD_PT100, 0.4),
+            (SensorType.POWER_METER, SensorType.THERMOCOUPLE_K_TYPE, 0.4),
+            (SensorType.POWER_METER, SensorType.INFRARED_TEMP, 0.35),
+            (SensorType.CURRENT_TRANSFORMER, SensorType.RTD_PT100, 0.35),
+            (SensorType.CURRENT_TRANSFORMER, SensorType.THERMOCOUPLE_K_TYPE, 0.35),
+            (SensorType.CURRENT_TRANSFORMER, SensorType.INFRARED_TEMP, 0.3),
+            # Vibration and noise
+            (SensorType.PIEZOELECTRIC_ACCELEROMETER, SensorType.GYROSCOPE, 0.5),
+            (SensorType.PIEZOELECTRIC_ACCELEROMETER, SensorType.INDUSTRIAL_MICROPHONE, 0.6),
+            (SensorType.GYROSCOPE, SensorType.INDUSTRIAL_MICROPHONE, 0.3),
+            # Two level gauges on the same tank
+            (SensorType.CAPACITIVE_LEVEL, SensorType.ULTRASONIC_LEVEL, 0.9),
+        ],
+        CNC_MACHINE: [
+            (SensorType.RTD_PT100, SensorType.THERMOCOUPLE_J_TYPE, 0.85),
+            (SensorType.RTD_PT100, SensorType.THERMAL_IMAGING, 0.8),
+            (SensorType.THERMOCOUPLE_J_TYPE, SensorType.THERMAL_IMAGING, 0.8),
+            # Spindle vibration
+            (SensorType.MEMS_ACCELEROMETER, SensorType.PROXIMITY_PROBE, 0.6),
+            (SensorType.MEMS_ACCELEROMETER, SensorType.STRAIN_GAUGE, 0.4),
+            (SensorType.MEMS_ACCELEROMETER, SensorType.ACOUSTIC_EMISSION, 0.6),
+            (SensorType.PROXIMITY_PROBE, SensorType.ACOUSTIC_EMISSION, 0.35),
+            (SensorType.PROXIMITY_PROBE, SensorType.STRAIN_GAUGE, 0.25),
+            (SensorType.STRAIN_GAUGE, SensorType.ACOUSTIC_EMISSION, 0.25),
+            # Axis position
+            (SensorType.LINEAR_ENCODER, SensorType.LASER_DISTANCE, 0.7),
+            (SensorType.LINEAR_ENCODER, SensorType.LVDT, 0.6),
+            (SensorType.LASER_DISTANCE, SensorType.LVDT, 0.45),
+            # Coolant circuit
+            (SensorType.PRESSURE_TRANSDUCER, SensorType.DIFFERENTIAL_PRESSURE, 0.7),
+            (SensorType.PRESSURE_TRANSDUCER, SensorType.ELECTROMAGNETIC_FLOW, 0.5),
+            (SensorType.DIFFERENTIAL_PRESSURE, SensorType.ELECTROMAGNETIC_FLOW, 0.4),
+        ],
+        HYDRAULIC_PRESS: [
+            # Three gauges on the same hydraulic circuit
+            (SensorType.STRAIN_GAUGE_PRESSURE, SensorType.PIEZOELECTRIC_PRESSURE, 0.9),
+            (SensorType.STRAIN_GAUGE_PRESSURE, SensorType.BOURDON_TUBE_GAUGE, 0.9),
+            (SensorType.PIEZOELECTRIC_PRESSURE, SensorType.BOURDON_TUBE_GAUGE, 0.85),
+            # Pressing force follows pressure
+            (SensorType.STRAIN_GAUGE_PRESSURE, SensorType.LOAD_CELL, 0.7),
+            (SensorType.PIEZOELECTRIC_PRESSURE, SensorType.LOAD_CELL, 0.65),
+            (SensorType.BOURDON_TUBE_GAUGE, SensorType.LOAD_CELL, 0.65),
+            (SensorType.LOAD_CELL, SensorType.STRAIN_GAUGE, 0.7),
+            (SensorType.LOAD_CELL, SensorType.PIEZOELECTRIC_FORCE, 0.7),
+            (SensorType.STRAIN_GAUGE, SensorType.PIEZOELECTRIC_FORCE, 0.5),
+            (SensorType.STRAIN_GAUGE_PRESSURE, SensorType.STRAIN_GAUGE, 0.45),
+            (SensorType.PIEZOELECTRIC_PRESSURE, SensorType.STRAIN_GAUGE, 0.4),
+            (SensorType.BOURDON_TUBE_GAUGE, SensorType.STRAIN_GAUGE, 0.4),
+            (SensorType.STRAIN_GAUGE_PRESSURE, SensorType.PIEZOELECTRIC_FORCE, 0.45),
+            (SensorType.PIEZOELECTRIC_PRESSURE, SensorType.PIEZOELECTRIC_FORCE, 0.4),
+            (SensorType.BOURDON_TUBE_GAUGE, SensorType.PIEZOELECTRIC_FORCE, 0.4),
+            # Oil temperature
+            (SensorType.RTD_PT100, SensorType.THERMISTOR, 0.85),
+            (SensorType.RTD_PT100, SensorType.BIMETALLIC_TEMP_SWITCH, 0.8),
+            (SensorType.THERMISTOR, SensorType.BIMETALLIC_TEMP_SWITCH, 0.75),
+            (SensorType.LVDT, SensorType.MAGNETOSTRICTIVE_POSITION, 0.9),
+            (SensorType.INDUSTRIAL_ACCELEROMETER, SensorType.VELOCITY_SENSOR, 0.8),
+        ],
+        CONVEYOR_SYSTEM: [
+            (SensorType.TACHOMETER, SensorType.INCREMENTAL_ENCODER, 0.9),
+            (SensorType.BELT_SCALE_LOAD_CELL, SensorType.STRAIN_GAUGE, 0.85),
+            # A heavier belt runs slightly slower
+            (SensorType.BELT_SCALE_LOAD_CELL, SensorType.TACHOMETER, -0.3),
+            (SensorType.BELT_SCALE_LOAD_CELL, SensorType.INCREMENTAL_ENCODER, -0.27),
+            (SensorType.STRAIN_GAUGE, SensorType.TACHOMETER, -0.25),
+            (SensorType.STRAIN_GAUGE, SensorType.INCREMENTAL_ENCODER, -0.23),
+            (SensorType.LASER_SCANNER, SensorType.ULTRASONIC_SENSOR, 0.7),
+        ],
+        PUMP_SYSTEM: [
+            # Three flow meters in series
+            (SensorType.ELECTROMAGNETIC_FLOW, SensorType.TURBINE_FLOW, 0.9),
+            (SensorType.ELECTROMAGNETIC_FLOW, SensorType.ULTRASONIC_FLOW, 0.9),
+            (SensorType.TURBINE_FLOW, SensorType.ULTRASONIC_FLOW, 0.85),
+            # Head pressure
+            (SensorType.BOURDON_PRESSURE_GAUGE, SensorType.DIAPHRAGM_PRESSURE, 0.9),
+            (SensorType.DIFFERENTIAL_PRESSURE, SensorType.ELECTROMAGNETIC_FLOW, 0.6),
+            (SensorType.DIFFERENTIAL_PRESSURE, SensorType.TURBINE_FLOW, 0.55),
+            (SensorType.DIFFERENTIAL_PRESSURE, SensorType.ULTRASONIC_FLOW, 0.55),
+            (SensorType.RADAR_LEVEL, SensorType.HYDROSTATIC_LEVEL, 0.9),
+            # Bearing vibration
+            (SensorType.MEMS_ACCELEROMETER, SensorType.PROXIMITY_PROBE, 0.6),
+        ],
+    }
@@ -6,12 +6,152 @@ from pathlib import Path
 from dotenv import load_dotenv
 
 from src.thingsboard.simulator import SensorSimulator, MachineType
-from src.thingsboard.multi_device_connector import MultiDeviceConnector
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("SensorSimulation")
 
+def build_thingsboard_config(args):
+    """Build the ThingsBoard configuration from the command line, or None for local-only mode."""
+    if args.local_only:
+        logger.info("Running in local-only mode (no ThingsBoard connection)")
+        tb_config = None
+    elif args.tokens_file:
+        logger.info(f"Using multi-device mode with tokens from: {args.tokens_file}")
+        tb_config = {
+            "host": args.host,
+            "port": args.port,
+            "tokens_file": args.tokens_file,
+            "https_mode": args.https,
+            "multi_device": True,
+            "payload_format": args.payload_format
+        }
+        tb_config.update(bulk_upload_config(args), http=http_config(args), **pipeline_config(args))
+    elif args.token:
+        logger.info("Using single-token mode")
+        tb_config = {
+            "host": args.host,
+            "port": args.port,
+            "access_token": args.token,
+            "https_mode": args.https,
+            "multi_device": False,
+            "payload_format": args.payload_format
+        }
+        tb_config.update(bulk_upload_config(args), http=http_config(args), **pipeline_config(args))
+    else:
+        logger.info("No token provided, running in local-only mode")
+        tb_config = None
+    return tb_config
+
+
+def http_config(args):
+    """Timeouts, retries and circuit breaker settings of HTTP sends."""
+    return {
+        "connect_timeout": args.connect_timeout,
+        "read_timeout": args.read_timeout,
+        "max_retries": args.max_retries,
+        "breaker_threshold": args.breaker_threshold,
+        "breaker_reset": args.breaker_reset,
+        "max_block_fraction": args.max_block_fraction,
+    }
+
+
+def pipeline_config(args):
+    """ThingsBoard configuration entry that sends through background workers instead of the tick loop."""
+    if args.send_workers <= 0:
+        return {}
+    return {"pipeline": {
+        "workers": args.send_workers,
+        "queue_size": args.send_queue,
+        "overflow": args.send_overflow,
+    }}
+
+
+def bulk_upload_config(args):
+    """ThingsBoard configuration entries for batched, compressed HTTP uploads."""
+    if not args.bulk_upload:
+        return {}
+    return {"bulk_upload": {
+        "threshold": args.compress_threshold,
+        "level": args.compress_level,
+        "encoding": args.compress_encoding,
+        "batch_size": args.bulk_batch_size,
+        "flush_interval": args.bulk_flush_interval,
+    }}
+
+
+def run_replay(args):
+    """Replay a recorded archive through the configured connector."""
+    from src.thingsboard.replay import Replayer, iter_records
+    from src.thingsboard.simulator import close_connector, create_connector
+    
+    if args.replay_speed > 0:
+        logger.info(f"Replaying {args.replay} at {args.replay_speed}x speed")
+    else:
+        logger.info(f"Replaying {args.replay} as fast as possible")
+    
+    tb_config = build_thingsboard_config(args)
+    if tb_config:
+        # Replayed records are already archived; only save them again if asked to
+        tb_config["save_local"] = args.save_local
+    connector = create_connector(tb_config)
+    
+    replayer = Replayer(connector, speed=args.replay_speed, keep_timestamps=args.replay_keep_timestamps)
+    try:
+        summary = replayer.run(iter_records(args.replay), limit=args.replay_limit)
+    finally:
+        close_connector(connector)
+    logger.info("Replay summary: " + ", ".join(f"{k}={v}" for k, v in summary.items()))
+    return summary
+
+
+def connection_args(args):
+    """Command line options that give a spawned worker this process's ThingsBoard connection."""
+    if args.local_only or not (args.tokens_file or args.token):
+        return ['--local-only']
+    worker_args = ['--host', args.host, '--port', str(args.port)]
+    worker_args += ['--tokens-file', args.tokens_file] if args.tokens_file else ['--token', args.token]
+    if args.https:
+        worker_args.append('--https')
+    worker_args += ['--payload-format', args.payload_format]
+    worker_args += ['--connect-timeout', str(args.connect_timeout), '--read-timeout', str(args.read_timeout),
+                    '--max-retries', str(args.max_retries), '--breaker-threshold', str(args.breaker_threshold),
+                    '--breaker-reset', str(args.breaker_reset),
+                    '--max-block-fraction', str(args.max_block_fraction)]
+    if args.send_workers > 0:
+        worker_args += ['--send-workers', str(args.send_workers), '--send-queue', str(args.send_queue),
+                        '--send-overflow', args.send_overflow]
+    if args.bulk_upload:
+        worker_args += ['--bulk-upload', '--compress-threshold', str(args.compress_threshold),
+                        '--compress-level', str(args.compress_level), '--compress-encoding', args.compress_encoding,
+                        '--bulk-batch-size', str(args.bulk_batch_size),
+                        '--bulk-flush-interval', str(args.bulk_flush_interval)]
+    return worker_args
+
+
+def run_coordinator(args, machine_count):
+    """Split the fleet over worker processes and log their aggregated statistics."""
+    from src.thingsboard.distributed import Coordinator, parse_address, spawn_local_workers
+    
+    host, port = parse_address(args.listen, default_host='0.0.0.0')
+    coordinator = Coordinator(machine_count, args.coordinator, interval=args.interval, duration=args.duration,
+                              host=host, port=port, correlated=not args.uncorrelated)
+    processes = []
+    if args.spawn_workers:
+        processes = spawn_local_workers(f"127.0.0.1:{coordinator.address[1]}", args.coordinator,
+                                        connection_args(args))
+    try:
+        summary = coordinator.run()
+    finally:
+        for process in processes:
+            process.wait()
+    
+    for worker in summary.pop("workers"):
+        logger.info(f"Worker {worker['name']}: " + ", ".join(f"{k}={v}" for k, v in worker.items() if k != 'name'))
+    logger.info("Distributed simulation summary: " + ", ".join(f"{k}={v}" for k, v in summary.items()))
+    return summary
+
+
 def main():
     """Main function to run the sensor simulator."""
     # Load environment variables from .env file if present
@@ -48,8 +188,103 @@ def main():
                         help='Only save data locally, do not connect to ThingsBoard')
     parser.add_argument('--save-local', action='store_true',
                         help='Save generated data to local JSON files (default: do not save)')
+    parser.add_argument('--live-report-every', type=int, default=0,
+                        help='Log a live maintenance report every N ticks (0 to disable)')
+    parser.add_argument('--risk-rules', type=str, default=None, metavar='PATH',
+                        help='JSON risk rules for the live maintenance report (default: built-in live rules)')
+    parser.add_argument('--detect-anomalies', action='store_true',
+                        help='Run the online anomaly detector on every tick and log its alarms')
+    parser.add_argument('--uncorrelated', action='store_true',
+                        help='Walk every sensor independently instead of using the per-machine-type correlations')
+    parser.add_argument('--faults', type=str, default=None, metavar='SCENARIO',
+                        help='Inject the fault campaign of a JSON scenario file (spikes, drift, stuck, dropout, cascades)')
+    parser.add_argument('--profile', type=str, nargs='?', const='profile_report.json', default=None,
+                        metavar='REPORT', help='Time every tick phase and write a JSON report (default: profile_report.json)')
+    parser.add_argument('--profile-ticks', type=int, default=0,
+                        help='Also run the first N ticks under cProfile when --profile is set (0 to disable)')
+    
+    parser.add_argument('--replay', type=str, default=None, metavar='ARCHIVE',
+                        help='Re-send recorded telemetry (simulation_data directory, .jsonl or .csv, '
+                             'optionally gzipped) instead of simulating')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Speed-up of the recorded timing during replay (0 sends as fast as possible)')
+    parser.add_argument('--replay-keep-timestamps', action='store_true',
+                        help='Send the recorded timestamps instead of shifting them to the replay time')
+    parser.add_argument('--replay-limit', type=int, default=None,
+                        help='Stop the replay after N records')
+    parser.add_argument('--coordinator', type=int, default=0, metavar='WORKERS',
+                        help='Coordinate WORKERS worker processes that simulate the fleet together')
+    parser.add_argument('--listen', type=str, default='0.0.0.0:7700',
+                        help='Address the coordinator listens on for workers (default: 0.0.0.0:7700)')
+    parser.add_argument('--spawn-workers', action='store_true',
+                        help='Start the coordinator\'s workers as local processes')
+    parser.add_argument('--worker', type=str, default=None, metavar='HOST:PORT',
+                        help='Run as a worker of the coordinator at HOST:PORT')
+    parser.add_argument('--control', type=str, nargs='?', const='127.0.0.1:7701', default=None, metavar='HOST:PORT',
+                        help='Serve the runtime control API (add/remove machines, interval, maintenance mode) '
+                             'on HOST:PORT (default: 127.0.0.1:7701)')
+    parser.add_argument('--shared-memory', type=str, nargs='?', const='fleet_state', default=None, metavar='NAME',
+                        help='Publish the live fleet matrix in the shared-memory segment NAME (default: fleet_state)')
+    parser.add_argument('--payload-format', choices=['json', 'protobuf'], default='json',
+                        help='MQTT telemetry payload encoding; protobuf needs the machine types\' schemas '
+                             '(python -m src.thingsboard.protobuf_payload --schema TYPE) in the device profiles '
+                             '(default: json)')
+    parser.add_argument('--send-workers', type=int, default=0, metavar='N',
+                        help='Send telemetry from N background workers so slow sends do not delay ticks '
+                             '(default: 0, send from the tick loop)')
+    parser.add_argument('--send-queue', type=int, default=4, metavar='TICKS',
+                        help='Ticks each send worker may have queued (default: 4)')
+    parser.add_argument('--send-overflow', choices=['drop_oldest', 'drop_newest', 'block'], default='drop_oldest',
+                        help='What a full send queue does with a new tick (default: drop_oldest)')
+    parser.add_argument('--connect-timeout', type=float, default=1.0, metavar='SECONDS',
+                        help='HTTPS connect timeout (default: 1.0)')
+    parser.add_argument('--read-timeout', type=float, default=2.0, metavar='SECONDS',
+                        help='HTTPS response timeout (default: 2.0)')
+    parser.add_argument('--max-retries', type=int, default=3,
+                        help='Background retries of a failed HTTPS send, with jittered exponential backoff (default: 3)')
+    parser.add_argument('--breaker-threshold', type=int, default=5, metavar='FAILURES',
+                        help='Consecutive HTTPS failures that stop sends to the server until a probe succeeds '
+                             '(default: 5)')
+    parser.add_argument('--breaker-reset', type=float, default=30.0, metavar='SECONDS',
+                        help='Seconds before an open circuit breaker probes the server again (default: 30)')
+    parser.add_argument('--max-block-fraction', type=float, default=0.5, metavar='FRACTION',
+                        help='Share of each tick the tick loop may spend in HTTPS send attempts before the rest of '
+                             'the tick\'s sends go to the background retry thread (default: 0.5)')
+    parser.add_argument('--bulk-upload', action='store_true',
+                        help='Batch HTTPS uploads per device and compress large request bodies')
+    parser.add_argument('--compress-threshold', type=int, default=1024, metavar='BYTES',
+                        help='Compress bulk upload bodies of at least BYTES bytes (default: 1024)')
+    parser.add_argument('--compress-level', type=int, default=6, choices=range(1, 10), metavar='LEVEL',
+                        help='Compression level from 1 (fastest) to 9 (smallest) (default: 6)')
+    parser.add_argument('--compress-encoding', choices=['gzip', 'deflate'], default='gzip',
+                        help='Content-Encoding of compressed bulk uploads (default: gzip)')
+    parser.add_argument('--bulk-batch-size', type=int, default=100, metavar='N',
+                        help='Upload a device\'s batch once it holds N records (default: 100)')
+    parser.add_argument('--bulk-flush-interval', type=float, default=10.0, metavar='SECONDS',
+                        help='Upload a device\'s batch once its oldest record has waited SECONDS (default: 10)')
+    parser.add_argument('--history-hours', type=float, default=0, metavar='HOURS',
+                        help='Keep the last HOURS of readings in memory for history queries over the control API')
+    parser.add_argument('--sqlite', type=str, nargs='?', const='simulation_data/sensor_history.db', default=None,
+                        metavar='PATH', help='Store every reading in the SQLite database PATH for history queries '
+                                             '(default: simulation_data/sensor_history.db)')
+    parser.add_argument('--live-stream', type=str, nargs='?', const='127.0.0.1:7702', default=None, metavar='HOST:PORT',
+                        help='Stream every tick to local SSE/WebSocket clients on HOST:PORT (default: 127.0.0.1:7702)')
     
     args = parser.parse_args()
+    if (args.payload_format == 'protobuf' and args.token and not args.tokens_file
+            and not (args.local_only or args.https)):
+        parser.error('--payload-format protobuf needs --tokens-file: each machine type has its own schema, '
+                     'but --token publishes every machine to one device')
+    
+    if args.replay:
+        run_replay(args)
+        return
+    
+    if args.worker:
+        from src.thingsboard.distributed import Worker
+        stats = Worker(args.worker, thingsboard_config=build_thingsboard_config(args)).run()
+        logger.info("Worker summary: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+        return
     
     # Configure machine count
     machine_count = {
@@ -70,37 +305,111 @@ def main():
     logger.info(f"Simulation Duration: {'Infinite' if args.duration <= 0 else f'{args.duration} seconds'}")
     logger.info(f"Machine Count: {sum(machine_count.values())} machines")
     
+    if args.coordinator > 0:
+        run_coordinator(args, machine_count)
+        return
+    
     # Create sensor simulator
-    simulator = SensorSimulator(machine_count)
+    simulator = SensorSimulator(machine_count, correlated=not args.uncorrelated)
+    
+    # Attach the in-process streaming analyzer if live reports are requested
+    if args.live_report_every > 0:
+        from src.sensor.streaming import StreamingAnalyzer
+        rules = None
+        if args.risk_rules:
+            from src.sensor.rules import RiskRules
+            rules = RiskRules.load(args.risk_rules)
+        live_analyzer = StreamingAnalyzer(simulator, rules=rules)
+        
+        def log_live_report(tick):
+            if (tick.index + 1) % args.live_report_every == 0:
+                critical = live_analyzer.get_critical_machines()
+                report = live_analyzer.generate_maintenance_report(top=10)
+                logger.info(f"Live analysis after {live_analyzer.ticks} ticks: "
+                            f"{len(critical)} machines in critical condition\n{report.to_string(index=False)}")
+        
+        simulator.add_tick_listener(log_live_report)
+    
+    # Attach the online anomaly detector if requested
+    detector = None
+    if args.detect_anomalies:
+        from src.sensor.anomaly import FleetAnomalyDetector
+        detector = FleetAnomalyDetector(simulator)
+        detector.add_alarm_callback(
+            lambda alarm: logger.warning(f"[ALARM] {alarm.machine_id} - {alarm.sensor_type} = {alarm.value} "
+                                         f"({', '.join(alarm.detectors)})"))
+    
+    # Keep a bounded in-memory history of the readings if requested
+    history = None
+    if args.history_hours > 0:
+        from src.sensor.history import SensorHistory, capacity_for
+        history = SensorHistory(simulator, capacity=capacity_for(args.history_hours, args.interval))
+    
+    # Store every reading in SQLite if requested
+    sqlite_sink = None
+    if args.sqlite:
+        from src.sensor.sqlite_sink import SQLiteSink
+        sqlite_sink = SQLiteSink(simulator, args.sqlite)
+    
+    # Load the fault campaign if requested
+    if args.faults:
+        from src.thingsboard.faults import FaultCampaign
+        campaign = FaultCampaign.load(args.faults)
+        simulator.set_fault_campaign(campaign)
+        logger.info(f"Fault campaign '{campaign.name}' with {len(campaign.faults)} faults")
+    
+    # Attach the tick phase profiler if requested
+    profiler = None
+    if args.profile:
+        from src.thingsboard.profiling import TickProfiler
+        profiler = TickProfiler(interval=args.interval, profile_ticks=args.profile_ticks)
+        simulator.set_profiler(profiler)
+    
+    # Serve the runtime control API if requested
+    control_server = None
+    if args.control:
+        from src.thingsboard.control import ControlServer
+        control_server = ControlServer(simulator, args.control, history=history)
+        control_server.start()
+    
+    # Publish the fleet state to other processes if requested
+    publisher = None
+    if args.shared_memory:
+        from src.thingsboard.shared_state import SharedStatePublisher
+        publisher = SharedStatePublisher(args.shared_memory, simulator)
+    
+    # Stream ticks to local dashboards if requested
+    live_stream = None
+    if args.live_stream:
+        from src.thingsboard.live_stream import LiveStreamServer
+        live_stream = LiveStreamServer(simulator, args.live_stream)
+        live_stream.start()
     
     # Set up ThingsBoard configuration
-    if args.local_only:
-        logger.info("Running in local-only mode (no ThingsBoard connection)")
-        tb_config = None
-    elif args.tokens_file:
-        logger.info(f"Using multi-device mode with tokens from: {args.tokens_file}")
-        tb_config = {
-            "host": args.host,
-            "port": args.port,
-            "tokens_file": args.tokens_file,
-            "https_mode": args.https,
-            "multi_device": True
-        }
-    elif args.token:
-        logger.info("Using single-token mode")
-        tb_config = {
-            "host": args.host,
-            "port": args.port,
-            "access_token": args.token,
-            "https_mode": args.https,
-            "multi_device": False
-        }
-    else:
-        logger.info("No token provided, running in local-only mode")
-        tb_config = None
+    tb_config = build_thingsboard_config(args)
     
     # Run simulation
-    simulator.simulate(interval=args.interval, duration=args.duration, thingsboard_config=tb_config)
+    try:
+        simulator.simulate(interval=args.interval, duration=args.duration, thingsboard_config=tb_config)
+    finally:
+        if control_server:
+            control_server.stop()
+        if publisher:
+            publisher.close()
+        if live_stream:
+            live_stream.stop()
+            logger.info("Live stream summary: " + ", ".join(f"{k}={v}" for k, v in live_stream.get_stats().items()))
+        if sqlite_sink:
+            sqlite_sink.close()
+            logger.info("SQLite sink summary: " + ", ".join(f"{k}={v}" for k, v in sqlite_sink.get_stats().items()))
+    
+    if profiler:
+        profiler.write_report(args.profile)
+        logger.info("Tick phase timings: " + profiler.format_summary())
+    
+    if detector:
+        metrics = detector.get_metrics()
+        logger.info("Anomaly detection summary: " + ", ".join(f"{k}={v}" for k, v in metrics.items()))
 
 
 if __name__ == "__main__":
@@ -3,18 +3,22 @@ import logging
 import time
 import os
 from datetime import datetime
-import requests
-import paho.mqtt.client as mqtt
 from typing import Dict, Any, Optional
 
+from src.thingsboard.profiling import phase
+from src.thingsboard.resilience import HttpSender
+
 logger = logging.getLogger(__name__)
 
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
 class MultiDeviceConnector:
     """
     Class to handle connections to ThingsBoard for multiple devices with different tokens.
     """
     
-    def __init__(self, host, port=1883, tokens_file=None, https_mode=False):
+    def __init__(self, host, port=1883, tokens_file=None, https_mode=False, bulk_uploader=None, http_sender=None,
+                 payload_encoder=None):
         """
         Initialize ThingsBoard multi-device connector.
         
@@ -23,12 +27,19 @@ class MultiDeviceConnector:
             port (int): MQTT port (default 1883)
             tokens_file (str): Path to JSON file containing device_id to token mappings
             https_mode (bool): If True, use HTTPS instead of MQTT
+            bulk_uploader (BulkUploader): Optional uploader that batches and compresses HTTPS uploads
+            http_sender (HttpSender): Sender enforcing timeouts, retries and circuit breaking for HTTPS
+            payload_encoder (ProtobufEncoder): Optional encoder that replaces JSON MQTT payloads
         """
         self.host = host
         self.port = port
         self.https_mode = https_mode
         self.device_tokens = {}
         self.mqtt_clients = {}
+        self.profiler = None
+        self.bulk_uploader = bulk_uploader
+        self.http_sender = http_sender or (HttpSender() if https_mode else None)
+        self.payload_encoder = payload_encoder
         
         # Load device tokens from file if provided
         if tokens_file and os.path.exists(tokens_file):
@@ -56,6 +67,8 @@ class MultiDeviceConnector:
             logger.error(f"No token found for device {device_id}")
             return
         
+        # paho is only imported when MQTT is actually used
+        import paho.mqtt.client as mqtt
         token = self.device_tokens[device_id]
         client = mqtt.Client()
         client.username_pw_set(token)
@@ -68,24 +81,60 @@ class MultiDeviceConnector:
             return True
         
         success = True
-        for device_id, token in self.device_tokens.items():
-            if device_id not in self.mqtt_clients:
-                self._init_mqtt_client(device_id)
-            
-            client = self.mqtt_clients.get(device_id)
-            if not client:
-                continue
-                
-            try:
-                client.connect(self.host, self.port, 60)
-                client.loop_start()
-                logger.info(f"Connected device {device_id} to ThingsBoard at {self.host}:{self.port}")
-            except Exception as e:
-                logger.error(f"Failed to connect device {device_id} to ThingsBoard: {e}")
+        for device_id in self.device_tokens:
+            if not self.connect_device(device_id):
                 success = False
         
         return success
     
+    def connect_device(self, device_id):
+        """
+        Connect a single device via MQTT, e.g. one added to a running fleet.
+        
+        Args:
+            device_id (str): Device identifier
+        
+        Returns:
+            bool: True if the device is connected (or HTTPS mode needs no connection)
+        """
+        if self.https_mode:
+            return True
+        if device_id not in self.device_tokens:
+            logger.warning(f"No token found for device {device_id}, not connecting")
+            return False
+        if device_id not in self.mqtt_clients:
+            self._init_mqtt_client(device_id)
+        
+        client = self.mqtt_clients.get(device_id)
+        if not client:
+            return False
+        
+        try:
+            client.connect(self.host, self.port, 60)
+            client.loop_start()
+            logger.info(f"Connected device {device_id} to ThingsBoard at {self.host}:{self.port}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to connect device {device_id} to ThingsBoard: {e}")
+            return False
+    
+    def disconnect_device(self, device_id):
+        """
+        Disconnect a single device and drop its MQTT client; its token is kept.
+        
+        Args:
+            device_id (str): Device identifier
+        """
+        client = self.mqtt_clients.pop(device_id, None)
+        if not client:
+            return
+        try:
+            client.loop_stop()
+            client.disconnect()
+            logger.info(f"Disconnected device {device_id} from ThingsBoard")
+        except Exception as e:
+            logger.error(f"Error disconnecting device {device_id}: {e}")
+    
     def disconnect_mqtt(self):
         """Disconnect all devices from ThingsBoard MQTT."""
         for device_id, client in self.mqtt_clients.items():
@@ -97,7 +146,7 @@ class MultiDeviceConnector:
         
         logger.info("Disconnected all devices from ThingsBoard MQTT")
     
-    def send_telemetry(self, device_id, telemetry_data, timestamp=None):
+    def send_telemetry(self, device_id, telemetry_data, timestamp=None, machine_type=None):
         """
         Send telemetry data to ThingsBoard for a specific device.
         
@@ -105,6 +154,8 @@ class MultiDeviceConnector:
             device_id (str): Device identifier
             telemetry_data (dict): Telemetry data to send
             timestamp (int, optional): Timestamp in milliseconds
+            machine_type (str, optional): Machine type selecting the Protobuf schema
+                (default: the ``machine_type`` value of the telemetry)
         
         Returns:
             bool: True if successful, False otherwise
@@ -125,19 +176,24 @@ class MultiDeviceConnector:
         if self.https_mode:
             return self._send_via_https(device_id, payload)
         else:
-            return self._send_via_mqtt(device_id, payload)
+            return self._send_via_mqtt(device_id, payload, machine_type or telemetry_data.get("machine_type"))
     
-    def _send_via_mqtt(self, device_id, payload):
+    def _send_via_mqtt(self, device_id, payload, machine_type=None):
         """Send data via MQTT protocol for a specific device."""
         client = self.mqtt_clients.get(device_id)
         if not client:
             logger.error(f"MQTT client not initialized for device {device_id}")
             return False
         try:
-            # Convert payload to JSON string
-            payload_json = json.dumps(payload)
+            # Convert payload to a JSON string or Protobuf message
+            with phase(self.profiler, "serialize"):
+                if self.payload_encoder:
+                    payload_body = self.payload_encoder.encode(payload, machine_type)
+                else:
+                    payload_body = json.dumps(payload)
             # Send to ThingsBoard
-            result = client.publish('v1/devices/me/telemetry', payload_json, 1)
+            import paho.mqtt.client as mqtt
+            result = client.publish('v1/devices/me/telemetry', payload_body, 1)
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
                 logger.debug(f"Data sent successfully for device {device_id} via MQTT")
@@ -156,20 +212,20 @@ class MultiDeviceConnector:
             logger.error(f"No token found for device {device_id}")
             return False
         
+        if self.bulk_uploader:
+            return self.bulk_uploader.add(token, payload)
+        
         try:
             # ThingsBoard REST API endpoint
             url = f"http://{self.host}:{self.port}/api/v1/{token}/telemetry"
             
             # Send request
-            headers = {'Content-Type': 'application/json'}
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
-            
-            if response.status_code == 200:
+            with phase(self.profiler, "serialize"):
+                body = json.dumps(payload)
+            if self.http_sender.post(url, body, JSON_HEADERS):
                 logger.debug(f"Data sent successfully for device {device_id} via HTTPS")
                 return True
-            else:
-                logger.error(f"Failed to send data for device {device_id} via HTTPS. Status code: {response.status_code}")
-                return False
+            return False
         except Exception as e:
             logger.error(f"Error sending data for device {device_id} via HTTPS: {e}")
             return False
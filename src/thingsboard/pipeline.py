@@ -0,0 +1,223 @@
+import logging
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+DEFAULT_QUEUE_SIZE = 4
+AGE_SAMPLE_SIZE = 1024
+
+
+class _Batch:
+    """The readings of one tick assigned to one send worker."""
+    __slots__ = ("tick", "timestamp", "created", "data")
+
+    def __init__(self, tick: int, timestamp: int, created: float, data: Dict[str, Dict[str, Any]]):
+        self.tick = tick
+        self.timestamp = timestamp
+        self.created = created
+        self.data = data
+
+
+class _BoundedQueue:
+    """Deque of batches with a fixed capacity and an overflow policy."""
+
+    def __init__(self, capacity: int, overflow: str):
+        self.capacity = capacity
+        self.overflow = overflow
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.max_depth = 0
+
+    def put(self, batch: _Batch) -> Optional[_Batch]:
+        """
+        Add a batch, applying the overflow policy if the queue is full.
+
+        Returns:
+            The batch that was dropped to make room, if any
+        """
+        with self.condition:
+            dropped = None
+            if len(self.items) >= self.capacity:
+                if self.overflow == "drop_oldest":
+                    dropped = self.items.popleft()
+                elif self.overflow == "drop_newest":
+                    return batch
+                else:
+                    while len(self.items) >= self.capacity and not self.closed:
+                        self.condition.wait()
+            self.items.append(batch)
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.condition.notify_all()
+            return dropped
+
+    def get(self) -> Optional[_Batch]:
+        """Take the oldest batch, waiting for one; None once the queue is closed and empty."""
+        with self.condition:
+            while not self.items and not self.closed:
+                self.condition.wait()
+            if not self.items:
+                return None
+            batch = self.items.popleft()
+            self.condition.notify_all()
+            return batch
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class SendPipeline:
+    """
+    Send stage that decouples ThingsBoard sends from tick generation.
+
+    The tick loop (producer) splits each tick's readings over ``workers`` send
+    threads (consumers) and returns immediately; each consumer serializes and
+    sends its share through the connector. Machines are assigned to workers by
+    a stable hash, so each device's telemetry is still sent in tick order. Every
+    reading is sent with its tick's timestamp, so the recorded cadence is kept
+    even when sends lag behind.
+
+    Each worker has a queue of at most ``queue_size`` ticks. When the network
+    cannot keep up, the overflow policy decides what happens to a full queue:
+
+    - ``drop_oldest``: discard the oldest queued tick, keeping the data fresh
+    - ``drop_newest``: discard the incoming tick, keeping what is queued
+    - ``block``: make the tick loop wait, trading cadence for completeness
+
+    ``get_stats`` reports the queue depths and the end-to-end age of sent
+    readings (from generation to the send call returning), which show whether
+    the network keeps up with the tick rate.
+    """
+
+    def __init__(self, connector, workers: int = 1, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 overflow: str = "drop_oldest"):
+        """
+        Start the send workers.
+
+        Args:
+            connector: ThingsBoardConnector or MultiDeviceConnector to send through
+            workers: Number of send threads
+            queue_size: Ticks each worker may have queued
+            overflow: One of ``drop_oldest``, ``drop_newest`` and ``block``
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {', '.join(OVERFLOW_POLICIES)}")
+        self.connector = connector
+        self.overflow = overflow
+        self._queues = [_BoundedQueue(max(1, queue_size), overflow) for _ in range(max(1, workers))]
+        self._worker_of: Dict[str, int] = {}
+        self._ages = deque(maxlen=AGE_SAMPLE_SIZE)
+        self._lock = threading.Lock()
+        self.stats = {"ticks": 0, "sent": 0, "failed": 0, "dropped_ticks": 0, "dropped_messages": 0,
+                      "age_total": 0.0, "age_max": 0.0}
+        self._threads = [threading.Thread(target=self._run, args=(queue,), daemon=True, name=f"send-worker-{i}")
+                         for i, queue in enumerate(self._queues)]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Sending through {len(self._queues)} workers with queues of {queue_size} ticks ({overflow})")
+
+    def _worker(self, machine_id: str) -> int:
+        worker = self._worker_of.get(machine_id)
+        if worker is None:
+            worker = self._worker_of[machine_id] = zlib.crc32(machine_id.encode("utf-8")) % len(self._queues)
+        return worker
+
+    def submit(self, tick: int, timestamp: int, data: Dict[str, Dict[str, Any]]):
+        """
+        Queue one tick's readings for sending.
+
+        Args:
+            tick: Tick index
+            timestamp: Tick timestamp in milliseconds, sent with every reading
+            data: Readings per machine, as returned by SensorSimulator.generate_sensor_data
+        """
+        created = time.monotonic()
+        if len(self._queues) == 1:
+            shares = [data]
+        else:
+            shares = [{} for _ in self._queues]
+            for machine_id, values in data.items():
+                shares[self._worker(machine_id)][machine_id] = values
+        self.stats["ticks"] += 1
+        for queue, share in zip(self._queues, shares):
+            if not share:
+                continue
+            dropped = queue.put(_Batch(tick, timestamp, created, share))
+            if dropped is not None:
+                with self._lock:
+                    self.stats["dropped_ticks"] += 1
+                    self.stats["dropped_messages"] += len(dropped.data)
+
+    def _run(self, queue: _BoundedQueue):
+        """Send worker: drain one queue until the pipeline is closed."""
+        bulk_uploader = getattr(self.connector, "bulk_uploader", None)
+        while True:
+            batch = queue.get()
+            if batch is None:
+                if bulk_uploader:
+                    # Upload what this worker still holds; those records were already counted as sent
+                    flushed_failures = bulk_uploader.flush()
+                    with self._lock:
+                        self.stats["sent"] -= flushed_failures
+                        self.stats["failed"] += flushed_failures
+                return
+            sent = failed = 0
+            for machine_id, values in batch.data.items():
+                try:
+                    ok = self.connector.send_telemetry(machine_id, values, batch.timestamp)
+                except Exception as e:
+                    logger.error(f"Error sending telemetry for {machine_id}: {e}")
+                    ok = False
+                sent += bool(ok)
+                failed += not ok
+            if bulk_uploader:
+                # Bulk batches are kept per worker thread, so these failures are records this worker
+                # queued, on this tick or, for batches held over the flush interval, an earlier one
+                flushed_failures = bulk_uploader.flush_due()
+                sent -= flushed_failures
+                failed += flushed_failures
+            age = time.monotonic() - batch.created
+            with self._lock:
+                self.stats["sent"] += sent
+                self.stats["failed"] += failed
+                self.stats["age_total"] += age * len(batch.data)
+                self.stats["age_max"] = max(self.stats["age_max"], age)
+                self._ages.append(age)
+
+    @property
+    def depths(self) -> List[int]:
+        """Ticks currently queued per worker."""
+        return [len(queue.items) for queue in self._queues]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the pipeline statistics with queue depths and end-to-end ages in milliseconds."""
+        with self._lock:
+            stats = dict(self.stats)
+            ages = sorted(self._ages)
+        done = stats["sent"] + stats["failed"]
+        age_total, age_max = stats.pop("age_total"), stats.pop("age_max")
+        stats["queue_depth"] = sum(self.depths)
+        stats["max_queue_depth"] = max(queue.max_depth for queue in self._queues)
+        stats["age_mean_ms"] = round(age_total / done * 1000, 3) if done else 0.0
+        stats["age_p95_ms"] = round(ages[min(len(ages) - 1, int(0.95 * len(ages)))] * 1000, 3) if ages else 0.0
+        stats["age_max_ms"] = round(age_max * 1000, 3)
+        return stats
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Send what is queued and stop the workers.
+
+        Args:
+            timeout: Seconds to wait for each worker to finish (None waits until the queues are drained)
+        """
+        for queue in self._queues:
+            queue.close()
+        for thread in self._threads:
+            thread.join(timeout)
@@ -0,0 +1,244 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import sys
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Phases reported for every tick, in loop order. Other phase names are accepted too.
+TICK_PHASES = ["generate", "inject", "listeners", "serialize", "save", "send", "sleep"]
+
+
+class _Phase:
+    """Context manager timing one phase; time spent in nested phases is excluded."""
+
+    __slots__ = ("profiler", "name", "start", "children")
+
+    def __init__(self, profiler: "TickProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.children = 0.0
+        self.profiler._stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        stack = self.profiler._stack
+        stack.pop()
+        if stack:
+            stack[-1].children += elapsed
+        current = self.profiler._current
+        current[self.name] = current.get(self.name, 0.0) + elapsed - self.children
+        return False
+
+
+def phase(profiler: Optional["TickProfiler"], name: str):
+    """Time a phase on ``profiler``, or do nothing when no profiler is attached."""
+    return profiler.phase(name) if profiler is not None else nullcontext()
+
+
+class TickProfiler:
+    """
+    Per-phase timers for the simulation loop.
+
+    Each tick records the exclusive wall time of its phases (generate, inject,
+    listeners, serialize, save, send and sleep), so a send that contains
+    serialization only counts the time spent outside ``json.dumps``. The first
+    ``profile_ticks`` ticks can additionally be run under cProfile. The report
+    is a JSON file with stable keys so two runs can be compared with
+    ``compare_reports``.
+    """
+
+    def __init__(self, interval: float = None, profile_ticks: int = 0):
+        """
+        Initialize the profiler.
+
+        Args:
+            interval: Tick interval in seconds, used to count overruns
+            profile_ticks: Number of initial ticks to run under cProfile (0 to disable)
+        """
+        self.interval = interval
+        self.profile_ticks = profile_ticks
+        self.ticks: List[Dict[str, float]] = []
+        self.tick_times: List[float] = []
+        self._current: Dict[str, float] = {}
+        self._stack: List[_Phase] = []
+        self._tick_start = None
+        self._cprofile = cProfile.Profile() if profile_ticks > 0 else None
+        self._cprofile_active = False
+
+    def phase(self, name: str) -> _Phase:
+        """Context manager timing one phase of the current tick."""
+        return _Phase(self, name)
+
+    def start_tick(self):
+        """Mark the beginning of a tick."""
+        self._current = {}
+        self._stack = []
+        if self._cprofile is not None and len(self.ticks) < self.profile_ticks:
+            self._cprofile.enable()
+            self._cprofile_active = True
+        self._tick_start = time.perf_counter()
+
+    def end_tick(self):
+        """Mark the end of a tick and store its phase timings."""
+        if self._tick_start is None:
+            return
+        self.tick_times.append(time.perf_counter() - self._tick_start)
+        if self._cprofile_active:
+            self._cprofile.disable()
+            self._cprofile_active = False
+        self.ticks.append(self._current)
+        self._tick_start = None
+
+    def _phase_names(self) -> List[str]:
+        seen = {name for tick in self.ticks for name in tick}
+        return [name for name in TICK_PHASES if name in seen] + sorted(seen - set(TICK_PHASES))
+
+    @staticmethod
+    def _describe(values: List[float]) -> Dict[str, float]:
+        """Summary statistics of a series of durations, in milliseconds."""
+        if not values:
+            return {"total_ms": 0.0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        values = sorted(value * 1000.0 for value in values)
+
+        def percentile(q):
+            # Linear interpolation between closest ranks, like numpy's default
+            position = (len(values) - 1) * q
+            lower = int(position)
+            upper = min(lower + 1, len(values) - 1)
+            return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+        total = sum(values)
+        return {
+            "total_ms": round(total, 3),
+            "mean_ms": round(total / len(values), 3),
+            "p50_ms": round(percentile(0.5), 3),
+            "p95_ms": round(percentile(0.95), 3),
+            "max_ms": round(values[-1], 3),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the recorded ticks.
+
+        Returns:
+            Dictionary with per-phase statistics, tick statistics and overruns
+        """
+        phases = {}
+        for name in self._phase_names():
+            phases[name] = self._describe([tick.get(name, 0.0) for tick in self.ticks])
+        # Share of the busy (non-sleep) time spent in each phase
+        busy_total = sum(stats["total_ms"] for name, stats in phases.items() if name != "sleep")
+        for name, stats in phases.items():
+            stats["busy_share"] = (round(stats["total_ms"] / busy_total, 4)
+                                   if name != "sleep" and busy_total > 0 else None)
+
+        busy = [total - tick.get("sleep", 0.0) for total, tick in zip(self.tick_times, self.ticks)]
+        return {
+            "ticks": len(self.ticks),
+            "interval_s": self.interval,
+            "overruns": sum(1 for value in busy if value > self.interval) if self.interval else None,
+            "tick": self._describe(self.tick_times),
+            "busy": self._describe(busy),
+            "phases": phases,
+        }
+
+    def profile_stats(self, limit: int = 30, sort: str = "cumulative") -> Optional[str]:
+        """Text listing of the cProfile hot spots, or None if profiling was disabled."""
+        if self._cprofile is None or not self.ticks:
+            return None
+        stream = io.StringIO()
+        stats = pstats.Stats(self._cprofile, stream=stream)
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def write_report(self, path: str, limit: int = 30) -> Dict[str, Any]:
+        """
+        Write the profiling report as JSON.
+
+        When cProfile was enabled its raw statistics are also dumped next to the
+        report (``<path>.prof``) for snakeviz or ``pstats``.
+
+        Args:
+            path: Report file path
+            limit: Number of functions in the embedded cProfile listing
+
+        Returns:
+            The report that was written
+        """
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "summary": self.summary(),
+            "profiled_ticks": min(self.profile_ticks, len(self.ticks)),
+            "profile": self.profile_stats(limit),
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        if report["profile"] is not None:
+            self._cprofile.dump_stats(f"{path}.prof")
+        logger.info(f"Profiling report written to {path}")
+        return report
+
+    def format_summary(self) -> str:
+        """Human readable table of the phase timings."""
+        summary = self.summary()
+        lines = [f"{summary['ticks']} ticks, busy mean {summary['busy']['mean_ms']:.2f} ms, "
+                 f"p95 {summary['busy']['p95_ms']:.2f} ms"
+                 + (f", {summary['overruns']} overruns" if summary["overruns"] is not None else "")]
+        for name, stats in summary["phases"].items():
+            share = f"{stats['busy_share'] * 100:5.1f}%" if stats["busy_share"] is not None else "    -"
+            lines.append(f"  {name:<10} mean {stats['mean_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms  {share}")
+        return "\n".join(lines)
+
+
+def compare_reports(baseline_path: str, candidate_path: str) -> str:
+    """
+    Compare the phase timings of two profiling reports.
+
+    Args:
+        baseline_path: Report of the reference run
+        candidate_path: Report of the run being evaluated
+
+    Returns:
+        Text table of mean and p95 per phase with the relative change
+    """
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)["summary"]
+    with open(candidate_path, 'r') as f:
+        candidate = json.load(f)["summary"]
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+7.1f}%" if old else "      -"
+
+    rows = [("busy", baseline["busy"], candidate["busy"])]
+    names = list(baseline["phases"]) + [n for n in candidate["phases"] if n not in baseline["phases"]]
+    empty = TickProfiler._describe([])
+    for name in names:
+        rows.append((name, baseline["phases"].get(name, empty), candidate["phases"].get(name, empty)))
+
+    lines = [f"{'phase':<10} {'mean before':>12} {'mean after':>12} {'change':>8} "
+             f"{'p95 before':>12} {'p95 after':>12} {'change':>8}"]
+    for name, old, new in rows:
+        lines.append(f"{name:<10} {old['mean_ms']:12.3f} {new['mean_ms']:12.3f} {change(old['mean_ms'], new['mean_ms'])} "
+                     f"{old['p95_ms']:12.3f} {new['p95_ms']:12.3f} {change(old['p95_ms'], new['p95_ms'])}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare two simulator profiling reports')
+    parser.add_argument('baseline', help='Report of the reference run')
+    parser.add_argument('candidate', help='Report of the run being evaluated')
+    args = parser.parse_args()
+    print(compare_reports(args.baseline, args.candidate))
@@ -0,0 +1,283 @@
+import json
+import logging
+import struct
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.thingsboard.machine_type import MachineType
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_FORMATS = ("json", "protobuf")
+PACKAGE = "factory_sensor"
+
+# Fields every machine type's values message carries besides its sensors, with fixed numbers so
+# adding sensors to a machine type never renumbers them. Sensors are numbered from 3; fields sent
+# only occasionally sit far above them, so adding one renumbers nothing either.
+_COMMON_FIELDS = [("machine_type", "string", 1), ("timestamp", "int64", 2), ("maintenance_mode", "bool", 1000)]
+_FIRST_SENSOR_NUMBER = 3
+
+# descriptor_pb2.FieldDescriptorProto type numbers and the wire types they are encoded with
+_TYPES = {"double": (1, 1), "int64": (3, 0), "bool": (8, 0), "string": (9, 2), "message": (11, 2)}
+
+
+def message_name(machine_type: str) -> str:
+    """Protobuf message prefix of a machine type, e.g. ``CncMachine`` for ``CNC_MACHINE``."""
+    return "".join(part.capitalize() for part in machine_type.split("_"))
+
+
+def schema_fields(machine_type: str) -> List[Tuple[str, str, int]]:
+    """
+    Fields of a machine type's values message.
+
+    Returns:
+        ``(name, type, number)`` for the common fields, then every sensor's
+        reading (double) and unit (string) in MachineType.MACHINE_SENSORS order
+    """
+    fields = list(_COMMON_FIELDS)
+    number = _FIRST_SENSOR_NUMBER
+    for sensor_type in MachineType.MACHINE_SENSORS[machine_type]:
+        fields.append((sensor_type, "double", number))
+        fields.append((f"{sensor_type}_unit", "string", number + 1))
+        number += 2
+    return fields
+
+
+def proto_schema(machine_type: str) -> str:
+    """
+    Render the ``.proto`` schema of a machine type's telemetry for a ThingsBoard device profile.
+
+    The telemetry message mirrors the JSON payload: a ``ts`` and a ``values``
+    message with one optional field per key, named like the JSON key.
+    """
+    name = message_name(machine_type)
+    lines = ['syntax = "proto3";', f"package {PACKAGE};", "", f"message {name}Values {{"]
+    for field, kind, number in schema_fields(machine_type):
+        lines.append(f'  optional {kind} {field} = {number} [json_name = "{field}"];')
+    lines += ["}", "", f"message {name}Telemetry {{", "  int64 ts = 1;", f"  {name}Values values = 2;", "}", ""]
+    return "\n".join(lines)
+
+
+def _file_descriptor(machine_type: str):
+    """Build the FileDescriptorProto equivalent to proto_schema(machine_type)."""
+    from google.protobuf import descriptor_pb2
+
+    name = message_name(machine_type)
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name=f"{PACKAGE}/{machine_type.lower()}.proto", package=PACKAGE, syntax="proto3")
+    values = file_proto.message_type.add(name=f"{name}Values")
+    for index, (field, kind, number) in enumerate(schema_fields(machine_type)):
+        # proto3 ``optional`` is a synthetic one-field oneof, which gives the field presence
+        values.oneof_decl.add(name=f"_{field}")
+        values.field.add(name=field, json_name=field, number=number, type=_TYPES[kind][0],
+                         label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL,
+                         oneof_index=index, proto3_optional=True)
+    telemetry = file_proto.message_type.add(name=f"{name}Telemetry")
+    telemetry.field.add(name="ts", json_name="ts", number=1, type=_TYPES["int64"][0],
+                        label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL)
+    telemetry.field.add(name="values", json_name="values", number=2, type=_TYPES["message"][0],
+                        label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL,
+                        type_name=f".{PACKAGE}.{name}Values")
+    return file_proto
+
+
+class ProtobufEncoder:
+    """
+    Encode telemetry payloads as Protobuf messages generated per machine type.
+
+    One ``<Type>Telemetry`` message class is compiled for each machine type in
+    MachineType.MACHINE_SENSORS when the encoder is created, so encoding a
+    payload only fills a prebuilt message. The machine type of a payload is
+    passed by the connector, or else read from its ``machine_type`` value.
+    Keys missing from the schema (e.g. added by other tools) are left out and
+    counted, with one warning per key.
+
+    Requires the ``protobuf`` package, which is imported only when an encoder
+    is created.
+    """
+
+    def __init__(self, machine_types: Optional[List[str]] = None):
+        """
+        Compile the message classes.
+
+        Args:
+            machine_types: Machine types to compile (default: every type in MachineType.MACHINE_SENSORS)
+        """
+        from google.protobuf import descriptor_pool, message_factory
+
+        pool = descriptor_pool.DescriptorPool()
+        self.classes = {}
+        self._fields: Dict[str, frozenset] = {}
+        for machine_type in machine_types or MachineType.MACHINE_SENSORS:
+            file_proto = _file_descriptor(machine_type)
+            pool.Add(file_proto)
+            descriptor = pool.FindMessageTypeByName(f"{PACKAGE}.{message_name(machine_type)}Telemetry")
+            self.classes[machine_type] = message_factory.GetMessageClass(descriptor)
+            self._fields[machine_type] = frozenset(field for field, _, _ in schema_fields(machine_type))
+        self._warned = set()
+        self.stats = {"messages": 0, "bytes": 0, "skipped_keys": 0, "encode_ms": 0.0}
+
+    def encode(self, payload: Dict[str, Any], machine_type: Optional[str] = None) -> bytes:
+        """
+        Encode one ``{"ts", "values"}`` telemetry payload.
+
+        Args:
+            payload: Telemetry payload as built by the connectors
+            machine_type: Machine type of the payload (default: its ``machine_type`` value)
+
+        Returns:
+            Serialized ``<Type>Telemetry`` message
+        """
+        start = time.perf_counter()
+        values = payload["values"]
+        machine_type = machine_type or values.get("machine_type")
+        cls = self.classes.get(machine_type)
+        if cls is None:
+            raise ValueError(f"No Protobuf schema for machine type {machine_type!r}")
+        fields = self._fields[machine_type]
+        known = {key: value for key, value in values.items() if key in fields}
+        if len(known) < len(values):
+            skipped = [key for key in values if key not in fields]
+            self.stats["skipped_keys"] += len(skipped)
+            for key in skipped:
+                if (machine_type, key) not in self._warned:
+                    self._warned.add((machine_type, key))
+                    logger.warning(f"{machine_type} Protobuf schema has no field {key!r}; leaving it out")
+        body = cls(ts=payload["ts"], values=known).SerializeToString()
+        self.stats["messages"] += 1
+        self.stats["bytes"] += len(body)
+        self.stats["encode_ms"] += (time.perf_counter() - start) * 1000
+        return body
+
+    def decode(self, body: bytes, machine_type: str) -> Dict[str, Any]:
+        """Decode a message back into a ``{"ts", "values"}`` payload with the generated classes."""
+        message = self.classes[machine_type].FromString(body)
+        values = {field.name: value for field, value in message.values.ListFields()}
+        return {"ts": message.ts, "values": values}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the encoding statistics."""
+        stats = dict(self.stats)
+        stats["bytes_per_message"] = round(stats["bytes"] / stats["messages"], 1) if stats["messages"] else 0.0
+        stats["encode_ms"] = round(stats["encode_ms"], 3)
+        return stats
+
+
+def _varint(body: bytes, position: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = body[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+
+
+def decode_wire(body: bytes, machine_type: str) -> Dict[str, Any]:
+    """
+    Decode a telemetry message straight from the Protobuf wire format, without the protobuf package.
+
+    Serves as an independent check of the generated classes' output.
+
+    Returns:
+        ``{"ts", "values"}`` payload
+    """
+    by_number = {number: (field, kind) for field, kind, number in schema_fields(machine_type)}
+
+    def fields(data: bytes):
+        position = 0
+        while position < len(data):
+            key, position = _varint(data, position)
+            number, wire_type = key >> 3, key & 0x7
+            if wire_type == 0:
+                value, position = _varint(data, position)
+                if value >= 1 << 63:
+                    value -= 1 << 64
+            elif wire_type == 1:
+                value = struct.unpack_from("<d", data, position)[0]
+                position += 8
+            elif wire_type == 2:
+                length, position = _varint(data, position)
+                value = data[position:position + length]
+                position += length
+            else:
+                raise ValueError(f"Unexpected wire type {wire_type} for field {number}")
+            yield number, wire_type, value
+
+    payload = {"ts": 0, "values": {}}
+    for number, _, value in fields(body):
+        if number == 1:
+            payload["ts"] = value
+        elif number == 2:
+            for field_number, wire_type, field_value in fields(value):
+                field, kind = by_number[field_number]
+                if _TYPES[kind][1] != wire_type:
+                    raise ValueError(f"Field {field} has wire type {wire_type}, expected {_TYPES[kind][1]}")
+                if kind == "string":
+                    field_value = field_value.decode("utf-8")
+                elif kind == "bool":
+                    field_value = bool(field_value)
+                payload["values"][field] = field_value
+    return payload
+
+
+def verify(machines_per_type: int = 5, ticks: int = 20) -> List[Dict[str, Any]]:
+    """
+    Encode simulated telemetry, check it decodes unchanged both with the generated classes
+    and with the wire-format decoder, and compare message sizes with JSON.
+
+    Returns:
+        One statistics row per machine type
+    """
+    from src.thingsboard.simulator import SensorSimulator
+
+    encoder = ProtobufEncoder()
+    simulator = SensorSimulator({machine_type: machines_per_type for machine_type in MachineType.MACHINE_SENSORS},
+                                seed=1)
+    rows = {machine_type: {"machine_type": machine_type, "messages": 0, "json_bytes": 0, "protobuf_bytes": 0,
+                           "json_ms": 0.0, "protobuf_ms": 0.0}
+            for machine_type in MachineType.MACHINE_SENSORS}
+    for tick in range(ticks):
+        for machine_id, values in simulator.generate_sensor_data().items():
+            payload = {"ts": 1_700_000_000_000 + tick * 1000, "values": values}
+            machine_type = values["machine_type"]
+            start = time.perf_counter()
+            json_body = json.dumps(payload).encode("utf-8")
+            middle = time.perf_counter()
+            body = encoder.encode(payload, machine_type)
+            end = time.perf_counter()
+            for decoded in (encoder.decode(body, machine_type), decode_wire(body, machine_type)):
+                if decoded != payload:
+                    raise AssertionError(f"Protobuf payload of {machine_id} did not decode unchanged")
+            row = rows[machine_type]
+            row["messages"] += 1
+            row["json_bytes"] += len(json_body)
+            row["protobuf_bytes"] += len(body)
+            row["json_ms"] += (middle - start) * 1000
+            row["protobuf_ms"] += (end - middle) * 1000
+    for row in rows.values():
+        row["json_bytes_per_message"] = round(row["json_bytes"] / row["messages"], 1)
+        row["protobuf_bytes_per_message"] = round(row["protobuf_bytes"] / row["messages"], 1)
+        row["ratio"] = round(row["json_bytes"] / row["protobuf_bytes"], 2)
+        row["json_ms"] = round(row["json_ms"], 3)
+        row["protobuf_ms"] = round(row["protobuf_ms"], 3)
+    return list(rows.values())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print the Protobuf telemetry schemas or verify the encoding")
+    parser.add_argument("--schema", choices=list(MachineType.MACHINE_SENSORS), default=None,
+                        help="Print the .proto schema of a machine type for its ThingsBoard device profile")
+    parser.add_argument("--machines", type=int, default=5, help="Simulated machines per type")
+    parser.add_argument("--ticks", type=int, default=20, help="Ticks to encode")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.schema:
+        print(proto_schema(args.schema))
+    else:
+        for row in verify(args.machines, args.ticks):
+            print(", ".join(f"{k}={v}" for k, v in row.items()))
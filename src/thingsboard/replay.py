@@ -0,0 +1,269 @@
+import csv
+import glob
+import gzip
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lag values kept to estimate the lag percentiles of arbitrarily long replays
+LAG_SAMPLE_SIZE = 10_000
+
+_ID_KEYS = ("device_id", "machine_id", "Machine_ID")
+_TS_KEYS = ("ts", "timestamp")
+
+
+@dataclass
+class ReplayRecord:
+    """One recorded telemetry message."""
+    device_id: str
+    ts: int
+    values: Dict[str, Any]
+
+
+def _open_text(path: str):
+    """Open a text archive, transparently decompressing ``.gz`` files."""
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def _record_from_dict(item: Dict[str, Any], default_device: str = None) -> Optional[ReplayRecord]:
+    """
+    Build a record from a saved payload.
+
+    Accepts the ``{"ts", "values", "device_id"}`` files written by the connector
+    as well as flat objects holding the device, the timestamp and the readings.
+    """
+    device_id = next((item[key] for key in _ID_KEYS if key in item), default_device)
+    ts = next((item[key] for key in _TS_KEYS if key in item), None)
+    if ts is None and isinstance(item.get("values"), dict):
+        ts = item["values"].get("timestamp")
+    if device_id is None or ts is None:
+        return None
+    if isinstance(item.get("values"), dict):
+        values = item["values"]
+    else:
+        values = {key: value for key, value in item.items() if key not in _ID_KEYS + _TS_KEYS}
+    return ReplayRecord(str(device_id), int(ts), values)
+
+
+def _parse_cell(value: str):
+    """Convert a CSV cell to a number when it holds one."""
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() and '.' not in value else number
+
+
+def _iter_json_file(path: str) -> Iterator[ReplayRecord]:
+    with _open_text(path) as f:
+        content = json.load(f)
+    items = content if isinstance(content, list) else [content]
+    for item in items:
+        record = _record_from_dict(item)
+        if record is not None:
+            yield record
+
+
+def _iter_json_lines(path: str) -> Iterator[ReplayRecord]:
+    with _open_text(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = _record_from_dict(json.loads(line))
+            if record is None:
+                logger.warning(f"Skipping record without device or timestamp at {path}:{line_number}")
+                continue
+            yield record
+
+
+def _iter_csv(path: str) -> Iterator[ReplayRecord]:
+    with _open_text(path) as f:
+        for row in csv.DictReader(f):
+            item = {key: _parse_cell(value) for key, value in row.items() if value not in ("", None)}
+            record = _record_from_dict(item)
+            if record is not None:
+                yield record
+
+
+def iter_records(path: str) -> Iterator[ReplayRecord]:
+    """
+    Stream recorded telemetry lazily, one record at a time.
+
+    Supported archives:
+        - a directory (or glob) of ``simulation_data`` JSON files, replayed in file
+          name order, which is chronological for the connector's timestamped names
+        - JSON Lines (``.jsonl``/``.ndjson``), one payload per line
+        - CSV with a device column (device_id/machine_id), a ts/timestamp column
+          in milliseconds and one column per reading
+        - a single JSON payload or list of payloads
+    Any of the files may be gzip-compressed (``.gz``).
+
+    Args:
+        path: Archive file, directory or glob pattern
+
+    Yields:
+        ReplayRecord in archive order
+    """
+    if os.path.isdir(path) or any(char in path for char in '*?['):
+        pattern = os.path.join(path, "*.json*") if os.path.isdir(path) else path
+        for file_path in sorted(glob.glob(pattern)):
+            yield from iter_records(file_path)
+        return
+
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith((".jsonl", ".ndjson")):
+        yield from _iter_json_lines(path)
+    elif name.endswith(".csv"):
+        yield from _iter_csv(path)
+    else:
+        yield from _iter_json_file(path)
+
+
+class ReplayStats:
+    """Lag of each send versus its scheduled time, plus send outcomes."""
+
+    def __init__(self, sample_size: int = LAG_SAMPLE_SIZE, seed: int = 0):
+        self.records = 0
+        self.sent = 0
+        self.failed = 0
+        self.out_of_order = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self._sample: List[float] = []
+        self._sample_size = sample_size
+        self._random = random.Random(seed)
+
+    def add(self, lag: float, ok: bool):
+        """Record one send and its lag in seconds."""
+        self.records += 1
+        self.sent += ok
+        self.failed += not ok
+        self.lag_total += lag
+        self.lag_max = max(self.lag_max, lag)
+        # Reservoir sampling keeps an unbiased sample of the lags in O(1) memory
+        if len(self._sample) < self._sample_size:
+            self._sample.append(lag)
+        else:
+            slot = self._random.randrange(self.records)
+            if slot < self._sample_size:
+                self._sample[slot] = lag
+
+    def fail_sent(self, count: int):
+        """Count records that were queued as sent but whose batched upload failed."""
+        self.sent -= count
+        self.failed += count
+
+    def percentile(self, q: float) -> float:
+        if not self._sample:
+            return 0.0
+        ordered = sorted(self._sample)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "records": self.records,
+            "sent": self.sent,
+            "failed": self.failed,
+            "out_of_order": self.out_of_order,
+            "lag_mean_ms": round(self.lag_total / self.records * 1000, 3) if self.records else 0.0,
+            "lag_p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "lag_p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "lag_max_ms": round(self.lag_max * 1000, 3),
+        }
+
+
+class Replayer:
+    """
+    Re-send recorded telemetry with its original inter-arrival timing.
+
+    Each record is scheduled at ``(ts - first_ts) / speed`` seconds after the
+    replay started, measured on the monotonic clock so wall-clock adjustments
+    do not distort the pacing. Sends that fall behind are not made up by
+    sleeping less later; their lag is reported instead.
+    """
+
+    def __init__(self, connector=None, speed: float = 1.0, keep_timestamps: bool = False,
+                 progress_every: int = 1000):
+        """
+        Initialize the replayer.
+
+        Args:
+            connector: ThingsBoardConnector or MultiDeviceConnector, or None for a dry run
+            speed: Speed-up factor of the original timing (0 sends as fast as possible)
+            keep_timestamps: Send the recorded timestamps instead of shifting them to now
+            progress_every: Log progress every N records (0 to disable)
+        """
+        self.connector = connector
+        self.speed = speed
+        self.keep_timestamps = keep_timestamps
+        self.progress_every = progress_every
+        self.stats = ReplayStats()
+
+    def run(self, records: Iterator[ReplayRecord], limit: int = None) -> Dict[str, Any]:
+        """
+        Replay records until the archive (or ``limit``) is exhausted.
+
+        Args:
+            records: Records in archive order, e.g. from iter_records
+            limit: Optional maximum number of records
+
+        Returns:
+            Summary of the replay, see ReplayStats.summary
+        """
+        stats = self.stats = ReplayStats()
+        bulk_uploader = getattr(self.connector, "bulk_uploader", None)
+        first_ts = None
+        last_ts = None
+        start = time.monotonic()
+        start_wall_ms = int(time.time() * 1000)
+
+        try:
+            for record in records:
+                if limit is not None and stats.records >= limit:
+                    break
+                if first_ts is None:
+                    first_ts = record.ts
+                if last_ts is not None and record.ts < last_ts:
+                    stats.out_of_order += 1
+                last_ts = max(record.ts, last_ts) if last_ts is not None else record.ts
+
+                offset = (record.ts - first_ts) / 1000.0
+                target = start + offset / self.speed if self.speed > 0 else time.monotonic()
+                delay = target - time.monotonic()
+                if delay > 0:
+                    # Records due so far are sent before waiting rather than held in a bulk batch
+                    if bulk_uploader:
+                        stats.fail_sent(bulk_uploader.flush())
+                    delay = target - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                lag = max(0.0, time.monotonic() - target)
+
+                timestamp = record.ts if self.keep_timestamps else start_wall_ms + int(
+                    (record.ts - first_ts) / (self.speed if self.speed > 0 else 1))
+                ok = True
+                if self.connector is not None:
+                    ok = bool(self.connector.send_telemetry(record.device_id, record.values, timestamp))
+                stats.add(lag, ok)
+
+                if self.progress_every and stats.records % self.progress_every == 0:
+                    summary = stats.summary()
+                    logger.info(f"Replayed {summary['records']} records, lag p95 {summary['lag_p95_ms']} ms, "
+                                f"max {summary['lag_max_ms']} ms, {summary['failed']} failed")
+        except KeyboardInterrupt:
+            logger.info("Replay stopped by user")
+        if bulk_uploader:
+            stats.fail_sent(bulk_uploader.flush())
+
+        summary = stats.summary()
+        summary["elapsed_s"] = round(time.monotonic() - start, 3)
+        summary["recorded_span_s"] = round((last_ts - first_ts) / 1000.0, 3) if first_ts is not None else 0.0
+        return summary
@@ -0,0 +1,350 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 1.0
+DEFAULT_READ_TIMEOUT = 2.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET = 30.0
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_MAX_BLOCK_FRACTION = 0.5
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: the n-th retry waits uniformly up to ``base * 2**n`` seconds."""
+
+    def __init__(self, max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = 0.5, max_delay: float = 30.0,
+                 seed: Optional[int] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            max_retries: Retries after the first attempt before a request is given up
+            base_delay: Upper bound of the first retry's delay in seconds
+            max_delay: Cap of the delay bound in seconds
+            seed: Optional random seed for reproducible delays
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = random.Random(seed)
+
+    def delay(self, retry: int) -> float:
+        """Delay in seconds before retry number ``retry`` (0 for the first retry)."""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one endpoint.
+
+    After ``threshold`` consecutive failures the breaker opens and callers stop
+    trying the endpoint. Once ``reset_timeout`` seconds have passed, a single
+    probe is let through (half-open); its success closes the breaker, its
+    failure opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, threshold: int = DEFAULT_BREAKER_THRESHOLD, reset_timeout: float = DEFAULT_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self, probe: bool = False) -> bool:
+        """
+        Check whether a request may be sent.
+
+        Args:
+            probe: Whether the caller may take the half-open probe once the reset timeout passed
+
+        Returns:
+            True if the request may go to the endpoint
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if probe and self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def retry_at(self) -> float:
+        """Monotonic time at which an open breaker lets a probe through."""
+        return self.opened_at + self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                if self.state == CLOSED:
+                    self.trips += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+def endpoint_of(url: str) -> str:
+    """Breaker key of a URL: its scheme, host and port."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class HttpSender:
+    """
+    HTTP POSTs with timeouts, background retries and a circuit breaker per endpoint.
+
+    ``post`` makes one attempt on the caller's thread, bounded by the connect
+    and read timeouts. A request that fails with a connection error, timeout,
+    429 or 5xx is handed to a background retry thread, which retries it with
+    jittered exponential backoff, so the tick thread never waits for a retry.
+    Other 4xx responses are not retried.
+
+    Consecutive failures of an endpoint open its breaker. While it is open, the
+    caller's requests are queued for the retry thread without touching the
+    network, and only the retry thread probes the endpoint after the reset
+    timeout. The retry queue is bounded; requests beyond ``max_pending`` are
+    dropped and counted.
+
+    A thread can also be given a blocking budget with start_budget(): its
+    attempts are cut short when the budget runs out, and once it is spent the
+    thread's requests go straight to the retry thread. The simulator's tick
+    loop spends at most ``max_block_fraction`` of each tick this way, so a slow
+    or degraded server costs a bounded share of the tick even before, or
+    without, its breaker opening.
+    """
+
+    def __init__(self, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 retry: Optional[RetryPolicy] = None, breaker_threshold: int = DEFAULT_BREAKER_THRESHOLD,
+                 breaker_reset: float = DEFAULT_BREAKER_RESET, max_pending: int = DEFAULT_MAX_PENDING,
+                 max_block_fraction: float = DEFAULT_MAX_BLOCK_FRACTION):
+        """
+        Initialize the sender.
+
+        Args:
+            connect_timeout: Seconds to wait for a connection
+            read_timeout: Seconds to wait for the response once connected
+            retry: Retry policy (default: RetryPolicy())
+            breaker_threshold: Consecutive failures that open an endpoint's breaker
+            breaker_reset: Seconds an open breaker waits before a probe
+            max_pending: Most requests waiting for a retry
+            max_block_fraction: Share of a tick the tick loop may spend in send attempts
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry = retry or RetryPolicy()
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.max_pending = max_pending
+        self.max_block_fraction = max_block_fraction
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._pending = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        # The caller's threads and the retry thread both count
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "sent": 0, "failed_attempts": 0, "timeouts": 0, "rejected": 0,
+                      "short_circuited": 0, "over_budget": 0, "retries": 0, "recovered": 0, "gave_up": 0,
+                      "dropped": 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def start_budget(self, seconds: Optional[float]):
+        """
+        Limit the calling thread's time in send attempts until the next call.
+
+        Args:
+            seconds: Seconds the thread may spend in attempts (None lifts the limit)
+        """
+        self._local.budget = seconds
+
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers.setdefault(endpoint, CircuitBreaker(self.breaker_threshold, self.breaker_reset))
+        return breaker
+
+    def _attempt(self, url: str, data, headers, timeout=None) -> Optional[bool]:
+        """
+        Make one request.
+
+        Args:
+            timeout: ``(connect, read)`` timeouts (default: the sender's)
+
+        Returns:
+            True on success, False for a failure worth retrying, None for a rejection that is not
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        import requests
+        breaker = self._breaker(endpoint_of(url))
+        try:
+            response = session.post(url, data=data, headers=headers, timeout=timeout or self.timeout)
+        except requests.Timeout as e:
+            self._count("timeouts")
+            logger.debug(f"Timeout posting to {endpoint_of(url)}: {e}")
+        except requests.RequestException as e:
+            logger.debug(f"Error posting to {endpoint_of(url)}: {e}")
+        else:
+            if response.status_code == 200:
+                breaker.record_success()
+                return True
+            if response.status_code != 429 and response.status_code < 500:
+                # The endpoint is up; the request itself is wrong and retrying will not help
+                breaker.record_success()
+                self._count("rejected")
+                logger.error(f"Request to {endpoint_of(url)} rejected. Status code: {response.status_code}")
+                return None
+            logger.debug(f"Request to {endpoint_of(url)} failed. Status code: {response.status_code}")
+        self._count("failed_attempts")
+        was_closed = breaker.state == CLOSED
+        breaker.record_failure()
+        if was_closed and breaker.state == OPEN:
+            logger.warning(f"Circuit breaker for {endpoint_of(url)} opened after {breaker.failures} failures; "
+                           f"probing again in {breaker.reset_timeout} seconds")
+        return False
+
+    def _budget_timeout(self, budget: float) -> Tuple[float, float]:
+        """
+        Split what is left of a budget between the connect and read phases.
+
+        The phases share the budget in the ratio of the configured timeouts, so
+        an attempt that runs into both timeouts still ends within the budget.
+        """
+        connect, read = self.timeout
+        if connect + read <= budget:
+            return self.timeout
+        connect_share = budget * connect / (connect + read)
+        return connect_share, budget - connect_share
+
+    def post(self, url: str, data, headers: Dict[str, str]) -> bool:
+        """
+        Post a request, retrying it in the background if it fails.
+
+        Args:
+            url: Request URL
+            data: Request body
+            headers: Request headers
+
+        Returns:
+            True if the request was delivered now; False if it failed or was queued for a retry
+        """
+        self._count("requests")
+        if not self._breaker(endpoint_of(url)).allow():
+            self._count("short_circuited")
+            self._schedule(url, data, headers, 0)
+            return False
+        budget = getattr(self._local, "budget", None)
+        if budget is None:
+            result = self._attempt(url, data, headers)
+        elif budget <= 0:
+            self._count("over_budget")
+            self._schedule(url, data, headers, 0)
+            return False
+        else:
+            start = time.monotonic()
+            result = self._attempt(url, data, headers, self._budget_timeout(budget))
+            self._local.budget = budget - (time.monotonic() - start)
+        if result:
+            self._count("sent")
+            return True
+        if result is False:
+            self._schedule(url, data, headers, 0)
+        return False
+
+    def _schedule(self, url: str, data, headers, retry: int):
+        """Queue a request for its next retry."""
+        with self._condition:
+            if self._closing or retry >= self.retry.max_retries:
+                self._count("gave_up")
+                return
+            if len(self._pending) >= self.max_pending:
+                self._count("dropped")
+                return
+            due = time.monotonic() + self.retry.delay(retry)
+            heapq.heappush(self._pending, (due, next(self._sequence), url, data, headers, retry))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="http-retry")
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        """Retry thread: send queued requests when they are due and their endpoint's breaker allows it."""
+        while True:
+            with self._condition:
+                while not self._closing and (not self._pending or self._pending[0][0] > time.monotonic()):
+                    self._condition.wait(self._pending[0][0] - time.monotonic() if self._pending else None)
+                if self._closing and not self._pending:
+                    return
+                due, _, url, data, headers, retry = heapq.heappop(self._pending)
+            breaker = self._breaker(endpoint_of(url))
+            if not breaker.allow(probe=True):
+                # Wait for the breaker's probe without spending a retry
+                with self._condition:
+                    heapq.heappush(self._pending, (max(breaker.retry_at(), time.monotonic() + 0.1),
+                                                   next(self._sequence), url, data, headers, retry))
+                if self._closing:
+                    return
+                continue
+            self._count("retries")
+            result = self._attempt(url, data, headers)
+            if result:
+                self._count("recovered")
+            elif result is False:
+                self._schedule(url, data, headers, retry + 1)
+
+    @property
+    def pending(self) -> int:
+        """Requests waiting for a retry."""
+        return len(self._pending)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the send statistics, with the breaker state of every endpoint."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["pending"] = self.pending
+        stats["breaker_trips"] = sum(breaker.trips for breaker in self.breakers.values())
+        stats["open_breakers"] = sum(breaker.state != CLOSED for breaker in self.breakers.values())
+        return stats
+
+    def close(self, drain_timeout: float = 5.0):
+        """
+        Stop retrying, giving due retries up to ``drain_timeout`` seconds to finish.
+
+        Requests still waiting afterwards are counted as given up.
+        """
+        deadline = time.monotonic() + drain_timeout
+        while self._pending and self._thread is not None and time.monotonic() < deadline:
+            if all(self._breaker(endpoint_of(item[2])).state == OPEN for item in list(self._pending)):
+                break
+            time.sleep(0.05)
+        with self._condition:
+            self._closing = True
+            self._count("gave_up", len(self._pending))
+            self._pending = []
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout[0] + self.timeout[1])
+            self._thread = None
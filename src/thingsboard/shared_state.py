@@ -0,0 +1,344 @@
+import json
+import logging
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.thingsboard.fleet import FleetTick
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME = "fleet_state"
+FORMAT_VERSION = 1
+MAGIC = int.from_bytes(b"FLEETSHM", "little")
+
+# Header of the value segment: 16 little-endian uint64 words, followed by the
+# float64 value matrix in row-major order
+HEADER_WORDS = 16
+HEADER_BYTES = HEADER_WORDS * 8
+_MAGIC, _FORMAT, _SEQ, _TICK, _TIMESTAMP, _ROWS, _COLS, _LAYOUT, _CAPACITY, _STATE = range(10)
+
+# Segment states: a replaced segment tells readers to attach to the new one by name
+STATE_ACTIVE, STATE_MOVED, STATE_CLOSED = 0, 1, 2
+
+
+def _layout_segment_name(name: str, generation: int) -> str:
+    return f"{name}_layout_{generation}"
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without letting this process's resource tracker unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers attached segments too; undo that for readers
+        segment = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+def _unlink(segment: Optional[shared_memory.SharedMemory]):
+    if segment is None:
+        return
+    segment.close()
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SharedStatePublisher:
+    """
+    Publish the simulator's fleet matrix and tick counter in shared memory.
+
+    Every tick the publisher copies the tick's (machines x sensors) matrix, laid
+    out by FleetLayout, into a named shared-memory segment guarded by a seqlock:
+    the sequence word is made odd before the write and even after it, so readers
+    in other processes can detect and retry torn reads without any locking or
+    serialization. Machine IDs and sensor columns are published as JSON in a
+    separate ``<name>_layout_<generation>`` segment that is only rewritten when
+    the fleet changes shape.
+
+    The seqlock relies on the stores to shared memory becoming visible in program
+    order, which holds on x86-64; all words are naturally aligned 8-byte values.
+    """
+
+    def __init__(self, name: str = DEFAULT_NAME, simulator=None, capacity: int = 0):
+        """
+        Initialize the publisher.
+
+        Args:
+            name: Shared-memory segment name
+            simulator: Optional SensorSimulator to subscribe to immediately
+            capacity: Number of matrix cells to reserve; the segment is replaced by a
+                larger one if the fleet outgrows it (defaults to the fleet size)
+        """
+        self.name = name
+        self.capacity = capacity
+        self._segment: Optional[shared_memory.SharedMemory] = None
+        self._layout_segment: Optional[shared_memory.SharedMemory] = None
+        self._layout = None
+        self._generation = 0
+        self.published = 0
+
+        if simulator is not None:
+            self.attach(simulator)
+
+    def attach(self, simulator):
+        """Subscribe to a simulator's per-tick output."""
+        layout = simulator.get_layout()
+        self._create(max(self.capacity, layout.shape[0] * layout.shape[1], 1))
+        simulator.add_tick_listener(self.on_tick)
+
+    def detach(self, simulator):
+        """Stop receiving ticks from a simulator."""
+        simulator.remove_tick_listener(self.on_tick)
+
+    def _create(self, capacity: int):
+        """Create the value segment, replacing a smaller one with the same name."""
+        if self._segment is not None:
+            self._header[_STATE] = STATE_MOVED
+            del self._header, self._values
+            _unlink(self._segment)
+        try:
+            segment = shared_memory.SharedMemory(name=self.name, create=True, size=HEADER_BYTES + capacity * 8)
+        except FileExistsError:
+            # Left behind by a publisher that did not shut down cleanly
+            _unlink(_attach(self.name))
+            segment = shared_memory.SharedMemory(name=self.name, create=True, size=HEADER_BYTES + capacity * 8)
+        self._segment = segment
+        self.capacity = capacity
+        self._header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=segment.buf)
+        self._values = np.ndarray((capacity,), dtype=np.float64, buffer=segment.buf, offset=HEADER_BYTES)
+        self._header[:] = 0
+        self._header[_MAGIC] = MAGIC
+        self._header[_FORMAT] = FORMAT_VERSION
+        self._header[_CAPACITY] = capacity
+        self._header[_LAYOUT] = self._generation
+        logger.info(f"Publishing fleet state in shared memory '{self.name}' ({capacity} cells)")
+
+    def _publish_layout(self, layout):
+        """Write the machine and column description of a new layout."""
+        self._generation += 1
+        content = json.dumps({
+            "generation": self._generation,
+            "machine_ids": layout.machine_ids,
+            "machine_types": layout.machine_types,
+            "columns": layout.columns,
+            "width": layout.width,
+        }).encode("utf-8")
+        segment = shared_memory.SharedMemory(name=_layout_segment_name(self.name, self._generation),
+                                             create=True, size=len(content) + 8)
+        segment.buf[:8] = len(content).to_bytes(8, "little")
+        segment.buf[8:8 + len(content)] = content
+        _unlink(self._layout_segment)
+        self._layout_segment = segment
+        self._layout = layout
+
+    def on_tick(self, tick: FleetTick):
+        """Publish one tick."""
+        matrix = tick.get_matrix()
+        rows, cols = matrix.shape
+        if rows * cols > self.capacity:
+            self._create(max(rows * cols, 2 * self.capacity))
+        if tick.layout is not self._layout:
+            self._publish_layout(tick.layout)
+
+        header = self._header
+        sequence = int(header[_SEQ])
+        header[_SEQ] = sequence + 1  # odd: write in progress
+        self._values[:rows * cols] = matrix.ravel()
+        header[_TICK] = tick.index
+        header[_TIMESTAMP] = tick.timestamp
+        header[_ROWS] = rows
+        header[_COLS] = cols
+        header[_LAYOUT] = self._generation
+        header[_SEQ] = sequence + 2  # even: consistent again
+        self.published += 1
+
+    def close(self):
+        """Mark the state as closed and remove the segments."""
+        if self._segment is not None:
+            self._header[_STATE] = STATE_CLOSED
+            del self._header, self._values
+            _unlink(self._segment)
+            self._segment = None
+        _unlink(self._layout_segment)
+        self._layout_segment = None
+
+
+@dataclass
+class SharedSnapshot:
+    """A consistent copy of the published fleet state."""
+    tick: int
+    timestamp: int
+    matrix: np.ndarray
+    generation: int
+    machine_ids: List[str]
+    columns: Dict[str, List[str]]
+    machine_types: List[str]
+
+    def value(self, machine_id: str, sensor_type: str) -> Optional[float]:
+        """Get one reading, or None if the machine or sensor is not in the snapshot."""
+        try:
+            row = self.machine_ids.index(machine_id)
+            col = self.columns[self.machine_types[row]].index(sensor_type)
+        except ValueError:
+            return None
+        return float(self.matrix[row, col])
+
+
+class SharedStateReader:
+    """
+    Read the fleet state published by a SharedStatePublisher in another process.
+
+    ``read`` copies the matrix into a reusable buffer and retries until it got a
+    copy no write overlapped. ``apply`` runs a function directly on the shared
+    matrix (zero-copy) and retries it the same way, for consumers that only need
+    a reduction of the state.
+    """
+
+    def __init__(self, name: str = DEFAULT_NAME, timeout: float = 5.0):
+        """
+        Attach to a published fleet state.
+
+        Args:
+            name: Shared-memory segment name used by the publisher
+            timeout: Seconds to wait for the segment to appear
+        """
+        self.name = name
+        self.timeout = timeout
+        self._segment = None
+        self._generation = None
+        self._layout: Dict[str, Any] = {}
+        self._connect()
+
+    def _connect(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                segment = _attach(self.name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+        if self._segment is not None:
+            del self._header, self._values
+            try:
+                self._segment.close()
+            except BufferError:
+                pass  # a caller still holds a view; the mapping is released with it
+        self._segment = segment
+        self._header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=segment.buf)
+        if self._header[_MAGIC] != MAGIC or self._header[_FORMAT] != FORMAT_VERSION:
+            raise ValueError(f"Shared memory '{self.name}' does not hold a fleet state of format {FORMAT_VERSION}")
+        self._values = np.ndarray((int(self._header[_CAPACITY]),), dtype=np.float64,
+                                  buffer=segment.buf, offset=HEADER_BYTES)
+
+    @property
+    def sequence(self) -> int:
+        """Current seqlock sequence; it changes with every published tick."""
+        return int(self._header[_SEQ])
+
+    @property
+    def tick(self) -> int:
+        """Index of the last published tick."""
+        return int(self._header[_TICK])
+
+    def _load_layout(self, generation: int) -> bool:
+        try:
+            segment = _attach(_layout_segment_name(self.name, generation))
+        except FileNotFoundError:
+            return False  # already replaced by a newer layout
+        try:
+            size = int.from_bytes(bytes(segment.buf[:8]), "little")
+            self._layout = json.loads(bytes(segment.buf[8:8 + size]))
+        finally:
+            segment.close()
+        self._generation = generation
+        return True
+
+    def apply(self, function: Callable[[np.ndarray], Any], max_wait: float = 1.0) -> Any:
+        """
+        Evaluate a function on a consistent zero-copy view of the matrix.
+
+        The function may run more than once if a tick is published meanwhile,
+        so it must not keep the view or have side effects.
+
+        Args:
+            function: Function of the (machines x sensors) matrix view
+            max_wait: Seconds to keep retrying before giving up
+
+        Returns:
+            The function's result for a matrix no write overlapped
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            header = self._header
+            state = header[_STATE]
+            if state == STATE_CLOSED:
+                raise ConnectionError(f"Fleet state '{self.name}' was closed by its publisher")
+            if state == STATE_MOVED:
+                del header
+                self._connect()
+                continue
+            start = int(header[_SEQ])
+            if start % 2 == 0 and start > 0:
+                rows, cols, generation = int(header[_ROWS]), int(header[_COLS]), int(header[_LAYOUT])
+                view = self._values[:rows * cols].reshape(rows, cols)
+                result = function(view)
+                if int(header[_SEQ]) == start:
+                    if generation == self._generation or self._load_layout(generation):
+                        return result
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"No consistent fleet state in '{self.name}' within {max_wait} seconds")
+            time.sleep(0.0005)
+
+    def read(self, max_wait: float = 1.0) -> SharedSnapshot:
+        """
+        Copy a consistent snapshot of the published state.
+
+        Args:
+            max_wait: Seconds to keep retrying before giving up
+
+        Returns:
+            SharedSnapshot whose matrix is owned by the caller
+        """
+        def copy(view):
+            return view.copy(), int(self._header[_TICK]), int(self._header[_TIMESTAMP])
+
+        matrix, tick, timestamp = self.apply(copy, max_wait)
+        layout = self._layout
+        return SharedSnapshot(tick, timestamp, matrix, self._generation, layout["machine_ids"],
+                              layout["columns"], layout["machine_types"])
+
+    def close(self):
+        """Detach from the segment."""
+        if self._segment is not None:
+            del self._header, self._values
+            self._segment.close()
+            self._segment = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print the fleet state published in shared memory")
+    parser.add_argument("--name", default=DEFAULT_NAME, help="Shared-memory segment name")
+    parser.add_argument("--machine", default=None, help="Only print this machine's readings")
+    args = parser.parse_args()
+
+    reader = SharedStateReader(args.name)
+    snapshot = reader.read()
+    print(f"tick {snapshot.tick}, {len(snapshot.machine_ids)} machines, layout generation {snapshot.generation}")
+    for row, machine_id in enumerate(snapshot.machine_ids):
+        if args.machine and machine_id != args.machine:
+            continue
+        sensors = snapshot.columns[snapshot.machine_types[row]]
+        print(machine_id, {sensor: float(snapshot.matrix[row, col]) for col, sensor in enumerate(sensors)})
+    reader.close()
@@ -3,19 +3,158 @@ import time
 import json
 import os
 import logging
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Callable, TYPE_CHECKING
 
-# Import ThingsBoard connector
-from src.thingsboard.connector import ThingsBoardConnector
 from src.thingsboard.sensor_type import SensorType
 from src.thingsboard.machine_type import MachineType
+from src.thingsboard.profiling import TickProfiler, phase
+
+# Connectors and the numpy-backed fleet layout are imported where they are used,
+# so a local-only simulator starts without loading requests, paho or numpy.
+if TYPE_CHECKING:
+    from src.thingsboard.faults import FaultCampaign, FaultInjector
+    from src.thingsboard.fleet import FleetLayout, FleetTick
+    from src.thingsboard.pipeline import SendPipeline
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("VirtualSensorSimulator")
 
+def create_connector(thingsboard_config: Optional[Dict[str, Any]]):
+    """
+    Create and connect the ThingsBoard connector described by a configuration.
+    
+    Args:
+        thingsboard_config: Configuration as passed to SensorSimulator.simulate
+    
+    Returns:
+        Connected ThingsBoardConnector or MultiDeviceConnector, or None if no
+        configuration was given or the connector could not be initialized
+    
+    Raises:
+        ValueError: If Protobuf payloads are requested with a single device token
+    """
+    if not thingsboard_config:
+        return None
+    if (thingsboard_config.get("payload_format", "json") == "protobuf" and not thingsboard_config.get("https_mode")
+            and not thingsboard_config.get("multi_device")):
+        # A device profile holds a single schema, but one token would publish every machine type to one device
+        raise ValueError("Protobuf payloads need one device per machine (multi-device mode with a tokens file)")
+    
+    try:
+        host = thingsboard_config.get("host", "localhost")
+        port = thingsboard_config.get("port", 1883)
+        https_mode = thingsboard_config.get("https_mode", False)
+        multi_device = thingsboard_config.get("multi_device", False)
+        
+        # HTTP requests share timeouts, background retries and per-endpoint circuit breakers
+        http_sender = None
+        if https_mode:
+            from src.thingsboard.resilience import HttpSender, RetryPolicy
+            http = dict(thingsboard_config.get("http", {}))
+            retry = RetryPolicy(max_retries=http.pop("max_retries")) if "max_retries" in http else None
+            http_sender = HttpSender(retry=retry, **http)
+        
+        # Batch and compress HTTP uploads if configured
+        bulk_uploader = None
+        bulk = thingsboard_config.get("bulk_upload")
+        if bulk and https_mode:
+            from src.thingsboard.bulk_upload import BulkUploader
+            bulk_uploader = BulkUploader(host, port, sender=http_sender, **bulk)
+        elif bulk:
+            logger.warning("Bulk uploads use the HTTP API and are ignored in MQTT mode")
+        
+        # Encode MQTT payloads with the per-machine-type Protobuf schemas if configured
+        payload_encoder = None
+        if thingsboard_config.get("payload_format", "json") == "protobuf":
+            if https_mode:
+                logger.warning("Protobuf payloads are only sent over MQTT and are ignored in HTTPS mode")
+            else:
+                from src.thingsboard.protobuf_payload import ProtobufEncoder
+                payload_encoder = ProtobufEncoder()
+        
+        if multi_device:
+            # Import and use MultiDeviceConnector
+            from src.thingsboard.multi_device_connector import MultiDeviceConnector
+            tokens_file = thingsboard_config.get("tokens_file")
+            
+            tb_connector = MultiDeviceConnector(
+                host=host, 
+                port=port, 
+                tokens_file=tokens_file,
+                https_mode=https_mode,
+                bulk_uploader=bulk_uploader,
+                http_sender=http_sender,
+                payload_encoder=payload_encoder
+            )
+            
+            # Connect to MQTT if not in HTTPS mode
+            if not https_mode:
+                tb_connector.connect_mqtt()
+            
+            logger.info(f"Connected to ThingsBoard at {host}:{port} using multiple device tokens")
+        else:
+            # Use standard ThingsBoardConnector
+            from src.thingsboard.connector import ThingsBoardConnector
+            access_token = thingsboard_config.get("access_token")
+            
+            tb_connector = ThingsBoardConnector(
+                host=host, 
+                port=port, 
+                access_token=access_token,
+                https_mode=https_mode,
+                save_local=thingsboard_config.get("save_local", True),
+                bulk_uploader=bulk_uploader,
+                http_sender=http_sender,
+                payload_encoder=payload_encoder
+            )
+            
+            # Connect to MQTT if not in HTTPS mode
+            if not https_mode:
+                tb_connector.connect_mqtt()
+            
+            logger.info(f"Connected to ThingsBoard at {host}:{port} using single token")
+        return tb_connector
+    
+    except Exception as e:
+        logger.error(f"Failed to initialize ThingsBoard connector: {e}")
+        return None
+
+
+def close_connector(tb_connector):
+    """
+    Flush a connector's pending uploads and retries, log their statistics and disconnect it.
+    
+    Args:
+        tb_connector: Connector returned by create_connector, or None
+    """
+    if not tb_connector:
+        return
+    
+    bulk_uploader = getattr(tb_connector, "bulk_uploader", None)
+    if bulk_uploader:
+        bulk_uploader.close()
+        logger.info("Bulk upload summary: " + ", ".join(f"{k}={v}" for k, v in bulk_uploader.get_stats().items()))
+    
+    http_sender = getattr(tb_connector, "http_sender", None)
+    if http_sender:
+        http_sender.close()
+        logger.info("HTTP send summary: " + ", ".join(f"{k}={v}" for k, v in http_sender.get_stats().items()))
+    
+    payload_encoder = getattr(tb_connector, "payload_encoder", None)
+    if payload_encoder:
+        logger.info("Protobuf payload summary: "
+                    + ", ".join(f"{k}={v}" for k, v in payload_encoder.get_stats().items()))
+    
+    # Disconnect from ThingsBoard
+    if hasattr(tb_connector, 'disconnect_mqtt'):
+        tb_connector.disconnect_mqtt()
+        logger.info("Disconnected from ThingsBoard")
+
+
 class SensorSimulator:
     """Class to simulate sensor readings for various machine types."""
     
@@ -97,6 +236,9 @@ class SensorSimulator:
         SensorType.SAFETY_MAT: (0, 1)
     }
     
+    # Binary safety sensors: 1 is the safe state, 0 means the sensor has tripped
+    SAFETY_SENSORS = [SensorType.EMERGENCY_STOP, SensorType.LIGHT_CURTAIN, SensorType.SAFETY_MAT]
+    
     # Define units for each sensor type
     SENSOR_UNITS = {
         # Temperature sensors
@@ -175,16 +317,43 @@ class SensorSimulator:
         SensorType.SAFETY_MAT: "binary"
     }
     
-    def __init__(self, machine_count: Dict[str, int] = None):
+    def __init__(self, machine_count: Dict[str, int] = None, correlated: bool = True,
+                 seed: Optional[int] = None, first_index: Dict[str, int] = None):
         """
         Initialize the sensor simulator.
         
         Args:
             machine_count: Dictionary with machine types as keys and count as values
+            correlated: Move each machine's analog sensors together following
+                MachineType.SENSOR_CORRELATIONS; False walks every sensor independently
+            seed: Seed of the correlated generator (defaults to a draw from ``random``)
+            first_index: Number of the first machine of each type (defaults to 1), so
+                simulators sharing a fleet can own disjoint machine-ID ranges
         """
+        self.correlated = correlated
+        self.seed = seed
+        self._blocks = None
+        self._rng = None
         self.machines = {}
         self.machine_sensors = {}
         self.sensor_values = {}
+        self._layout = None
+        self._layout_version = 0
+        self._next_index: Dict[str, int] = {}
+        self._machine_ids: Optional[List[str]] = None
+        self.fault_injector: Optional['FaultInjector'] = None
+        self.maintenance_mode = set()
+        self.interval = None
+        self.connector = None
+        self._pipeline: Optional['SendPipeline'] = None
+        self._tick_listeners: List[Callable[['FleetTick'], None]] = []
+        self.profiler: Optional[TickProfiler] = None
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+        # Held by the tick loop while it generates and sends, and by the runtime
+        # control methods, so a tick never sees a half-applied fleet change
+        self._fleet_lock = threading.RLock()
+        self.stats = self._empty_stats()
         
         # Default machine count if not provided
         if machine_count is None:
@@ -197,39 +366,340 @@ class SensorSimulator:
             }
         
         # Initialize machines and their sensors
-        self._initialize_machines(machine_count)
+        self._initialize_machines(machine_count, first_index or {})
     
-    def _initialize_machines(self, machine_count: Dict[str, int]):
+    def _initialize_machines(self, machine_count: Dict[str, int], first_index: Dict[str, int] = None):
         """Initialize machines and their sensors."""
+        first_index = first_index or {}
         for machine_type, count in machine_count.items():
-            for i in range(1, count + 1):
-                machine_id = f"{machine_type}_{i:03d}"
-                self.machines[machine_id] = machine_type
-                
-                # Initialize sensors for this machine
-                self.machine_sensors[machine_id] = MachineType.MACHINE_SENSORS.get(machine_type, [])
-                
-                # Initialize sensor values with default values
-                self.sensor_values[machine_id] = {}
-                for sensor_type in self.machine_sensors[machine_id]:
-                    # Get normal range for this sensor
-                    min_val, max_val = self.SENSOR_RANGES.get(sensor_type, (0, 100))
-                    
-                    # For binary sensors, use 0 or 1
-                    if self.SENSOR_UNITS.get(sensor_type) == "binary":
-                        # Most safety sensors should be in "safe" state (1) by default
-                        if sensor_type in [SensorType.EMERGENCY_STOP, SensorType.LIGHT_CURTAIN, 
-                                         SensorType.SAFETY_MAT]:
-                            self.sensor_values[machine_id][sensor_type] = 1
-                        else:
-                            self.sensor_values[machine_id][sensor_type] = random.choice([0, 1])
-                    else:
-                        # Generate a random value within normal range
-                        initial_value = min_val + random.random() * (max_val - min_val)
-                        self.sensor_values[machine_id][sensor_type] = round(initial_value, 2)
-        
+            first = first_index.get(machine_type, 1)
+            for i in range(first, first + count):
+                self._initialize_machine(f"{machine_type}_{i:03d}", machine_type)
+            self._next_index[machine_type] = max(self._next_index.get(machine_type, 1), first + count)
+        
+        self._layout = None
+        self._machine_ids = None
+        self._blocks = None
         logger.info(f"Initialized {len(self.machines)} machines with sensors")
     
+    def _initialize_machine(self, machine_id: str, machine_type: str):
+        """Initialize one machine and its sensors."""
+        self.machines[machine_id] = machine_type
+        
+        # Initialize sensors for this machine
+        self.machine_sensors[machine_id] = MachineType.MACHINE_SENSORS.get(machine_type, [])
+        
+        # Initialize sensor values with default values
+        self.sensor_values[machine_id] = {}
+        for sensor_type in self.machine_sensors[machine_id]:
+            # Get normal range for this sensor
+            min_val, max_val = self.SENSOR_RANGES.get(sensor_type, (0, 100))
+            
+            # For binary sensors, use 0 or 1
+            if self.SENSOR_UNITS.get(sensor_type) == "binary":
+                # Most safety sensors should be in "safe" state (1) by default
+                if sensor_type in self.SAFETY_SENSORS:
+                    self.sensor_values[machine_id][sensor_type] = 1
+                else:
+                    self.sensor_values[machine_id][sensor_type] = random.choice([0, 1])
+            else:
+                # Generate a random value within normal range
+                initial_value = min_val + random.random() * (max_val - min_val)
+                self.sensor_values[machine_id][sensor_type] = round(initial_value, 2)
+    
+    def get_layout(self) -> 'FleetLayout':
+        """Get the fleet matrix layout for the current set of machines."""
+        if self._layout is None:
+            from src.thingsboard.fleet import FleetLayout
+            self._layout = FleetLayout(self.machines, self.machine_sensors, self.SENSOR_RANGES,
+                                       self.SENSOR_UNITS, self.SAFETY_SENSORS, version=self._layout_version)
+        return self._layout
+    
+    def get_machine_ids(self) -> List[str]:
+        """Get the IDs of all machines as a list, cached until the fleet changes."""
+        if self._machine_ids is None:
+            self._machine_ids = list(self.machines)
+        return self._machine_ids
+    
+    def set_fault_campaign(self, campaign: Optional['FaultCampaign']):
+        """
+        Inject the faults of a campaign into the following simulate() run.
+        
+        Args:
+            campaign: FaultCampaign, or None to only inject random spikes
+        """
+        from src.thingsboard.faults import FaultInjector
+        self.fault_injector = FaultInjector(campaign)
+    
+    @property
+    def fleet_lock(self) -> threading.RLock:
+        """Lock held by the tick loop and the runtime control methods while they read or change the fleet."""
+        return self._fleet_lock
+    
+    def _layout_changed(self):
+        """Drop the layout after the fleet changed shape; listeners see the new version next tick."""
+        self._layout = None
+        self._machine_ids = None
+        self._layout_version += 1
+    
+    def _build_block(self, machine_type: str, machine_ids: List[str]):
+        from src.thingsboard.correlated import CorrelatedSensorBlock
+        return CorrelatedSensorBlock(
+            machine_type, machine_ids, MachineType.MACHINE_SENSORS.get(machine_type, []),
+            self.SENSOR_RANGES, self.SENSOR_UNITS, self.SAFETY_SENSORS,
+            MachineType.SENSOR_CORRELATIONS.get(machine_type, []), self.sensor_values)
+    
+    def _get_blocks(self):
+        """Get the correlated per-type sensor blocks, building them on first use."""
+        if self._blocks is None:
+            import numpy as np
+            if self._rng is None:
+                self._rng = np.random.default_rng(self.seed if self.seed is not None else random.getrandbits(64))
+            machine_ids = {}
+            for machine_id, machine_type in self.machines.items():
+                machine_ids.setdefault(machine_type, []).append(machine_id)
+            self._blocks = {machine_type: self._build_block(machine_type, ids)
+                            for machine_type, ids in machine_ids.items()}
+        return self._blocks
+    
+    def add_machines(self, machine_type: str, count: int) -> List[str]:
+        """
+        Add machines to the fleet, also while simulate() is running.
+        
+        Only the new machines are initialized: their rows are appended to the type's
+        correlated block and, with a per-device connector, only their connections
+        are opened. New machines are numbered after the highest existing one of
+        their type.
+        
+        Args:
+            machine_type: Machine type of the new machines
+            count: Number of machines to add
+        
+        Returns:
+            IDs of the added machines
+        """
+        if machine_type not in MachineType.MACHINE_SENSORS:
+            raise ValueError(f"Unknown machine type: {machine_type}")
+        if count < 0:
+            raise ValueError(f"Machine count must not be negative, got {count}")
+        
+        with self._fleet_lock:
+            first = self._next_index.get(machine_type, 1)
+            self._next_index[machine_type] = first + count
+            connector = self.connector
+        machine_ids = [f"{machine_type}_{i:03d}" for i in range(first, first + count)]
+        
+        # Connect outside the lock so ticks keep running; the IDs are already reserved,
+        # and the machines join the fleet only once their connections are open
+        if connector and hasattr(connector, 'connect_device'):
+            for machine_id in machine_ids:
+                connector.connect_device(machine_id)
+        
+        with self._fleet_lock:
+            for machine_id in machine_ids:
+                self._initialize_machine(machine_id, machine_type)
+            
+            if self._blocks is not None and machine_ids:
+                block = self._blocks.get(machine_type)
+                if block is None:
+                    self._blocks[machine_type] = self._build_block(machine_type, machine_ids)
+                else:
+                    block.add_rows(machine_ids, self.sensor_values)
+            self._layout_changed()
+        
+        logger.info(f"Added {count} {machine_type} machines, fleet now has {len(self.machines)} machines")
+        return machine_ids
+    
+    def remove_machines(self, machine_ids: List[str]) -> List[str]:
+        """
+        Remove machines from the fleet, also while simulate() is running.
+        
+        Only the removed machines' state is freed and, with a per-device connector,
+        only their connections are closed.
+        
+        Args:
+            machine_ids: Machines to remove; unknown IDs are ignored
+        
+        Returns:
+            IDs of the machines that were removed
+        """
+        with self._fleet_lock:
+            removed = [machine_id for machine_id in dict.fromkeys(machine_ids) if machine_id in self.machines]
+            by_type: Dict[str, List[str]] = {}
+            for machine_id in removed:
+                by_type.setdefault(self.machines[machine_id], []).append(machine_id)
+            
+            if self._blocks is not None:
+                for machine_type, ids in by_type.items():
+                    block = self._blocks[machine_type]
+                    block.remove_rows(ids)
+                    if not block.machine_ids:
+                        del self._blocks[machine_type]
+            
+            for machine_id in removed:
+                del self.machines[machine_id]
+                del self.machine_sensors[machine_id]
+                del self.sensor_values[machine_id]
+                self.maintenance_mode.discard(machine_id)
+            if removed:
+                self._layout_changed()
+            connector = self.connector
+        
+        # The tick loop no longer sees the machines, so their connections close without the lock
+        if connector and hasattr(connector, 'disconnect_device'):
+            for machine_id in removed:
+                connector.disconnect_device(machine_id)
+        
+        logger.info(f"Removed {len(removed)} machines, fleet now has {len(self.machines)} machines")
+        return removed
+    
+    def set_maintenance_mode(self, machine_ids: List[str], enabled: bool = True) -> List[str]:
+        """
+        Put machines into (or take them out of) maintenance mode.
+        
+        Machines in maintenance keep their state and connection but are not advanced
+        or sent while the mode is on. The new ``maintenance_mode`` value is sent once
+        to each affected device.
+        
+        Args:
+            machine_ids: Machines to change; unknown IDs are ignored
+            enabled: True to start maintenance, False to end it
+        
+        Returns:
+            IDs of the machines whose mode changed
+        """
+        with self._fleet_lock:
+            changed = [machine_id for machine_id in dict.fromkeys(machine_ids)
+                       if machine_id in self.machines and (machine_id in self.maintenance_mode) != enabled]
+            if enabled:
+                self.maintenance_mode.update(changed)
+            else:
+                self.maintenance_mode.difference_update(changed)
+            # The update carries no readings, so the Protobuf schema is picked by the type passed along
+            machine_types = {machine_id: self.machines[machine_id] for machine_id in changed}
+            connector = self.connector
+        
+        # Sent after releasing the lock, so a slow server does not hold up the ticks
+        if connector:
+            for machine_id in changed:
+                connector.send_telemetry(machine_id, {"maintenance_mode": enabled},
+                                         machine_type=machine_types[machine_id])
+            # Bulk batches are kept per sending thread, and no tick flushes the caller's
+            if getattr(connector, "bulk_uploader", None):
+                connector.bulk_uploader.flush()
+        
+        logger.info(f"Maintenance mode {'on' if enabled else 'off'} for {len(changed)} machines")
+        return changed
+    
+    def set_interval(self, interval: float):
+        """
+        Change the interval between ticks of a running simulation.
+        
+        The wait for the next tick is recomputed immediately. The number of ticks
+        of a simulation with a fixed duration is not recomputed.
+        
+        Args:
+            interval: New interval in seconds
+        """
+        if interval <= 0:
+            raise ValueError(f"Interval must be positive, got {interval}")
+        self.interval = interval
+        self._wake.set()
+        logger.info(f"Simulation interval set to {interval} seconds")
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Describe the current fleet and run.
+        
+        Returns:
+            Dictionary with the machine count per type, the machines in maintenance
+            mode, the interval, the layout version and the counters of get_stats
+        """
+        with self._fleet_lock:
+            machine_count: Dict[str, int] = {}
+            for machine_type in self.machines.values():
+                machine_count[machine_type] = machine_count.get(machine_type, 0) + 1
+            return {
+                "machines": len(self.machines),
+                "machine_count": machine_count,
+                "maintenance_mode": sorted(self.maintenance_mode),
+                "interval": self.interval,
+                "layout_version": self._layout_version,
+                "stats": self.get_stats(),
+            }
+    
+    def add_tick_listener(self, callback: Callable[['FleetTick'], None]):
+        """
+        Register a callback invoked in-process with every simulated tick.
+        
+        Args:
+            callback: Function receiving a FleetTick after anomalies have been injected
+        """
+        self._tick_listeners.append(callback)
+    
+    def remove_tick_listener(self, callback: Callable[['FleetTick'], None]):
+        """Unregister a callback added with add_tick_listener."""
+        if callback in self._tick_listeners:
+            self._tick_listeners.remove(callback)
+    
+    def set_profiler(self, profiler: Optional[TickProfiler]):
+        """
+        Record per-phase timings of every simulated tick.
+        
+        Args:
+            profiler: TickProfiler receiving the timings, or None to stop profiling
+        """
+        self.profiler = profiler
+    
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {"ticks": 0, "messages": 0, "send_failures": 0, "late_ticks": 0, "max_start_lag_ms": 0.0}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Counters of the current (or last) simulate() run.
+        
+        Returns:
+            Dictionary with completed ticks, generated machine messages, failed sends,
+            ticks that overran their interval and the largest delay of a tick start
+            behind its schedule (only tracked when simulate() was given ``start_at``).
+            With a send pipeline, failed sends include those of the send workers so far,
+            and the queued ticks and 95th percentile age of sent readings are added
+        """
+        stats = dict(self.stats)
+        pipeline = self._pipeline
+        if pipeline:
+            pipeline_stats = pipeline.get_stats()
+            stats["send_failures"] += pipeline_stats["failed"] + pipeline_stats["dropped_messages"]
+            stats["send_queue_depth"] = pipeline_stats["queue_depth"]
+            stats["send_age_p95_ms"] = pipeline_stats["age_p95_ms"]
+        return stats
+    
+    def stop(self):
+        """Ask a running simulate() loop to return after its current tick; safe from any thread."""
+        self._stop_event.set()
+        self._wake.set()
+    
+    def _fleet_matrix(self, layout: 'FleetLayout', events: List[Any] = ()):
+        """Fleet matrix of the current correlated state, with injected events applied."""
+        from src.thingsboard.correlated import fleet_matrix
+        matrix = fleet_matrix(self._get_blocks(), layout)
+        for machine_id in self.maintenance_mode:
+            matrix[layout.row_of[machine_id]] = float('nan')
+        for event in events:
+            cell = layout.cell(event.machine_id, event.sensor_type)
+            if cell is not None:
+                matrix[cell] = event.value
+        return matrix
+    
+    def _notify_tick(self, tick: 'FleetTick'):
+        """Deliver a tick to every listener, isolating the loop from listener errors."""
+        for callback in list(self._tick_listeners):
+            try:
+                callback(tick)
+            except Exception as e:
+                logger.error(f"Tick listener {callback} failed: {e}")
+    
     def generate_sensor_data(self, machine_id: str = None) -> Dict[str, Dict[str, float]]:
         """
         Generate simulated sensor data for all machines or a specific machine.
@@ -240,16 +710,69 @@ class SensorSimulator:
         Returns:
             Dictionary with machine IDs as keys and sensor data as values
         """
+        if self.correlated:
+            return self._generate_correlated_data(machine_id)
+        
         result = {}
         
         # If machine_id is specified, only generate data for that machine
         if machine_id and machine_id in self.machines:
             result[machine_id] = self._generate_machine_data(machine_id)
         else:
-            # Generate data for all machines
+            # Generate data for all machines that are not in maintenance
             for machine_id in self.machines:
-                result[machine_id] = self._generate_machine_data(machine_id)
+                if machine_id not in self.maintenance_mode:
+                    result[machine_id] = self._generate_machine_data(machine_id)
+        
+        return result
+    
+    def _generate_correlated_data(self, machine_id: str = None) -> Dict[str, Dict[str, float]]:
+        """
+        Generate sensor data with one batched correlated step per machine type.
+        
+        Args:
+            machine_id: Optional machine ID to generate data for
         
+        Returns:
+            Dictionary with machine IDs as keys and sensor data as values
+        """
+        blocks = self._get_blocks()
+        result = {}
+        if machine_id and machine_id in self.machines:
+            block = blocks[self.machines[machine_id]]
+            values = block.step(self._rng, rows=[block.row_of[machine_id]])
+            result[machine_id] = self._machine_payload(block, machine_id, values[0].tolist())
+            return result
+        
+        for block in blocks.values():
+            rows = self._active_rows(block)
+            machine_ids = block.machine_ids if rows is None else [block.machine_ids[row] for row in rows]
+            for machine_id, values in zip(machine_ids, block.step(self._rng, rows=rows).tolist()):
+                result[machine_id] = self._machine_payload(block, machine_id, values)
+        return result
+    
+    def _active_rows(self, block):
+        """Rows of a block that are not in maintenance mode, or None when that is every row."""
+        paused = [block.row_of[machine_id] for machine_id in self.maintenance_mode if machine_id in block.row_of]
+        if not paused:
+            return None
+        import numpy as np
+        active = np.ones(len(block.machine_ids), dtype=bool)
+        active[paused] = False
+        return np.flatnonzero(active)
+    
+    def _machine_payload(self, block, machine_id: str, values: List[float]) -> Dict[str, Any]:
+        """Format one machine's row of a correlated block like _generate_machine_data does."""
+        result = {}
+        current = self.sensor_values[machine_id]
+        for sensor_type, unit, is_binary, value in zip(block.sensors, block.units, block.is_binary, values):
+            if is_binary:
+                value = int(value)
+            current[sensor_type] = value
+            result[sensor_type] = value
+            result[f"{sensor_type}_unit"] = unit
+        result["machine_type"] = block.machine_type
+        result["timestamp"] = int(time.time() * 1000)  # milliseconds
         return result
     
     def _generate_machine_data(self, machine_id: str) -> Dict[str, float]:
@@ -277,8 +800,7 @@ class SensorSimulator:
             # For binary sensors, occasionally change state
             if self.SENSOR_UNITS.get(sensor_type) == "binary":
                 # Safety sensors should rarely change to unsafe state
-                if sensor_type in [SensorType.EMERGENCY_STOP, SensorType.LIGHT_CURTAIN, 
-                                  SensorType.SAFETY_MAT]:
+                if sensor_type in self.SAFETY_SENSORS:
                     if random.random() < 0.01:  # 1% chance of safety issue
                         new_value = 0  # Unsafe state
                     else:
@@ -324,7 +846,7 @@ class SensorSimulator:
         return result
     
     def simulate(self, interval: int = 5, duration: int = 60, 
-                 thingsboard_config: Dict[str, Any] = None):
+                 thingsboard_config: Dict[str, Any] = None, start_at: float = None):
         """
         Run a continuous simulation, generating data at specified intervals.
         
@@ -332,109 +854,142 @@ class SensorSimulator:
             interval: Interval between data generations in seconds
             duration: Total duration of simulation in seconds
             thingsboard_config: Configuration for ThingsBoard connection
+            start_at: Optional ``time.monotonic()`` time of the first tick. Ticks then
+                start on the fixed grid ``start_at + k * interval`` instead of one
+                interval after the previous tick ended, so simulators started with
+                the same grid tick together; ticks that fall behind skip to the next slot
         """
-        tb_connector = None
-        
         # Initialize ThingsBoard connector if configuration is provided
-        if thingsboard_config:
-            try:
-                host = thingsboard_config.get("host", "localhost")
-                port = thingsboard_config.get("port", 1883)
-                https_mode = thingsboard_config.get("https_mode", False)
-                multi_device = thingsboard_config.get("multi_device", False)
-                
-                if multi_device:
-                    # Import and use MultiDeviceConnector
-                    from src.thingsboard.multi_device_connector import MultiDeviceConnector
-                    tokens_file = thingsboard_config.get("tokens_file")
-                    
-                    tb_connector = MultiDeviceConnector(
-                        host=host, 
-                        port=port, 
-                        tokens_file=tokens_file,
-                        https_mode=https_mode
-                    )
-                    
-                    # Connect to MQTT if not in HTTPS mode
-                    if not https_mode:
-                        tb_connector.connect_mqtt()
-                    
-                    logger.info(f"Connected to ThingsBoard at {host}:{port} using multiple device tokens")
-                else:
-                    # Use standard ThingsBoardConnector
-                    from src.thingsboard.connector import ThingsBoardConnector
-                    access_token = thingsboard_config.get("access_token")
-                    
-                    tb_connector = ThingsBoardConnector(
-                        host=host, 
-                        port=port, 
-                        access_token=access_token,
-                        https_mode=https_mode
-                    )
-                    
-                    # Connect to MQTT if not in HTTPS mode
-                    if not https_mode:
-                        tb_connector.connect_mqtt()
-                    
-                    logger.info(f"Connected to ThingsBoard at {host}:{port} using single token")
-                
-            except Exception as e:
-                logger.error(f"Failed to initialize ThingsBoard connector: {e}")
-                tb_connector = None
+        tb_connector = self.connector = create_connector(thingsboard_config)
+        
+        # Hand sends to background workers if a send pipeline is configured
+        pipeline = None
+        pipeline_config = (thingsboard_config or {}).get("pipeline")
+        if tb_connector and pipeline_config:
+            from src.thingsboard.pipeline import SendPipeline
+            pipeline = self._pipeline = SendPipeline(tb_connector, **pipeline_config)
+        
+        # Let the connector time serialization and local saves separately from sending;
+        # with a send pipeline they happen on the send workers, outside the tick
+        if tb_connector and not pipeline:
+            tb_connector.profiler = self.profiler
+        
+        # Without a pipeline, HTTP sends block the tick loop and get a per-tick budget
+        http_sender = getattr(tb_connector, "http_sender", None) if not pipeline else None
         
         # Calculate number of iterations
         iterations = duration // interval if duration > 0 else float('inf')
+        self.interval = interval
         
-        abnormal_event_count = {machine_id: 0 for machine_id in self.machines}
+        if self.fault_injector is None:
+            self.set_fault_campaign(None)
+        stats = self.stats = self._empty_stats()
+        self._stop_event.clear()
         try:
             logger.info(f"Starting simulation with {len(self.machines)} machines...")
             logger.info(f"Sending data every {interval} seconds for {duration} seconds")
             
+            next_tick = start_at
+            if next_tick is not None:
+                self._stop_event.wait(max(0.0, next_tick - time.monotonic()))
+            
             iteration_count = 0
-            while iteration_count < iterations or duration <= 0:
+            while (iteration_count < iterations or duration <= 0) and not self._stop_event.is_set():
                 start_time = time.time()
+                if next_tick is not None:
+                    start_lag_ms = max(0.0, time.monotonic() - next_tick) * 1000
+                    stats["max_start_lag_ms"] = max(stats["max_start_lag_ms"], round(start_lag_ms, 3))
+                profiler = self.profiler
+                if profiler:
+                    profiler.start_tick()
                 
-                # Generate data for all machines
-                data = self.generate_sensor_data()
-
-                # Tạo event bất thường: 1% xác suất mỗi vòng lặp
-                if random.random() < 0.01:
-                    # Tăng xác suất cho máy đã từng bị event
-                    machine_ids = list(self.machines.keys())
-                    weights = [3 if abnormal_event_count[mid] > 0 else 1 for mid in machine_ids]
-                    abnormal_machine_id = random.choices(machine_ids, weights=weights, k=1)[0]
-                    sensors = self.machine_sensors[abnormal_machine_id]
-                    if sensors:
-                        abnormal_sensor = random.choice(sensors)
-                        min_val, max_val = self.SENSOR_RANGES.get(abnormal_sensor, (0, 100))
-                        abnormal_value = round(max_val * 1.5, 2)  # tăng 50% so với max
-                        data[abnormal_machine_id][abnormal_sensor] = abnormal_value
-                        abnormal_event_count[abnormal_machine_id] += 1
-                        logger.warning(f"[EVENT] Abnormal value injected: {abnormal_machine_id} - {abnormal_sensor} = {abnormal_value} (event #{abnormal_event_count[abnormal_machine_id]})")
-                
-                # Send data to ThingsBoard
-                if tb_connector:
-                    for machine_id, machine_data in data.items():
-                        tb_connector.send_telemetry(machine_id, machine_data)
+                # Runtime fleet changes wait for the tick to be generated and sent
+                with self._fleet_lock:
+                    # Generate data for all machines
+                    with phase(profiler, "generate"):
+                        data = self.generate_sensor_data()
+                    
+                    # Inject the scheduled faults and random abnormal spikes
+                    with phase(profiler, "inject"):
+                        events = self.fault_injector.inject(iteration_count, data, self)
+                    
+                    # Deliver the tick to in-process consumers
+                    if self._tick_listeners:
+                        with phase(profiler, "listeners"):
+                            from src.thingsboard.fleet import FleetTick
+                            tick = FleetTick(iteration_count, int(start_time * 1000), data,
+                                             self.get_layout(), events)
+                            if self.correlated:
+                                tick.matrix = self._fleet_matrix(tick.layout, events)
+                            self._notify_tick(tick)
+                    
+                    # Send data to ThingsBoard
+                    if pipeline:
+                        with phase(profiler, "send"):
+                            pipeline.submit(iteration_count, int(start_time * 1000), data)
+                    elif tb_connector:
+                        with phase(profiler, "send"):
+                            # HTTP attempts may block this tick for a bounded share of the interval; the
+                            # rest of its requests go to the sender's retry thread
+                            if http_sender:
+                                http_sender.start_budget(self.interval * http_sender.max_block_fraction)
+                            for machine_id, machine_data in data.items():
+                                if not tb_connector.send_telemetry(machine_id, machine_data):
+                                    stats["send_failures"] += 1
+                            # Bulk uploads hold each device's records for several ticks, so one request
+                            # carries flush_interval seconds of a device's telemetry
+                            if getattr(tb_connector, "bulk_uploader", None):
+                                stats["send_failures"] += tb_connector.bulk_uploader.flush_due()
+                    stats["messages"] += len(data)
+                    stats["ticks"] += 1
                 
                 # Log progress
                 iteration_count += 1
                 if iteration_count % 10 == 0:
                     logger.info(f"Completed {iteration_count} iterations")
                 
-                # Wait for next interval
-                elapsed = time.time() - start_time
-                sleep_time = max(0, interval - elapsed)
-                time.sleep(sleep_time)
+                # Wait for next interval, recomputing the wait if the interval is changed meanwhile
+                with phase(profiler, "sleep"):
+                    tick_slot = next_tick
+                    late = False
+                    while not self._stop_event.is_set():
+                        self._wake.clear()
+                        interval = self.interval
+                        if tick_slot is not None:
+                            next_tick = tick_slot + interval
+                            now = time.monotonic()
+                            late = next_tick < now
+                            if late:
+                                # Skip the missed slots rather than bursting to catch up
+                                next_tick += (int((now - next_tick) // interval) + 1) * interval
+                            sleep_time = next_tick - now
+                        else:
+                            elapsed = time.time() - start_time
+                            late = elapsed > interval
+                            sleep_time = max(0, interval - elapsed)
+                        if not self._wake.wait(sleep_time):
+                            break
+                    stats["late_ticks"] += late
+                if profiler:
+                    profiler.end_tick()
         
         except KeyboardInterrupt:
             logger.info("Simulation stopped by user")
         
         finally:
-            # Disconnect from ThingsBoard
-            if tb_connector and hasattr(tb_connector, 'disconnect_mqtt'):
-                tb_connector.disconnect_mqtt()
-                logger.info("Disconnected from ThingsBoard")
+            if pipeline:
+                pipeline.close()
+                pipeline_stats = pipeline.get_stats()
+                stats["send_failures"] += pipeline_stats["failed"] + pipeline_stats["dropped_messages"]
+                logger.info("Send pipeline summary: " + ", ".join(f"{k}={v}" for k, v in pipeline_stats.items()))
+                self._pipeline = None
+            elif getattr(tb_connector, "bulk_uploader", None):
+                # Upload the records the tick loop still holds while their failures can be counted
+                if http_sender:
+                    http_sender.start_budget(None)
+                stats["send_failures"] += tb_connector.bulk_uploader.flush()
+            close_connector(tb_connector)
+            self.connector = None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Project root, so the benchmark can be started from any directory
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Heavy optional dependencies whose presence after startup is reported
+HEAVY_MODULES = ["numpy", "pandas", "matplotlib", "requests", "paho"]
+
+# Cold-start scenarios: name -> code run in a fresh interpreter
+SCENARIOS = {
+    "baseline": "pass",
+    "simulator": "from src.thingsboard.simulator import SensorSimulator",
+    "simulator_tick": ("from src.thingsboard.simulator import SensorSimulator\n"
+                       "SensorSimulator().generate_sensor_data()"),
+    "main": "import src.thingsboard.main",
+    "streaming_analyzer": "from src.sensor.streaming import StreamingAnalyzer",
+    "analyzer": "from src.sensor.sensor import SensorDataAnalyzer",
+}
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+exec(compile({code!r}, "<scenario>", "exec"))
+elapsed = time.perf_counter() - start
+json.dump({{"seconds": elapsed,
+           "loaded": [m for m in {heavy!r} if m in sys.modules]}}, sys.stdout)
+"""
+
+
+def measure_scenario(code: str, runs: int = 5) -> Dict[str, object]:
+    """
+    Time a startup scenario in fresh interpreters.
+
+    Args:
+        code: Python code executed after interpreter start
+        runs: Number of fresh processes to time
+
+    Returns:
+        Median and best wall time of the whole process and of the code itself,
+        plus the heavy modules it loaded
+    """
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT), PYTHONDONTWRITEBYTECODE="1")
+    probe = _PROBE.format(code=code, heavy=HEAVY_MODULES)
+    process_times, import_times, loaded = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", probe], cwd=PROJECT_ROOT, env=env,
+                                capture_output=True, text=True, check=True)
+        process_times.append(time.perf_counter() - start)
+        output = json.loads(result.stdout.strip().splitlines()[-1])
+        import_times.append(output["seconds"])
+        loaded = output["loaded"]
+    return {
+        "process_median_ms": round(statistics.median(process_times) * 1000, 1),
+        "process_best_ms": round(min(process_times) * 1000, 1),
+        "code_median_ms": round(statistics.median(import_times) * 1000, 1),
+        "loaded": loaded,
+    }
+
+
+def run_benchmark(scenarios: List[str] = None, runs: int = 5) -> Dict[str, Dict[str, object]]:
+    """
+    Measure the cold start of the simulator and analyzer entry points.
+
+    Args:
+        scenarios: Names from SCENARIOS to run (defaults to all)
+        runs: Number of fresh processes per scenario
+
+    Returns:
+        Measurements per scenario
+    """
+    return {name: measure_scenario(SCENARIOS[name], runs) for name in scenarios or SCENARIOS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure cold-start time of the simulator and analyzer')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per scenario')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='Scenario to run (repeatable, defaults to all)')
+    parser.add_argument('--output', type=str, help='Also write the results as JSON')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.scenario, args.runs)
+    print(f"{'scenario':<22} {'process':>10} {'best':>10} {'code':>10}  loaded")
+    for name, result in results.items():
+        print(f"{name:<22} {result['process_median_ms']:>8.1f}ms {result['process_best_ms']:>8.1f}ms "
+              f"{result['code_median_ms']:>8.1f}ms  {', '.join(result['loaded']) or '-'}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)